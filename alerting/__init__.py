@@ -0,0 +1,6 @@
+"""
+Alert decision code shared by the backend and data_ingestion.
+
+Both images copy this package next to their own code, so it is imported as
+a top-level ``alerting`` package in either process.
+"""
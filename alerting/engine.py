@@ -0,0 +1,128 @@
+"""
+Alert decisions for a batch of earthquakes.
+
+The backend (simulated earthquakes) and data_ingestion (CWA reports) both
+turn an earthquake and its location intensities into one event per region.
+decide_alerts does that for a whole batch in one pass: region, level,
+suppression and the event row, so both processes share a single hot path.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from alerting.regions import Region, RegionRegistry, regions
+from alerting.suppression import SuppressionIndex, taipei_now
+
+logger = logging.getLogger(__name__)
+
+ALERT_LEVELS = ("L1", "L2")
+
+# process_time of events closed without being handled
+UNPROCESSED = -1
+
+SQL_INSERT_EVENT = """
+    INSERT INTO event (id, location_eq_id, create_at, region, level, trigger_alert, ack, is_damage, is_operation_active, is_done, closed_at, process_time)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+class LocationIntensity(NamedTuple):
+    location: str
+    intensity: float
+    location_eq_id: int
+
+
+class EarthquakeInput(NamedTuple):
+    earthquake_id: int
+    eq_time: datetime  # naive Asia/Taipei time
+    magnitude: float
+    locations: List[LocationIntensity]
+
+
+class AlertDecision(NamedTuple):
+    event_id: str
+    location_eq_id: int
+    create_at: datetime
+    region: str
+    level: str
+    trigger_alert: bool
+
+
+def determine_level(intensity: float, magnitude: float,
+                    l1_intensity: float = 1, l2_intensity: float = 3, l2_magnitude: float = 5) -> str:
+    if intensity >= l2_intensity or magnitude >= l2_magnitude:
+        return 'L2'
+    elif intensity >= l1_intensity:
+        return 'L1'
+    else:
+        return 'NA'
+
+
+def find_region(location: str, registry: RegionRegistry = regions) -> Optional[Region]:
+    """The region a location name belongs to, None if it is not a known region."""
+    return registry.get(location)
+
+
+def decide_alerts(earthquakes: Iterable[EarthquakeInput], index: SuppressionIndex, cursor,
+                  window: timedelta, verify: bool = False,
+                  registry: RegionRegistry = regions) -> List[AlertDecision]:
+    """
+    Decide level and trigger_alert for every location of ``earthquakes``.
+    Earthquakes are handled oldest first so an earlier one in the batch can
+    suppress a later one; triggered alerts are recorded in ``index``.
+    Locations outside every known region are skipped with a warning.
+
+    The caller should have synced ``index`` and must invalidate it if the
+    resulting events are not committed.
+    """
+    decisions = []
+    pending: Dict[str, List[Tuple[datetime, str]]] = {}
+    for eq in sorted(earthquakes, key=lambda eq: eq.eq_time):
+        for loc in eq.locations:
+            region = find_region(loc.location, registry)
+            if region is None:
+                logger.warning(
+                    f"Skipping location {loc.location} of earthquake {eq.earthquake_id}: unknown region")
+                continue
+            level = determine_level(loc.intensity, eq.magnitude,
+                                    region.l1_intensity, region.l2_intensity, region.l2_magnitude)
+
+            trigger_alert = level in ALERT_LEVELS and not index.check(
+                cursor, region.name, level, eq.eq_time, window,
+                verify=verify, pending=pending.get(region.name, ()))
+            if trigger_alert:
+                index.record(loc.location_eq_id, region.name, level, eq.eq_time)
+                pending.setdefault(region.name, []).append((eq.eq_time, level))
+
+            decisions.append(AlertDecision(
+                f"{eq.earthquake_id}{region.suffix}", loc.location_eq_id, eq.eq_time,
+                region.name, level, trigger_alert))
+    return decisions
+
+
+def event_rows(decisions: Iterable[AlertDecision], closed_at: Optional[datetime] = None) -> List[tuple]:
+    """
+    Rows for SQL_INSERT_EVENT. Events that do not trigger an alert are
+    stored already closed (process_time = -1 表示未處理).
+    """
+    closed_at_str = (closed_at or taipei_now()).strftime("%Y-%m-%d %H:%M:%S")
+    return [(
+        d.event_id,
+        d.location_eq_id,
+        d.create_at.strftime("%Y-%m-%d %H:%M:%S"),
+        d.region,  # region 填入標準地區名稱，供 region 索引查詢
+        d.level,
+        d.trigger_alert,
+        False,  # ack
+        None,  # is_damage
+        None,  # is_operation_active
+        not d.trigger_alert,  # is_done
+        None if d.trigger_alert else closed_at_str,
+        None if d.trigger_alert else UNPROCESSED,
+    ) for d in decisions]
+
+
+def insert_events(cursor, decisions: List[AlertDecision]):
+    """Insert the events of ``decisions`` with one executemany. The caller commits."""
+    if decisions:
+        cursor.executemany(SQL_INSERT_EVENT, event_rows(decisions))
@@ -0,0 +1,119 @@
+"""
+Region registry: every site that gets its own events, loaded from the
+``region`` table and kept as dicts so each lookup is O(1) however many
+regions there are.
+
+Both processes load it at startup and reload it when it is older than
+``reload_interval``; until the first load the four original sites are used.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REGION_RELOAD_INTERVAL = 60
+
+SQL_SELECT_REGIONS = """
+    SELECT name, suffix, county, l1_intensity, l2_intensity, l2_magnitude
+    FROM region WHERE active = TRUE
+"""
+
+
+class Region(NamedTuple):
+    name: str          # 標準地區名稱，即 event.region 與 earthquake_location.location
+    suffix: str        # event id 後綴，以 - 開頭
+    county: str        # CWA 報告的 CountyName
+    l1_intensity: float = 1
+    l2_intensity: float = 3
+    l2_magnitude: float = 5
+
+
+DEFAULT_REGIONS = (
+    Region("Taipei", "-tp", "臺北市"),
+    Region("Hsinchu", "-hc", "新竹市"),
+    Region("Taichung", "-tc", "臺中市"),
+    Region("Tainan", "-tn", "臺南市"),
+)
+
+
+class RegionRegistry:
+    """
+    Lookups read whole dicts that are replaced, never mutated, on reload,
+    so readers do not need the lock.
+    """
+
+    def __init__(self, regions: Iterable[Region] = DEFAULT_REGIONS,
+                 reload_interval: float = REGION_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._set(regions)
+
+    def _set(self, regions: Iterable[Region]):
+        by_name: Dict[str, Region] = {}
+        by_suffix: Dict[str, Region] = {}
+        by_county: Dict[str, Tuple[Region, ...]] = {}
+        for region in regions:
+            by_name[region.name] = region
+            by_suffix[region.suffix] = region
+            by_county[region.county] = by_county.get(region.county, ()) + (region,)
+        self._by_name = by_name
+        self._by_suffix = by_suffix
+        self._by_county = by_county
+
+    def load(self, cursor):
+        cursor.execute(SQL_SELECT_REGIONS)
+        regions = [Region(**row) for row in cursor.fetchall()]
+        with self._lock:
+            if regions:
+                self._set(regions)
+            else:
+                logger.warning("Region table is empty, keeping the current regions")
+            self.loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(self)} regions")
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= self.reload_interval
+
+    def reload_if_stale(self, cursor):
+        """Reload when due. Failures are logged and retried after the next interval."""
+        if not self.is_stale():
+            return
+        try:
+            self.load(cursor)
+        except Exception as e:
+            logger.error(f"Failed to reload regions, keeping the current ones: {e}")
+            self.loaded_at = time.monotonic()
+
+    def get(self, name: str) -> Optional[Region]:
+        return self._by_name.get(name)
+
+    def for_event_id(self, event_id: str) -> Optional[Region]:
+        """Region of an event, from the suffix of its id (``<earthquake id><suffix>``)."""
+        i = event_id.find("-")
+        return self._by_suffix.get(event_id[i:]) if i >= 0 else None
+
+    def by_county(self, county: str) -> Tuple[Region, ...]:
+        return self._by_county.get(county, ())
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._by_name)
+
+    def all(self) -> Tuple[Region, ...]:
+        """Every region, read from one dict so a concurrent reload cannot mix sets."""
+        return tuple(self._by_name.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names())
+
+    def __len__(self):
+        return len(self._by_name)
+
+
+# Shared by everything in the process; see load_regions in each service
+regions = RegionRegistry()
@@ -0,0 +1,228 @@
+"""
+In-memory index of triggered alerts, used to decide whether a new alert is
+suppressed without querying ``event`` for every location.
+
+The backend (simulated earthquakes) and data_ingestion (CWA reports) both
+write events, so each process keeps its own index and, before deciding,
+pulls the triggered events added since its watermark with one query
+(``event.location_eq_id`` follows the auto-increment id of
+``earthquake_location``). Entries older than ``retention`` are pruned; a
+window reaching further back is answered from the database instead.
+
+Ids are handed out at INSERT but become visible at COMMIT, so a long
+transaction can commit ids below ones already seen. Each sync therefore
+re-reads from the watermark the index had SYNC_LOOKBACK before the previous
+sync: anything invisible then belongs to a transaction that started after
+that point, and so holds higher ids. Rows already indexed are skipped.
+"""
+import bisect
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+LEVEL_ORDER = {"L1": 1, "L2": 2}
+
+SUPPRESSION_RETENTION = timedelta(hours=24)
+# Longest a transaction writing events may stay open; alerts it commits
+# later than that after its INSERTs can be missed by the other process
+SYNC_LOOKBACK = timedelta(minutes=5)
+
+SQL_TRIGGERED_SINCE_TIME = """
+    SELECT location_eq_id, region, level, create_at FROM event
+    WHERE region IN %s AND trigger_alert = 1 AND create_at >= %s
+"""
+
+# region IN keeps idx_event_region_alert usable when the floor is low (right
+# after a rebuild); with a recent floor the location_eq_id index is cheaper
+SQL_TRIGGERED_SINCE_ID = """
+    SELECT location_eq_id, region, level, create_at FROM event
+    WHERE region IN %s AND trigger_alert = 1 AND create_at >= %s AND location_eq_id > %s
+"""
+
+SQL_ALERT_LEVELS_IN_WINDOW = """
+    SELECT level FROM event
+    WHERE region = %s AND trigger_alert = 1
+    AND create_at BETWEEN %s AND %s
+"""
+
+
+def taipei_now() -> datetime:
+    # event.create_at is stored as naive Asia/Taipei time
+    return datetime.now(ZoneInfo("Asia/Taipei")).replace(tzinfo=None)
+
+
+def query_suppressed(cursor, region: str, level: str, eq_time: datetime, window: timedelta) -> bool:
+    """The original per-location check: any alert in the window at the same or a higher level."""
+    cursor.execute(SQL_ALERT_LEVELS_IN_WINDOW, (
+        region,
+        (eq_time - window).strftime("%Y-%m-%d %H:%M:%S"),
+        eq_time.strftime("%Y-%m-%d %H:%M:%S")))
+    this_level_score = LEVEL_ORDER.get(level, 0)
+    return any(LEVEL_ORDER.get(row["level"], 0) >= this_level_score
+               for row in cursor.fetchall())
+
+
+class CommitWatermark:
+    """
+    Highest id seen, and the floor a catch-up query has to re-read from so
+    ids committed out of order are not missed (see the module docstring).
+    Call ``synced`` after each catch-up read.
+    """
+
+    def __init__(self, lookback: timedelta = SYNC_LOOKBACK):
+        self.lookback = lookback
+        self.value = 0
+        # (sync time, watermark after it), oldest first
+        self._history: deque[Tuple[datetime, int]] = deque()
+        self._last_sync: Optional[datetime] = None
+
+    def reset(self, now: datetime, value: int, floor: int = 0):
+        """Start over at ``value``; until the lookback has passed, reads start from ``floor``."""
+        self.value = value
+        self._history = deque([(now - self.lookback, floor), (now, value)])
+        self._last_sync = now
+
+    def advance(self, value: int):
+        self.value = max(self.value, value)
+
+    def floor(self) -> int:
+        """Watermark as of ``lookback`` before the previous sync."""
+        cutoff = self._last_sync - self.lookback
+        while len(self._history) > 1 and self._history[1][0] <= cutoff:
+            self._history.popleft()
+        return self._history[0][1]
+
+    def synced(self, now: datetime):
+        self._history.append((now, self.value))
+        self._last_sync = now
+
+
+class SuppressionIndex:
+    """
+    Triggered alert times per (region, level), kept sorted so a window
+    lookup is a bisect per level. Alerts can arrive out of time order (late
+    CWA reports, simulations set in the past), so a single "latest alert"
+    per region would not be enough.
+    """
+
+    def __init__(self, regions: Iterable[str], retention: timedelta = SUPPRESSION_RETENTION):
+        # Re-read on every rebuild, so a RegionRegistry can be passed
+        self.regions = regions
+        self.retention = retention
+        self.loaded = False
+        self._watermark = CommitWatermark()
+        # Oldest create_at the index is complete from
+        self.horizon: Optional[datetime] = None
+        self._lock = threading.RLock()
+        self._times: Dict[Tuple[str, str], List[datetime]] = {}
+        self._ids: Dict[int, datetime] = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def watermark(self) -> int:
+        return self._watermark.value
+
+    def rebuild(self, cursor, now: Optional[datetime] = None):
+        now = now or taipei_now()
+        with self._lock:
+            self._times = {}
+            self._ids = {}
+            self._watermark = CommitWatermark()
+            self.horizon = now - self.retention
+            cursor.execute(SQL_TRIGGERED_SINCE_TIME, (
+                tuple(self.regions), self.horizon.strftime("%Y-%m-%d %H:%M:%S")))
+            for row in cursor.fetchall():
+                self._add(row["location_eq_id"], row["region"], row["level"], row["create_at"])
+            # Ids committed after the rebuild may be lower than the watermark,
+            # so syncs re-read from 0 until SYNC_LOOKBACK has passed
+            self._watermark.reset(now, self.watermark)
+            self.loaded = True
+        logger.info(f"Loaded {len(self)} triggered alerts into the suppression index")
+
+    def invalidate(self):
+        """Forget everything; the next sync rebuilds from the database."""
+        with self._lock:
+            self.loaded = False
+
+    def sync(self, cursor, now: Optional[datetime] = None):
+        """Pick up alerts written since the last sync, by this or the other process."""
+        now = now or taipei_now()
+        with self._lock:
+            if not self.loaded:
+                self.rebuild(cursor, now)
+                return
+            cursor.execute(SQL_TRIGGERED_SINCE_ID, (
+                tuple(self.regions), self.horizon.strftime("%Y-%m-%d %H:%M:%S"), self._watermark.floor()))
+            for row in cursor.fetchall():
+                self._add(row["location_eq_id"], row["region"], row["level"], row["create_at"])
+            self._prune(now - self.retention)
+            self._watermark.synced(now)
+
+    def record(self, location_eq_id: int, region: str, level: str, create_at: datetime):
+        """Add an alert this process has just triggered (not committed yet)."""
+        with self._lock:
+            self._add(location_eq_id, region, level, create_at)
+
+    def is_suppressed(self, region: str, level: str, eq_time: datetime, window: timedelta) -> Optional[bool]:
+        """
+        Whether an alert of ``level`` at ``eq_time`` is suppressed by an
+        earlier one within ``window``. None when the index cannot tell.
+        """
+        start = eq_time - window
+        with self._lock:
+            if not self.loaded or start < self.horizon:
+                return None
+            this_level_score = LEVEL_ORDER.get(level, 0)
+            for past_level, score in LEVEL_ORDER.items():
+                if score < this_level_score:
+                    continue
+                times = self._times.get((region, past_level), ())
+                i = bisect.bisect_left(times, start)
+                if i < len(times) and times[i] <= eq_time:
+                    return True
+            return False
+
+    def check(self, cursor, region: str, level: str, eq_time: datetime, window: timedelta,
+              verify: bool = False, pending: Iterable[Tuple[datetime, str]] = ()) -> bool:
+        """
+        is_suppressed, falling back to the database when the index cannot
+        answer. ``pending`` are (create_at, level) alerts of the region that
+        are recorded but not written yet, which the database cannot see.
+        With ``verify`` the database is always asked as well and
+        disagreements are logged.
+        """
+        suppressed = self.is_suppressed(region, level, eq_time, window)
+        if suppressed is not None and not verify:
+            return suppressed
+
+        this_level_score = LEVEL_ORDER.get(level, 0)
+        from_db = query_suppressed(cursor, region, level, eq_time, window) or any(
+            eq_time - window <= create_at <= eq_time and LEVEL_ORDER.get(past_level, 0) >= this_level_score
+            for create_at, past_level in pending)
+        if suppressed is not None and suppressed != from_db:
+            logger.warning(
+                f"Suppression index disagrees with the database for {region} {level} at {eq_time}: "
+                f"index={suppressed}, db={from_db}")
+        return from_db
+
+    def _add(self, location_eq_id: int, region: str, level: str, create_at: datetime):
+        self._watermark.advance(location_eq_id)
+        if location_eq_id in self._ids or create_at < self.horizon:
+            return
+        self._ids[location_eq_id] = create_at
+        bisect.insort(self._times.setdefault((region, level), []), create_at)
+
+    def _prune(self, horizon: datetime):
+        if horizon <= self.horizon:
+            return
+        self.horizon = horizon
+        for times in self._times.values():
+            del times[:bisect.bisect_left(times, horizon)]
+        self._ids = {i: t for i, t in self._ids.items() if t >= horizon}
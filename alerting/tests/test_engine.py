@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from alerting.engine import (EarthquakeInput, LocationIntensity, decide_alerts,
+                             determine_level, event_rows, find_region)
+from alerting.regions import Region, RegionRegistry
+from alerting.suppression import SuppressionIndex
+
+NOW = datetime(2025, 5, 1, 12, 0, 0)
+WINDOW = timedelta(minutes=30)
+
+
+@pytest.fixture
+def index():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = []
+    index = SuppressionIndex(["Taipei", "Hsinchu", "Taichung", "Tainan"])
+    index.rebuild(cursor, NOW)
+    return index
+
+
+def test_determine_level():
+    assert determine_level(1, 4.5) == "L1"
+    assert determine_level(2, 5.0) == "L2"
+    assert determine_level(3, 3.0) == "L2"
+    assert determine_level(0, 3.0) == "NA"
+
+
+def test_find_region():
+    assert find_region("Taipei").suffix == "-tp"
+    assert find_region("Kaohsiung") is None
+
+
+def test_region_thresholds(index):
+    registry = RegionRegistry([Region("Kaohsiung", "-ks", "高雄市", l1_intensity=2, l2_intensity=4)])
+    decisions = decide_alerts(
+        [EarthquakeInput(1, NOW, 4.0, [LocationIntensity("Kaohsiung", 3, 11)])],
+        index, MagicMock(), WINDOW, registry=registry)
+
+    assert [(d.event_id, d.region, d.level) for d in decisions] == [("1-ks", "Kaohsiung", "L1")]
+
+
+def test_decide_alerts_batch(index):
+    cursor = MagicMock()
+    later = EarthquakeInput(2, NOW + timedelta(minutes=5), 4.0, [
+        LocationIntensity("Taipei", 1, 21), LocationIntensity("Hsinchu", 3, 22)])
+    earlier = EarthquakeInput(1, NOW, 4.0, [
+        LocationIntensity("Taipei", 2, 11), LocationIntensity("Hsinchu", 0, 12),
+        LocationIntensity("Kaohsiung", 4, 13)])
+
+    decisions = decide_alerts([later, earlier], index, cursor, WINDOW)
+
+    # Oldest first; the unknown location is skipped
+    assert [(d.event_id, d.level, d.trigger_alert) for d in decisions] == [
+        ("1-tp", "L1", True),
+        ("1-hc", "NA", False),
+        ("2-tp", "L1", False),  # suppressed by 1-tp
+        ("2-hc", "L2", True),
+    ]
+    cursor.execute.assert_not_called()
+
+
+def test_decide_alerts_db_fallback_sees_pending_alerts(index):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = []
+    old = NOW - timedelta(days=2)
+    earthquakes = [
+        EarthquakeInput(1, old, 4.0, [LocationIntensity("Taipei", 2, 11)]),
+        EarthquakeInput(2, old + timedelta(minutes=5), 4.0, [LocationIntensity("Taipei", 2, 21)]),
+    ]
+
+    decisions = decide_alerts(earthquakes, index, cursor, WINDOW)
+
+    assert [d.trigger_alert for d in decisions] == [True, False]
+    assert cursor.execute.call_count == 2
+
+
+def test_event_rows_close_untriggered_events(index):
+    decisions = decide_alerts(
+        [EarthquakeInput(1, NOW, 4.0, [LocationIntensity("Taipei", 2, 11), LocationIntensity("Hsinchu", 0, 12)])],
+        index, MagicMock(), WINDOW)
+
+    triggered, closed = event_rows(decisions, closed_at=NOW)
+    assert triggered[9] is False and triggered[10] is None and triggered[11] is None
+    assert closed[9] is True and closed[10] == "2025-05-01 12:00:00" and closed[11] == -1
@@ -0,0 +1,66 @@
+from unittest.mock import MagicMock
+
+from alerting.regions import DEFAULT_REGIONS, RegionRegistry
+
+ROWS = [
+    {"name": "Taipei", "suffix": "-tp", "county": "臺北市",
+     "l1_intensity": 1, "l2_intensity": 3, "l2_magnitude": 5},
+    {"name": "Neihu", "suffix": "-nh", "county": "臺北市",
+     "l1_intensity": 2, "l2_intensity": 4, "l2_magnitude": 6},
+]
+
+
+def test_defaults_before_load():
+    registry = RegionRegistry()
+    assert registry.names() == tuple(r.name for r in DEFAULT_REGIONS)
+    assert "Taipei" in registry
+    assert registry.by_county("臺南市")[0].name == "Tainan"
+    assert registry.for_event_id("114097-tc").name == "Taichung"
+    assert registry.for_event_id("114097") is None
+
+
+def test_load_replaces_regions():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = ROWS
+    registry = RegionRegistry()
+    registry.load(cursor)
+
+    assert list(registry) == ["Taipei", "Neihu"]
+    assert "Tainan" not in registry
+    assert registry.get("Neihu").l2_magnitude == 6
+    assert [r.name for r in registry.by_county("臺北市")] == ["Taipei", "Neihu"]
+
+
+def test_all_is_one_snapshot_across_reloads():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = ROWS
+    registry = RegionRegistry()
+    before = registry.all()
+
+    registry.load(cursor)
+
+    assert before == DEFAULT_REGIONS
+    assert [r.name for r in registry.all()] == ["Taipei", "Neihu"]
+
+
+def test_reload_if_stale():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = ROWS
+    registry = RegionRegistry(reload_interval=60)
+    assert registry.is_stale()
+
+    registry.reload_if_stale(cursor)
+    registry.reload_if_stale(cursor)
+    assert cursor.execute.call_count == 1
+    assert not registry.is_stale()
+
+
+def test_reload_failure_keeps_regions():
+    cursor = MagicMock()
+    cursor.execute.side_effect = Exception("Table 'region' doesn't exist")
+    registry = RegionRegistry(reload_interval=60)
+
+    registry.reload_if_stale(cursor)
+    assert "Taipei" in registry
+    registry.reload_if_stale(cursor)
+    assert cursor.execute.call_count == 1
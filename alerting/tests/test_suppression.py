@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from alerting.suppression import SuppressionIndex
+
+NOW = datetime(2025, 5, 1, 12, 0, 0)
+WINDOW = timedelta(minutes=30)
+
+
+@pytest.fixture
+def cursor():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [
+        {"location_eq_id": 10, "region": "Taipei", "level": "L1", "create_at": NOW - timedelta(minutes=20)},
+    ]
+    return cursor
+
+
+@pytest.fixture
+def index(cursor):
+    index = SuppressionIndex(["Taipei", "Hsinchu"])
+    index.rebuild(cursor, NOW)
+    return index
+
+
+def test_same_or_lower_level_is_suppressed(index):
+    assert index.is_suppressed("Taipei", "L1", NOW, WINDOW) is True
+    assert index.is_suppressed("Taipei", "L2", NOW, WINDOW) is False
+    assert index.is_suppressed("Hsinchu", "L1", NOW, WINDOW) is False
+
+
+def test_window_bounds(index):
+    assert index.is_suppressed("Taipei", "L1", NOW, timedelta(minutes=10)) is False
+    # An alert after eq_time does not suppress an earlier quake
+    assert index.is_suppressed("Taipei", "L1", NOW - timedelta(minutes=25), WINDOW) is False
+
+
+def test_record_and_sync_deduplicate(index, cursor):
+    index.record(11, "Hsinchu", "L2", NOW)
+    cursor.fetchall.return_value = [
+        {"location_eq_id": 11, "region": "Hsinchu", "level": "L2", "create_at": NOW},
+        {"location_eq_id": 12, "region": "Taipei", "level": "L2", "create_at": NOW - timedelta(minutes=5)},
+    ]
+    index.sync(cursor, NOW)
+
+    assert len(index) == 3
+    assert index.watermark == 12
+    assert index.is_suppressed("Hsinchu", "L1", NOW, WINDOW) is True
+    assert index.is_suppressed("Taipei", "L2", NOW, WINDOW) is True
+
+
+def test_window_before_horizon_falls_back_to_db(index, cursor):
+    old = NOW - timedelta(days=2)
+    assert index.is_suppressed("Taipei", "L1", old, WINDOW) is None
+
+    cursor.fetchall.return_value = [{"level": "L2"}]
+    assert index.check(cursor, "Taipei", "L1", old, WINDOW) is True
+    assert "create_at BETWEEN" in cursor.execute.call_args[0][0]
+
+
+def test_prune_moves_horizon(index, cursor):
+    cursor.fetchall.return_value = []
+    index.sync(cursor, NOW + timedelta(days=1))
+
+    assert len(index) == 0
+    assert index.is_suppressed("Taipei", "L1", NOW, WINDOW) is None
+
+
+def test_invalidate_rebuilds_on_next_sync(index, cursor):
+    index.record(11, "Hsinchu", "L2", NOW)
+    index.invalidate()
+    assert index.is_suppressed("Hsinchu", "L1", NOW, WINDOW) is None
+
+    index.sync(cursor, NOW)
+    assert index.is_suppressed("Hsinchu", "L1", NOW, WINDOW) is False
+
+
+class FakeEventTable:
+    """Cursor over triggered events where rows only show up once committed."""
+
+    def __init__(self):
+        self.committed = []
+        self.floors = []
+        self._result = []
+
+    def commit(self, location_eq_id, region="Taipei", level="L1", create_at=NOW):
+        self.committed.append({"location_eq_id": location_eq_id, "region": region,
+                               "level": level, "create_at": create_at})
+
+    def execute(self, sql, params):
+        if "location_eq_id >" in sql:
+            regions, _, floor = params
+            self.floors.append(floor)
+            self._result = [row for row in self.committed
+                            if row["location_eq_id"] > floor and row["region"] in regions]
+        else:
+            self._result = list(self.committed)
+
+    def fetchall(self):
+        return self._result
+
+
+def test_sync_picks_up_lower_id_committed_after_higher_one():
+    table = FakeEventTable()
+    index = SuppressionIndex(["Taipei", "Hsinchu"])
+    index.rebuild(table, NOW)
+
+    # A drill chunk holds ids 1-400 while data_ingestion commits 401
+    table.commit(401, "Hsinchu")
+    index.sync(table, NOW + timedelta(minutes=1))
+    table.commit(1, "Taipei")
+    index.sync(table, NOW + timedelta(minutes=2))
+
+    assert index.watermark == 401
+    assert index.is_suppressed("Taipei", "L1", NOW, WINDOW) is True
+
+
+def test_sync_floor_follows_watermark_from_lookback_before_last_sync():
+    table = FakeEventTable()
+    index = SuppressionIndex(["Taipei"])
+    index.rebuild(table, NOW)
+    table.commit(500)
+    index.sync(table, NOW + timedelta(minutes=1))
+    index.sync(table, NOW + timedelta(minutes=10))
+    index.sync(table, NOW + timedelta(minutes=11))
+
+    # Until the lookback has passed every sync re-reads from 0
+    assert table.floors == [0, 0, 500]
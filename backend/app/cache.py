@@ -0,0 +1,188 @@
+"""
+Read-through cache for the GET /report/* list responses.
+
+Entries are keyed by (endpoint, location) and kept for a short TTL, with LRU
+eviction past RESPONSE_CACHE_SIZE. Every change published on the change feed
+(acknowledge / submit / repair / auto-close in this process, new events seen
+by EventWatcher) drops the entries it can affect: the lists the event moves
+between, for its region and for "all".
+
+warm_response_cache (a scheduler job) refreshes the entries clients asked for
+in the last CACHE_WARM_WINDOW seconds shortly before they expire, so steady
+polling of the dashboards is served from memory.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from prometheus_client import Counter
+
+from app.change_feed import (ACKNOWLEDGED, AUTO_CLOSED, CLOSED, CREATED,
+                             REPORTED, change_feed)
+from app.constants import (CACHE_WARM_WINDOW, RESPONSE_CACHE_SIZE,
+                           RESPONSE_CACHE_TTL)
+from app.db_async import call_db
+from app.services import report_service
+
+UNACKNOWLEDGED = "unacknowledged"
+PENDING = "pending"
+IN_PROCESS = "in_process"
+CLOSED_LIST = "closed"
+BOARD = "board"
+
+# Lists an event can enter or leave on each change type; None means every list
+AFFECTED_ENDPOINTS = {
+    # Triggered events start unacknowledged, the others are inserted closed
+    CREATED: (UNACKNOWLEDGED, CLOSED_LIST, BOARD),
+    ACKNOWLEDGED: (UNACKNOWLEDGED, PENDING, BOARD),
+    REPORTED: (PENDING, IN_PROCESS, BOARD),
+    CLOSED: (PENDING, IN_PROCESS, CLOSED_LIST, BOARD),
+    AUTO_CLOSED: None,
+}
+
+response_cache_hits = Counter(
+    'response_cache_hits', 'GET /report/* responses served from cache', ['endpoint'])
+response_cache_misses = Counter(
+    'response_cache_misses', 'GET /report/* responses read from the database', ['endpoint'])
+
+# Warm-up job schedule; each run refreshes entries expiring before the next one
+CACHE_WARM_INTERVAL = RESPONSE_CACHE_TTL
+CACHE_WARM_JITTER = 1
+
+_MISSING = object()
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        # Bumped on every invalidation so a read that raced a write is not stored
+        self.generation = 0
+        # Last time each key was asked for, used to pick the keys worth warming
+        self._requested: dict[Hashable, float] = {}
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            # Only keys that were stored once are tracked, so bad locations cannot grow it
+            if key in self._requested:
+                self._requested[key] = self._clock()
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value, generation: Optional[int] = None):
+        """Store value unless the cache was invalidated after ``generation`` was read."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            now = self._clock()
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._requested.setdefault(key, now)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, endpoints=None, location: Optional[str] = None):
+        """
+        Drop entries for the given endpoints (all when None) whose location is
+        ``location`` or "all". With no location every location is dropped.
+        """
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                endpoint, key_location = key
+                if endpoints is not None and endpoint not in endpoints:
+                    continue
+                if location is not None and key_location not in (location, "all"):
+                    continue
+                del self._entries[key]
+
+    def keys_to_warm(self, active_within: float, margin: float) -> list:
+        """
+        Keys requested in the last ``active_within`` seconds that are missing or
+        expire within ``margin`` seconds. Keys idle for longer are forgotten.
+        """
+        now = self._clock()
+        keys = []
+        with self._lock:
+            for key, requested_at in list(self._requested.items()):
+                if now - requested_at > active_within:
+                    del self._requested[key]
+                    continue
+                entry = self._entries.get(key)
+                if entry is None or entry[0] - now <= margin:
+                    keys.append(key)
+        return keys
+
+    def clear(self):
+        self.invalidate()
+
+    def on_change(self, change: dict):
+        """Change feed listener."""
+        self.invalidate(AFFECTED_ENDPOINTS.get(change.get("type")), change.get("region"))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Sync readers used to warm each endpoint; the scheduler runs them in a thread
+WARM_FETCHERS = {
+    UNACKNOWLEDGED: report_service.fetch_unacknowledged_events,
+    PENDING: report_service.fetch_acknowledged_events,
+    IN_PROCESS: report_service.fetch_in_process_events,
+    CLOSED_LIST: report_service.fetch_closed_events,
+    BOARD: report_service.fetch_board,
+}
+
+response_cache = ResponseCache()
+change_feed.add_listener(response_cache.on_change)
+
+
+async def cached_call(endpoint: str, func, location: str):
+    """
+    ``call_db(func, location)`` through the response cache. Error codes
+    (400 / 500) are returned as is and never cached.
+    """
+    # is_valid_location accepts "all" in any case; invalidate only knows "all"
+    if location.lower() == "all":
+        location = "all"
+    key = (endpoint, location)
+    result = response_cache.get(key, _MISSING)
+    if result is not _MISSING:
+        response_cache_hits.labels(endpoint=endpoint).inc()
+        return result
+
+    response_cache_misses.labels(endpoint=endpoint).inc()
+    generation = response_cache.generation
+    result = await call_db(func, location)
+    if not isinstance(result, int):
+        response_cache.set(key, result, generation)
+    return result
+
+
+def warm_response_cache(cache: ResponseCache = response_cache,
+                        margin: float = CACHE_WARM_INTERVAL + CACHE_WARM_JITTER) -> int:
+    """
+    Refresh the recently requested entries that would expire within
+    ``margin`` seconds, i.e. before the next run. Returns the number of
+    entries stored.
+    """
+    warmed = 0
+    for endpoint, location in cache.keys_to_warm(CACHE_WARM_WINDOW, margin):
+        generation = cache.generation
+        result = WARM_FETCHERS[endpoint](location)
+        if not isinstance(result, int):
+            cache.set((endpoint, location), result, generation)
+            warmed += 1
+    return warmed
@@ -0,0 +1,232 @@
+"""
+In-process feed of event changes for GET /report/stream.
+
+Writes in this process (acknowledge / submit / repair / auto-close) publish
+a change directly. Events inserted by either process (simulations here, CWA
+reports in data_ingestion) are picked up by EventWatcher, which polls for
+event rows past its watermark, re-reading recent ids the same way as
+alerting.suppression so rows committed out of id order are not missed.
+
+Listeners registered with add_listener (e.g. the response cache) see every
+change synchronously, whether or not a stream client is connected.
+
+publish may be called from any thread; changes are handed to the event loop
+bound in the lifespan and fanned out to one bounded queue per client.
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Callable, Optional
+from zoneinfo import ZoneInfo
+
+from prometheus_client import Counter, Gauge
+
+from alerting.regions import regions
+from alerting.suppression import CommitWatermark, taipei_now
+from app.db import get_mysql_connection
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+ACKNOWLEDGED = "acknowledged"
+REPORTED = "reported"
+CLOSED = "closed"
+AUTO_CLOSED = "auto_closed"
+# Sent instead of the changes a slow client missed; it should reload its lists
+RESYNC = "resync"
+
+SSE_QUEUE_SIZE = 100
+SSE_KEEPALIVE = 15
+NEW_EVENT_POLL_INTERVAL = 5
+WATCH_BATCH_SIZE = 500
+
+sse_clients = Gauge('sse_clients', 'Clients connected to GET /report/stream')
+event_changes_published = Counter(
+    'event_changes_published', 'Event changes published to the stream', ['type'])
+
+
+class ChangeFeed:
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: set[asyncio.Queue] = set()
+        self._listeners: list[Callable[[dict], None]] = []
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def close(self):
+        """End every open stream."""
+        for queue in list(self._subscribers):
+            queue.put_nowait(None)
+        self._loop = None
+
+    @asynccontextmanager
+    async def subscribe(self):
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size + 1)
+        self._subscribers.add(queue)
+        sse_clients.inc()
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+            sse_clients.dec()
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self._listeners.append(listener)
+
+    def publish(self, change: dict):
+        for listener in self._listeners:
+            try:
+                listener(change)
+            except Exception as e:
+                logger.error(f"Change listener failed: {e}")
+
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        event_changes_published.labels(type=change["type"]).inc()
+        try:
+            if asyncio.get_running_loop() is loop:
+                self._deliver(change)
+                return
+        except RuntimeError:
+            pass
+        try:
+            loop.call_soon_threadsafe(self._deliver, change)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            pass
+
+    def _deliver(self, change: dict):
+        for queue in list(self._subscribers):
+            if queue.qsize() >= self.queue_size:
+                # Slow client: drop what it has not read and tell it to reload
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": RESYNC})
+            else:
+                queue.put_nowait(change)
+
+
+change_feed = ChangeFeed()
+
+
+def publish_event_change(change_type: str, event_id: str):
+    region = regions.for_event_id(event_id)
+    change_feed.publish({
+        "type": change_type,
+        "event_id": event_id,
+        "region": region.name if region else None,
+        "at": datetime.now(ZoneInfo("Asia/Taipei")).strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+
+def format_sse(change: dict) -> str:
+    return f"event: {change['type']}\ndata: {json.dumps(change, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_changes(location: str):
+    """SSE body for one client; ``location`` is a region name or all."""
+    async with change_feed.subscribe() as queue:
+        yield ": connected\n\n"
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if change is None:
+                return
+            region = change.get("region")
+            if location.lower() == "all" or region is None or region == location:
+                yield format_sse(change)
+
+
+SQL_MAX_LOCATION_EQ_ID = "SELECT MAX(location_eq_id) AS max_id FROM event"
+
+SQL_EVENTS_SINCE = """
+    SELECT id AS event_id, location_eq_id, region, level, trigger_alert, create_at AS alert_time
+    FROM event
+    WHERE location_eq_id > %s
+    ORDER BY location_eq_id
+    LIMIT %s
+"""
+
+
+class EventWatcher:
+    """
+    Publishes a ``created`` change for every event row committed since the
+    previous poll. The first poll only records the current watermark.
+    """
+
+    def __init__(self):
+        self.watermark: Optional[CommitWatermark] = None
+        # Ids above the watermark floor that were already published
+        self._published: set[int] = set()
+        self._lock = threading.Lock()
+
+    def poll(self, cursor, now: Optional[datetime] = None) -> int:
+        now = now or taipei_now()
+        with self._lock:
+            if self.watermark is None:
+                cursor.execute(SQL_MAX_LOCATION_EQ_ID)
+                max_id = cursor.fetchone()["max_id"] or 0
+                self.watermark = CommitWatermark()
+                # Events committed before the first poll are not announced
+                self.watermark.reset(now, max_id, floor=max_id)
+                return 0
+
+            floor = self.watermark.floor()
+            after = floor
+            published = 0
+            while True:
+                cursor.execute(SQL_EVENTS_SINCE, (after, WATCH_BATCH_SIZE))
+                rows = cursor.fetchall()
+                for row in rows:
+                    location_eq_id = row["location_eq_id"]
+                    after = max(after, location_eq_id)
+                    self.watermark.advance(location_eq_id)
+                    if location_eq_id in self._published:
+                        continue
+                    self._published.add(location_eq_id)
+                    change_feed.publish({
+                        "type": CREATED,
+                        "event_id": row["event_id"],
+                        "region": row["region"],
+                        "level": row["level"],
+                        "trigger_alert": bool(row["trigger_alert"]),
+                        "alert_time": row["alert_time"].strftime("%Y-%m-%d %H:%M:%S"),
+                    })
+                    published += 1
+                if len(rows) < WATCH_BATCH_SIZE:
+                    break
+            self.watermark.synced(now)
+            # Ids at or below the floor are never read again
+            self._published = {i for i in self._published if i > floor}
+            return published
+
+
+event_watcher = EventWatcher()
+
+
+def poll_new_events(cursor=None):
+    """Scheduler job; also called right after a simulation is committed."""
+    try:
+        if cursor is not None:
+            event_watcher.poll(cursor)
+            return
+        conn = get_mysql_connection()
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cursor:
+                event_watcher.poll(cursor)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error("Failed to poll for new events")
+        logger.exception(e)
@@ -2,3 +2,28 @@
 DEBUG_MODE = False
 
 DEFAULT_ALERT_SUPPRESS = 30
+# Seconds the alert suppress setting is cached per process
+SETTINGS_CACHE_TTL = 60
+
+# Max rows closed per UPDATE by auto_close_unprocessed_events
+AUTO_CLOSE_BATCH_SIZE = 500
+
+# GET /earthquake/simulation page size (default / max)
+SIMULATION_PAGE_SIZE = 50
+SIMULATION_PAGE_MAX = 500
+
+# POST /earthquake/simulate/batch: max earthquakes per scenario, and
+# earthquakes committed per transaction
+SIMULATION_BATCH_MAX = 2000
+SIMULATION_BATCH_CHUNK = 100
+
+# Max event ids per POST /report/*/batch request
+REPORT_BATCH_MAX = 200
+
+# /report/* list responses are cached per (endpoint, location) for this many
+# seconds, and dropped earlier when an event of that location changes
+RESPONSE_CACHE_TTL = 5
+RESPONSE_CACHE_SIZE = 256
+# Entries requested within this many seconds are refreshed by the scheduler
+# before they expire
+CACHE_WARM_WINDOW = 60
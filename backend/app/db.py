@@ -1,26 +1,222 @@
 import logging
 import os
+import threading
+import time
+from collections import deque
+
 import pymysql
+from pymysql.constants import SERVER_STATUS
 from pymysql.err import OperationalError
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.query_stats import InstrumentedCursor
 
 logger = logging.getLogger(__name__)
 
+# Upper bound of physical connections held by one backend process
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# Seconds a request waits for a free connection before giving up
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+# Idle connections older than this (seconds) are closed instead of reused
+POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300))
+# Connections idle longer than this (seconds) are pinged before being handed out
+POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", 30))
+
+db_pool_connections = Gauge(
+    'db_pool_connections', 'MySQL connections held by the pool', ['state'])
+db_pool_wait_seconds = Histogram(
+    'db_pool_wait_seconds', 'Time spent waiting to borrow a pooled MySQL connection')
+db_pool_timeouts = Counter(
+    'db_pool_timeouts', 'Borrow attempts that gave up waiting for a free connection')
+db_pool_evictions = Counter(
+    'db_pool_evictions', 'Pooled MySQL connections discarded', ['reason'])
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def _connect(**options) -> pymysql.Connection:
+    """Open a connection; ``options`` are passed on to pymysql.connect (e.g. timeouts)."""
+    return pymysql.connect(
+        host=os.getenv("DB_HOST", ""),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", ""),
+        cursorclass=pymysql.cursors.DictCursor,
+        # Runs on every (re)connect, so pooled connections keep Taiwan time
+        init_command="SET time_zone = '+08:00'",
+        **options,
+    )
+
+
+def _discard(conn: pymysql.Connection, reason: str):
+    db_pool_evictions.labels(reason=reason).inc()
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of PyMySQL connections.
+
+    Connections are created lazily up to ``max_size``; callers block for at
+    most ``timeout`` seconds when every connection is borrowed.
+    """
+
+    def __init__(self, connect=_connect, max_size: int = POOL_MAX_SIZE, timeout: float = POOL_TIMEOUT,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT, ping_interval: float = POOL_PING_INTERVAL):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+
+        self._idle: deque[tuple[pymysql.Connection, float]] = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def _update_gauges(self):
+        db_pool_connections.labels(state="idle").set(len(self._idle))
+        db_pool_connections.labels(state="in_use").set(
+            self._size - len(self._idle))
+
+    def _pop_expired(self, now: float) -> list:
+        # Oldest idle connections sit at the left end of the deque
+        expired = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+        return expired
+
+    def _checkout(self, deadline: float):
+        """Return ``(conn, last_used)`` or ``(None, None)`` when a new connection may be opened."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                expired = self._pop_expired(now)
+                if expired:
+                    self._cond.notify(len(expired))
+                    break
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._update_gauges()
+                    return conn, last_used
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._update_gauges()
+                    return None, None
+                remaining = deadline - now
+                if remaining <= 0:
+                    db_pool_timeouts.inc()
+                    raise PoolTimeout(
+                        f"No MySQL connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+
+        # Close expired connections outside the lock, then try again
+        for conn in expired:
+            _discard(conn, "idle")
+        return self._checkout(deadline)
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._update_gauges()
+            self._cond.notify()
+
+    def acquire(self) -> pymysql.Connection:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            conn, last_used = self._checkout(deadline)
+            if conn is None:
+                db_pool_wait_seconds.observe(time.monotonic() - start)
+                try:
+                    return self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+
+            if time.monotonic() - last_used <= self.ping_interval:
+                db_pool_wait_seconds.observe(time.monotonic() - start)
+                return conn
+            try:
+                conn.ping(reconnect=False)
+                db_pool_wait_seconds.observe(time.monotonic() - start)
+                return conn
+            except Exception:
+                logger.warning("Discarding unhealthy pooled MySQL connection")
+                _discard(conn, "unhealthy")
+                self._forget()
+
+    def release(self, conn: pymysql.Connection):
+        healthy = conn.open
+        if healthy and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            # Drop uncommitted work and the read snapshot before reuse
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+
+        if not healthy:
+            _discard(conn, "broken")
+            self._forget()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._update_gauges()
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._update_gauges()
+        for conn in idle:
+            _discard(conn, "shutdown")
+
+
+class PooledConnection:
+    """
+    Borrowed connection. Behaves like ``pymysql.Connection`` except that
+    ``close()`` hands the connection back to the pool and cursors record
+    their statements in the current request's QueryStats.
+    """
+
+    def __init__(self, pool: ConnectionPool, conn: pymysql.Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self._conn.cursor(*args))
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+pool = ConnectionPool()
+
 
 def get_mysql_connection():
     try:
-        conn = pymysql.connect(
-            host=os.getenv("DB_HOST", ""),
-            port=int(os.getenv("DB_PORT", 3306)),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            database=os.getenv("DB_NAME", ""),
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        with conn.cursor() as cursor:
-            cursor.execute("SET time_zone = '+08:00'")
-        
-        return conn
-    except OperationalError as e:
+        return PooledConnection(pool, pool.acquire())
+    except (OperationalError, PoolTimeout) as e:
         logger.error("MySQL connection error")
         logger.exception(e)
         return None
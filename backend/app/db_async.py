@@ -0,0 +1,90 @@
+import asyncio
+import inspect
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from app.db import POOL_MAX_SIZE, POOL_IDLE_TIMEOUT
+from app.query_stats import AsyncInstrumentedConnection
+
+logger = logging.getLogger(__name__)
+
+# Set USE_ASYNC_DB=true to serve the report endpoints through aiomysql
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() == "true"
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool():
+    """
+    Lazily create the aiomysql pool on the running event loop.
+    aiomysql is only required when USE_ASYNC_DB is enabled.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    async with _pool_lock:
+        if _pool is None:
+            import aiomysql
+
+            _pool = await aiomysql.create_pool(
+                host=os.getenv("DB_HOST", ""),
+                port=int(os.getenv("DB_PORT", 3306)),
+                user=os.getenv("DB_USER", "root"),
+                password=os.getenv("DB_PASSWORD", ""),
+                db=os.getenv("DB_NAME", ""),
+                minsize=1,
+                maxsize=int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", POOL_MAX_SIZE * 10)),
+                pool_recycle=POOL_IDLE_TIMEOUT,
+                cursorclass=aiomysql.DictCursor,
+                init_command="SET time_zone = '+08:00'",
+            )
+    return _pool
+
+
+@asynccontextmanager
+async def get_async_mysql_connection():
+    """
+    Borrow an aiomysql connection, or ``None`` when MySQL is unreachable
+    (mirrors ``get_mysql_connection``). Uncommitted work is rolled back when
+    the connection goes back to the pool.
+    """
+    try:
+        pool = await get_async_pool()
+        conn = await pool.acquire()
+    except Exception as e:
+        logger.error("MySQL connection error")
+        logger.exception(e)
+        yield None
+        return
+
+    try:
+        yield AsyncInstrumentedConnection(conn)
+    finally:
+        if conn.get_transaction_status():
+            try:
+                await conn.rollback()
+            except Exception:
+                conn.close()
+        pool.release(conn)
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def call_db(func, *args, **kwargs):
+    """
+    Await ``func`` if it is a coroutine function, otherwise run the blocking
+    PyMySQL implementation in the threadpool.
+    """
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_in_threadpool(func, *args, **kwargs)
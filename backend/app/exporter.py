@@ -1,21 +1,21 @@
-from ast import parse
-from calendar import c
-import sched
-from datetime import datetime
-import threading
-import time
+from datetime import datetime, timedelta
 from typing import Dict
-from prometheus_client import Gauge
+from zoneinfo import ZoneInfo
+from prometheus_client import Gauge, Histogram
 from pydantic import BaseModel
 
-import logging
 
+from alerting.regions import regions
+from alerting.suppression import SYNC_LOOKBACK
 from app.db import get_mysql_connection
+from app.leader import leader
+from app.scheduler import run_job_now
 
-logger = logging.getLogger('uvicorn')
-
-AREAS = ["Taipei", "Hsinchu", "Taichung", "Tainan"]
-UPDATE_INTERVAL = 3
+# Earthquakes stored by this process refresh the exporter immediately (see
+# notify_new_earthquake); polling only catches ones written by data_ingestion
+FALLBACK_UPDATE_INTERVAL = 30
+# Scheduler job id of update_new_data
+EXPORTER_JOB_ID = "exporter_refresh"
 
 earthquake_time = Gauge(
     'earthquake_time', 'Unix timestamp of the last earthquake')
@@ -30,6 +30,20 @@ earthquake_latitude = Gauge('earthquake_latitude',
 earthquake_intensity = Gauge(
     'earthquake_intensity', 'Intensity of the last earthquake by location', ['location'])
 
+LATENCY_BUCKETS = (30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 14400)
+event_ack_latency_seconds = Histogram(
+    'event_ack_latency_seconds', 'Seconds from alert to acknowledgement, per closed event',
+    ['region'], buckets=LATENCY_BUCKETS)
+event_report_latency_seconds = Histogram(
+    'event_report_latency_seconds', 'Seconds from acknowledgement to damage report, per closed event',
+    ['region'], buckets=LATENCY_BUCKETS)
+event_repair_latency_seconds = Histogram(
+    'event_repair_latency_seconds', 'Seconds from damage report to repaired, per closed event',
+    ['region'], buckets=LATENCY_BUCKETS)
+event_process_time_minutes = Histogram(
+    'event_process_time_minutes', 'process_time of events closed by a dispatcher',
+    ['region'], buckets=(1, 5, 10, 15, 30, 60, 120, 240))
+
 
 class Earthquake(BaseModel):
     earthquake_id: int = 0
@@ -42,7 +56,6 @@ class Earthquake(BaseModel):
 
 
 last_earthquake = Earthquake()
-my_scheduler = sched.scheduler(time.time, time.sleep)
 
 
 def update_metric(data: Earthquake):
@@ -52,7 +65,7 @@ def update_metric(data: Earthquake):
     earthquake_longitude.set(data.longitude)
     earthquake_latitude.set(data.latitude)
 
-    for location in AREAS:
+    for location in regions.names():
         earthquake_intensity.labels(location=location).set(
             data.intensity.get(location, '0'))
 
@@ -69,47 +82,134 @@ def parse_earthquake(result) -> Earthquake:
     return parsed_earthquake
 
 
+def notify_new_earthquake():
+    """
+    Call after committing a new earthquake so the gauges are refreshed
+    right away instead of at the next fallback poll.
+    """
+    run_job_now(EXPORTER_JOB_ID)
+
+
+class ClosedEventTracker:
+    """
+    Feeds the latency histograms from events closed since the exporter
+    started. Each refresh reads only rows near the ``closed_at`` watermark,
+    so the event table is never rescanned.
+
+    ``closed_at`` is set before the closing transaction commits, so a close
+    can become visible after later ones were read. Each refresh therefore
+    re-reads from SYNC_LOOKBACK behind the watermark and skips the ids it
+    already counted there.
+
+    Only the leader process updates it, so each closed event is observed
+    once across backend processes.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, lookback: timedelta = SYNC_LOOKBACK):
+        self.lookback = lookback
+        self.reset()
+
+    def reset(self):
+        """Start counting from now, skipping events closed before."""
+        # closed_at is stored in Taiwan local time without a zone
+        self.started_at = datetime.now(
+            ZoneInfo("Asia/Taipei")).replace(tzinfo=None, microsecond=0)
+        self.watermark = self.started_at
+        # Events already counted, by id, with their closed_at
+        self._seen: Dict[str, datetime] = {}
+
+    def floor(self) -> datetime:
+        return max(self.started_at, self.watermark - self.lookback)
+
+    def observe(self, row):
+        region = row["region"]
+        if row["ack_time"]:
+            event_ack_latency_seconds.labels(region=region).observe(
+                (row["ack_time"] - row["create_at"]).total_seconds())
+        if row["ack_time"] and row["report_at"]:
+            event_report_latency_seconds.labels(region=region).observe(
+                (row["report_at"] - row["ack_time"]).total_seconds())
+        # process_time = -1 表示未處理（自動結案），不計入處理時間
+        if row["process_time"] is not None and row["process_time"] >= 0:
+            if row["report_at"]:
+                event_repair_latency_seconds.labels(region=region).observe(
+                    (row["closed_at"] - row["report_at"]).total_seconds())
+            event_process_time_minutes.labels(
+                region=region).observe(row["process_time"])
+
+    def update(self, cursor):
+        floor = self.floor().strftime("%Y-%m-%d %H:%M:%S")
+        after = (floor, "")
+        while True:
+            # closed_at >= floor keeps the scan on idx_event_done_closed
+            cursor.execute("""
+                SELECT id, region, create_at, ack_time, report_at, closed_at, process_time
+                FROM event
+                WHERE is_done = TRUE AND closed_at >= %s AND (closed_at, id) > (%s, %s)
+                ORDER BY closed_at, id
+                LIMIT %s
+            """, (floor, *after, self.PAGE_SIZE))
+            rows = cursor.fetchall()
+
+            for row in rows:
+                if row["id"] in self._seen:
+                    continue
+                self.observe(row)
+                self._seen[row["id"]] = row["closed_at"]
+                self.watermark = max(self.watermark, row["closed_at"])
+
+            if len(rows) < self.PAGE_SIZE:
+                break
+            after = (rows[-1]["closed_at"].strftime("%Y-%m-%d %H:%M:%S"), rows[-1]["id"])
+
+        cutoff = self.floor()
+        self._seen = {event_id: closed_at for event_id, closed_at in self._seen.items()
+                      if closed_at >= cutoff}
+
+
+closed_event_tracker = ClosedEventTracker()
+
+
+def update_last_earthquake(cursor):
+    global last_earthquake
+
+    cursor.execute(
+        "SELECT * FROM earthquake ORDER BY earthquake_time DESC LIMIT 1")
+    result = cursor.fetchone()
+    if not result or result["id"] == last_earthquake.earthquake_id:
+        return
+
+    earthquake = parse_earthquake(result)
+    cursor.execute(
+        "SELECT location, intensity FROM earthquake_location WHERE earthquake_id = %s AND location IN %s",
+        (earthquake.earthquake_id, regions.names()))
+    for row in cursor.fetchall():
+        earthquake.intensity[row["location"]] = row["intensity"]
+
+    update_metric(earthquake)
+    last_earthquake = earthquake
+
+
 def update_new_data():
     conn = get_mysql_connection()
     if conn is None:
-        logger.error('MySQL connection error')
-        my_scheduler.enter(UPDATE_INTERVAL, 1, update_new_data)
-        return
+        raise ConnectionError('MySQL connection error')
     try:
         with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT * FROM earthquake ORDER BY earthquake_time DESC LIMIT 1")
-            result = cursor.fetchone()
-
-            if result:
-                earthquake = parse_earthquake(result)
-
-                for area in AREAS:
-                    cursor.execute(
-                        "SELECT intensity FROM earthquake_location WHERE earthquake_id = %s AND location = %s",
-                        (earthquake.earthquake_id, area))
-                    result = cursor.fetchone()
-                    if result:
-                        earthquake.intensity[area] = result["intensity"]
-
-                if earthquake.earthquake_id != last_earthquake.earthquake_id:
-                    update_metric(earthquake)
-    except Exception as e:
-        logger.error(f"Error fetching last earthquake: {e}")
-        return
+            # Also keeps the backend's region registry fresh
+            regions.reload_if_stale(cursor)
+            update_last_earthquake(cursor)
+            if leader.is_leader:
+                closed_event_tracker.update(cursor)
+            else:
+                # Another process observes them; resume from now if elected
+                closed_event_tracker.reset()
     finally:
         conn.close()
 
-    my_scheduler.enter(UPDATE_INTERVAL, 1, update_new_data)
-
-
-def setup_scheduler():
-    my_scheduler.enter(0, 1, update_new_data)
-    my_scheduler.run()
-
 
 def setup_exporter():
+    """Publish the initial gauges; app.main schedules update_new_data."""
     update_metric(last_earthquake)
-
-    thread = threading.Thread(target=setup_scheduler, daemon=True)
-    thread.start()
@@ -0,0 +1,114 @@
+"""
+Leader election between backend processes (uvicorn workers or replicas).
+
+Every process serves requests and runs the scheduler. Two things run only in
+the leader, the process holding the MySQL named lock LEADER_LOCK: the
+auto-close job (``leader_only`` in app.scheduler), and the closed-event
+latency histograms, which the exporter refresh in every other process skips
+(see update_new_data in app.exporter). The rest of that refresh, and every
+other job, runs everywhere.
+
+The lock is taken with GET_LOCK on a dedicated connection outside the pool,
+so it lives exactly as long as that session. On every check the leader
+confirms with IS_USED_LOCK that its session still holds it. The connection
+has read / write timeouts, so a hung server fails the check instead of
+blocking it. If the leader dies or loses its connection MySQL frees the
+lock, and another process takes it at its next check.
+
+A leader notices a lost lock only at its next check, so for up to
+LEADER_CHECK_INTERVAL (plus LEADER_DB_TIMEOUT) seconds two processes may
+both act as leader. Auto-close only changes rows still in the state it
+expects, so an overlap costs duplicate work, not wrong data; a closed event
+may be counted twice in the histograms.
+
+Set LEADER_ELECTION=false to make every process the leader.
+"""
+import logging
+import os
+import threading
+
+from prometheus_client import Gauge
+
+from app.db import _connect
+
+logger = logging.getLogger(__name__)
+
+LEADER_ELECTION = os.getenv("LEADER_ELECTION", "true").lower() == "true"
+LEADER_LOCK = "earthquake_dispatcher_scheduler_leader"
+# Seconds between lock attempts by followers and checks by the leader
+LEADER_CHECK_INTERVAL = int(os.getenv("LEADER_CHECK_INTERVAL", 10))
+# Seconds a lock query may take before the check fails and the process steps down
+LEADER_DB_TIMEOUT = int(os.getenv("LEADER_DB_TIMEOUT", 5))
+
+scheduler_leader = Gauge(
+    'scheduler_leader', '1 when this process runs the leader-only periodic jobs')
+
+
+def _lock_connection():
+    return _connect(connect_timeout=LEADER_DB_TIMEOUT, read_timeout=LEADER_DB_TIMEOUT,
+                    write_timeout=LEADER_DB_TIMEOUT)
+
+
+class LeaderElection:
+    def __init__(self, name: str = LEADER_LOCK, connect=_lock_connection, enabled: bool = LEADER_ELECTION):
+        self.name = name
+        self._connect = connect
+        self.enabled = enabled
+        self.is_leader = not enabled
+        self._conn = None
+        self._lock = threading.Lock()
+        scheduler_leader.set(int(self.is_leader))
+
+    def _set_leader(self, is_leader: bool):
+        if is_leader != self.is_leader:
+            logger.info("Became scheduler leader" if is_leader else "Lost scheduler leadership")
+        self.is_leader = is_leader
+        scheduler_leader.set(int(is_leader))
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def check(self) -> bool:
+        """Take the lock if it is free, or confirm it is still held. Blocking."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                with self._conn.cursor() as cursor:
+                    if self.is_leader:
+                        cursor.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID() AS held", (self.name,))
+                        held = bool(cursor.fetchone()["held"])
+                    else:
+                        # Timeout 0: followers never wait, they try again at the next check
+                        cursor.execute("SELECT GET_LOCK(%s, 0) AS held", (self.name,))
+                        held = bool(cursor.fetchone()["held"])
+                self._set_leader(held)
+            except Exception as e:
+                logger.error(f"Leader election check failed: {e}")
+                self._drop_connection()
+                self._set_leader(False)
+            return self.is_leader
+
+    def release(self):
+        """Give up leadership so another process can take over right away."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._conn is not None and self.is_leader:
+                try:
+                    with self._conn.cursor() as cursor:
+                        cursor.execute("SELECT RELEASE_LOCK(%s)", (self.name,))
+                except Exception as e:
+                    logger.error(f"Failed to release the leader lock: {e}")
+            self._drop_connection()
+            self._set_leader(False)
+
+
+leader = LeaderElection()
@@ -1,9 +1,19 @@
+import asyncio
 import logging
-from app.db import check_mysql_connection
-from app.exporter import setup_exporter
-from apscheduler.schedulers.background import BackgroundScheduler
-from zoneinfo import ZoneInfo
+from contextlib import asynccontextmanager
+from app.change_feed import NEW_EVENT_POLL_INTERVAL, change_feed, poll_new_events
+from app.db import check_mysql_connection, pool
+from app.db_async import close_async_pool
+from app.query_stats import QueryStatsMiddleware
+from app.migrations import RUN_MIGRATIONS, apply_migrations
+from starlette.concurrency import run_in_threadpool
+from app.cache import CACHE_WARM_INTERVAL, CACHE_WARM_JITTER, warm_response_cache
+from app.exporter import EXPORTER_JOB_ID, FALLBACK_UPDATE_INTERVAL, setup_exporter, update_new_data
+from app.leader import LEADER_CHECK_INTERVAL, leader
+from app.scheduler import PeriodicJob, shutdown_scheduler, start_scheduler
 from app.services.report_service import auto_close_unprocessed_events
+from app.services.earthquake_service import rebuild_suppression_index
+from app.services.settings_service import load_regions
 
 from prometheus_client import make_asgi_app
 
@@ -18,7 +28,32 @@ logging.basicConfig(
     format="%(name)s - %(levelname)s - %(message)s",
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if RUN_MIGRATIONS:
+        await run_in_threadpool(apply_migrations)
+    await run_in_threadpool(load_regions)
+    await run_in_threadpool(rebuild_suppression_index)
+    change_feed.bind(asyncio.get_running_loop())
+    await run_in_threadpool(poll_new_events)
+    start_scheduler([
+        PeriodicJob("leader_check", leader.check, LEADER_CHECK_INTERVAL, jitter=1, run_at_start=True),
+        PeriodicJob("auto_close", auto_close_unprocessed_events, 60, jitter=5, leader_only=True),
+        # Events written by data_ingestion reach GET /report/stream through this poll
+        PeriodicJob("event_poll", poll_new_events, NEW_EVENT_POLL_INTERVAL, jitter=1),
+        PeriodicJob(EXPORTER_JOB_ID, update_new_data, FALLBACK_UPDATE_INTERVAL, jitter=3, run_at_start=True),
+        PeriodicJob("cache_warmup", warm_response_cache, CACHE_WARM_INTERVAL, jitter=CACHE_WARM_JITTER),
+    ])
+    yield
+    shutdown_scheduler()
+    await run_in_threadpool(leader.release)
+    change_feed.close()
+    await close_async_pool()
+    pool.close_all()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(earthquake.router)
 app.include_router(settings.router)
 app.include_router(report.router)
@@ -30,11 +65,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # DEBUG_MODE adds the per-request SQL statistics as response headers;
+    # X-Next-Before* are the GET /earthquake/simulation page cursor
+    expose_headers=["Server-Timing", "X-DB-Statements", "X-Next-Before", "X-Next-Before-Id"],
 )
-
-scheduler = BackgroundScheduler(timezone=ZoneInfo("Asia/Taipei"))
-scheduler.add_job(auto_close_unprocessed_events, 'interval', minutes=1)
-scheduler.start()
+# Added last so it wraps CORS and times the whole request
+app.add_middleware(QueryStatsMiddleware)
 
 
 @app.get("/")
@@ -0,0 +1,113 @@
+"""
+Versioned schema migrations.
+
+Each ``mysql/migrations/NNN_description.sql`` file is applied once, in file
+name order, and recorded in the ``schema_migrations`` table. Fresh databases
+built from ``create_schema.sql`` are created already up to date and have the
+bundled versions pre-recorded.
+
+Run manually with ``python -m app.migrations``; the backend also applies
+pending migrations on startup unless RUN_MIGRATIONS=false.
+
+MySQL commits DDL implicitly, so a migration that fails half way is not
+rolled back. Keep each file small and re-check the schema before re-running.
+"""
+import logging
+import os
+from pathlib import Path
+
+from app.db import get_mysql_connection
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(os.getenv(
+    "MIGRATIONS_DIR", Path(__file__).resolve().parent.parent / "mysql" / "migrations"))
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "true").lower() == "true"
+
+# Serialises migrations when several backend processes start at once
+MIGRATION_LOCK = "earthquake_dispatcher_migrations"
+MIGRATION_LOCK_TIMEOUT = 60
+
+SQL_CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(255) PRIMARY KEY,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def split_statements(sql: str) -> list[str]:
+    """
+    Split a migration file into statements. Only ``--`` line comments and
+    ``;`` at the end of a line are understood, which is all our files use.
+    """
+    statements = []
+    current = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("--"):
+            continue
+        current.append(line)
+        if stripped.endswith(";"):
+            statements.append("\n".join(current).rstrip().rstrip(";"))
+            current = []
+    if current:
+        statements.append("\n".join(current))
+    return statements
+
+
+def available_migrations(directory: Path = MIGRATIONS_DIR) -> list[Path]:
+    return sorted(directory.glob("*.sql"))
+
+
+def apply_migrations(directory: Path = MIGRATIONS_DIR) -> list[str]:
+    """
+    Apply every migration not yet recorded in ``schema_migrations``.
+    Returns the versions applied by this call.
+    """
+    conn = get_mysql_connection()
+    if not conn:
+        logger.error("Cannot run migrations without a database connection")
+        return []
+
+    applied_now = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, %s) AS locked",
+                           (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+            if not cursor.fetchone()["locked"]:
+                logger.error("Timed out waiting for the migration lock")
+                return []
+            try:
+                cursor.execute(SQL_CREATE_MIGRATIONS_TABLE)
+                cursor.execute("SELECT version FROM schema_migrations")
+                applied = {row["version"] for row in cursor.fetchall()}
+
+                for path in available_migrations(directory):
+                    version = path.stem
+                    if version in applied:
+                        continue
+                    logger.info(f"Applying migration {version}")
+                    for statement in split_statements(path.read_text(encoding="utf-8")):
+                        cursor.execute(statement)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                    conn.commit()
+                    applied_now.append(version)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+    except Exception as e:
+        logger.error("Migration failed")
+        logger.exception(e)
+    finally:
+        conn.close()
+
+    if applied_now:
+        logger.info(f"Applied migrations: {applied_now}")
+    return applied_now
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format="%(name)s - %(levelname)s - %(message)s")
+    apply_migrations()
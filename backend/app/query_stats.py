@@ -0,0 +1,194 @@
+"""
+Per-request SQL statistics.
+
+Cursors handed out by get_mysql_connection (and get_async_mysql_connection)
+are wrapped so every statement adds its duration and result rows to the
+QueryStats of the current request. QueryStatsMiddleware puts a fresh
+QueryStats in a context variable for each HTTP request; sync services run
+in the threadpool with a copy of that context, which still refers to the
+same QueryStats object. Statements outside a request (scheduler jobs) are
+not recorded.
+
+Per-route histograms are exported on /metrics; with DEBUG_MODE the numbers
+are also returned in Server-Timing / X-DB-Statements response headers.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Histogram
+
+from app.constants import DEBUG_MODE
+
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route'])
+http_request_db_seconds = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL statements per HTTP request', ['method', 'route'])
+http_request_db_statements = Histogram(
+    'http_request_db_statements', 'SQL statements executed per HTTP request', ['method', 'route'],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 100))
+http_request_db_rows = Histogram(
+    'http_request_db_rows', 'Rows returned by SQL statements per HTTP request', ['method', 'route'],
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000))
+
+
+class QueryStats:
+    __slots__ = ("statements", "seconds", "rows")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+    def add(self, seconds: float, rows: int):
+        self.statements += 1
+        self.seconds += seconds
+        self.rows += rows
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _record(start: float, cursor):
+    stats = _current.get()
+    if stats is None:
+        return
+    # Only statements with a result set return rows; rowcount of an UPDATE is affected rows
+    rows = max(cursor.rowcount or 0, 0) if cursor.description else 0
+    stats.add(time.perf_counter() - start, rows)
+
+
+class InstrumentedCursor:
+    """PyMySQL cursor that records its statements in the current QueryStats."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            _record(start, self._cursor)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            _record(start, self._cursor)
+
+
+class AsyncInstrumentedCursor(InstrumentedCursor):
+    """aiomysql counterpart of InstrumentedCursor."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._cursor.close()
+
+    async def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.execute(query, args)
+        finally:
+            _record(start, self._cursor)
+
+    async def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.executemany(query, args)
+        finally:
+            _record(start, self._cursor)
+
+
+class _AsyncCursorContext:
+    def __init__(self, cursor_context):
+        self._cursor_context = cursor_context
+
+    async def __aenter__(self):
+        return AsyncInstrumentedCursor(await self._cursor_context.__aenter__())
+
+    async def __aexit__(self, *exc_info):
+        return await self._cursor_context.__aexit__(*exc_info)
+
+
+class AsyncInstrumentedConnection:
+    """aiomysql connection whose ``async with conn.cursor()`` yields instrumented cursors."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args):
+        return _AsyncCursorContext(self._conn.cursor(*args))
+
+
+def _route_label(scope) -> Optional[str]:
+    # FastAPI stores the matched route in the scope; unmatched paths and mounts are skipped
+    route = scope.get("route")
+    return getattr(route, "path", None)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware, so streaming responses are not buffered."""
+
+    def __init__(self, app, debug_headers: bool = DEBUG_MODE):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        streaming = False
+        start = time.perf_counter()
+
+        async def send_with_stats(message):
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                streaming = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                for name, value in headers)
+                if self.debug_headers:
+                    headers.append((b"server-timing", (
+                        f'db;dur={stats.seconds * 1000:.2f};'
+                        f'desc="{stats.statements} statements, {stats.rows} rows"').encode()))
+                    headers.append((b"x-db-statements", str(stats.statements).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
+            route = _route_label(scope)
+            # A Server-Sent Events stream lasts as long as the client stays connected
+            if route and not streaming:
+                labels = {"method": scope["method"], "route": route}
+                http_request_duration_seconds.labels(**labels).observe(time.perf_counter() - start)
+                http_request_db_seconds.labels(**labels).observe(stats.seconds)
+                http_request_db_statements.labels(**labels).observe(stats.statements)
+                http_request_db_rows.labels(**labels).observe(stats.rows)
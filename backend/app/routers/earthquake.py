@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
 
 from fastapi.responses import JSONResponse
-from app.schemas.earthquake import EarthquakeIngestRequest, EarthquakeSimulationOut
-from app.services.earthquake_service import process_earthquake_and_locations, fetch_all_simulated_earthquakes
+from app.constants import SIMULATION_PAGE_MAX, SIMULATION_PAGE_SIZE
+from app.db_async import call_db
+from app.schemas.earthquake import EarthquakeIngestRequest, EarthquakeScenarioRequest, EarthquakeSimulationOut
+from app.services.earthquake_service import (process_earthquake_and_locations, process_earthquake_scenario,
+                                             fetch_all_simulated_earthquakes)
 
 router = APIRouter(
     prefix="/earthquake",
@@ -12,8 +16,8 @@ router = APIRouter(
 
 
 @router.post("/simulate")
-def ingest_earthquake(req: EarthquakeIngestRequest):
-    success = process_earthquake_and_locations(req)
+async def ingest_earthquake(req: EarthquakeIngestRequest):
+    success = await call_db(process_earthquake_and_locations, req)
     
     if success == 400:
         raise HTTPException(status_code=400, detail="Cannot simulate earthquake earlier than 1 hour ago")
@@ -28,11 +32,33 @@ def ingest_earthquake(req: EarthquakeIngestRequest):
         )
 
 
-@router.get("/simulation", response_model=List[EarthquakeSimulationOut])
-def get_simulated_earthquakes():
-    results = fetch_all_simulated_earthquakes()
+@router.post("/simulate/batch",
+             description="一次模擬整個情境：earthquakes 列表，和 / 或 aftershocks（主震＋依速率與規模分布產生的餘震）。"
+                         "依時間排序後分批寫入，每批一個交易")
+async def ingest_earthquake_scenario(req: EarthquakeScenarioRequest):
+    summary = await call_db(process_earthquake_scenario, req)
+
+    if summary == 400:
+        raise HTTPException(status_code=400, detail="Cannot simulate earthquake earlier than 1 hour ago")
+    if summary == 500:
+        raise HTTPException(status_code=500, detail="Error occurred")
+    return summary
+
+
+@router.get("/simulation", response_model=List[EarthquakeSimulationOut],
+            description="回應標頭 X-Next-Before、X-Next-Before-Id 為下一頁的 before、before_id 參數")
+async def get_simulated_earthquakes(
+        limit: int = Query(SIMULATION_PAGE_SIZE, ge=1, le=SIMULATION_PAGE_MAX),
+        before: Optional[datetime] = Query(None, description="只取地震時間早於此時間的模擬地震"),
+        before_id: Optional[int] = Query(None, description="與 before 同時間的地震中，只取 id 小於此值者")):
+    results = await call_db(fetch_all_simulated_earthquakes, limit, before, before_id)
 
     if results == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
 
-    return results
+    headers = {}
+    if len(results) == limit:
+        headers["X-Next-Before"] = results[-1]["earthquake"]["earthquake_time"]
+        headers["X-Next-Before-Id"] = str(results[-1]["earthquake_id"])
+    content = [EarthquakeSimulationOut.model_validate(item).model_dump(mode="json") for item in results]
+    return JSONResponse(content=content, headers=headers)
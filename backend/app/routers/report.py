@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Query, HTTPException
-from app.schemas.report import AcknowledgeRequest, SubmitReportRequest, RepairEventRequest
-from app.services.report_service import fetch_unacknowledged_events, acknowledge_event_by_id, fetch_acknowledged_events, update_event_status, fetch_in_process_events, mark_event_as_repaired, fetch_closed_events
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.cache import BOARD, CLOSED_LIST, IN_PROCESS, PENDING, UNACKNOWLEDGED, cached_call
+from app.change_feed import stream_changes
+from app.db_async import USE_ASYNC_DB, call_db
+from app.schemas.report import (AcknowledgeRequest, BatchAcknowledgeRequest, BatchRepairEventRequest,
+                                BatchSubmitReportRequest, RepairEventRequest, SubmitReportRequest)
+from app.services.report_service import board_etag, is_valid_location
+
+if USE_ASYNC_DB:
+    from app.services.report_service_async import fetch_board, fetch_unacknowledged_events, acknowledge_event_by_id, fetch_acknowledged_events, update_event_status, fetch_in_process_events, mark_event_as_repaired, fetch_closed_events, acknowledge_events, update_events_status, mark_events_as_repaired
+else:
+    from app.services.report_service import fetch_board, fetch_unacknowledged_events, acknowledge_event_by_id, fetch_acknowledged_events, update_event_status, fetch_in_process_events, mark_event_as_repaired, fetch_closed_events, acknowledge_events, update_events_status, mark_events_as_repaired
 
 router = APIRouter(prefix="/report", tags=["report"])
 
 
 @router.get("/unacknowledged")
-def get_unacknowledged_events(location: str = Query(..., description="Taipei / Hsinchu / Taichung / Tainan / all")):
-    results = fetch_unacknowledged_events(location)
+async def get_unacknowledged_events(location: str = Query(..., description="地區名稱（見 GET /settings/regions）或 all")):
+    results = await cached_call(UNACKNOWLEDGED, fetch_unacknowledged_events, location)
     if results == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
     if results == 400:
@@ -16,8 +27,8 @@ def get_unacknowledged_events(location: str = Query(..., description="Taipei / H
 
 
 @router.post("/acknowledge")
-def acknowledge_event(payload: AcknowledgeRequest):
-    success = acknowledge_event_by_id(payload.event_id)
+async def acknowledge_event(payload: AcknowledgeRequest):
+    success = await call_db(acknowledge_event_by_id, payload.event_id)
     if success == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
 
@@ -27,8 +38,8 @@ def acknowledge_event(payload: AcknowledgeRequest):
 
 
 @router.get("/pending")
-def get_acknowledged_events(location: str = Query(..., description="Taipei / Hsinchu / Taichung / Tainan / all")):
-    results = fetch_acknowledged_events(location)
+async def get_acknowledged_events(location: str = Query(..., description="地區名稱（見 GET /settings/regions）或 all")):
+    results = await cached_call(PENDING, fetch_acknowledged_events, location)
     if results == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
     if results == 400:
@@ -37,19 +48,21 @@ def get_acknowledged_events(location: str = Query(..., description="Taipei / Hsi
 
 
 @router.post("/submit")
-def submit_report(request: SubmitReportRequest):
-    success = update_event_status(
-        request.event_id, request.damage, request.operation_active)
+async def submit_report(request: SubmitReportRequest):
+    success = await call_db(
+        update_event_status, request.event_id, request.damage, request.operation_active)
     if success == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
+    if success == 409:
+        raise HTTPException(status_code=409, detail="Event is not in a state that allows this change")
     if success:
         return {"message": "Event status updated"}
     raise HTTPException(status_code=404, detail="Event not found")
 
 
 @router.get("/in_process")
-def get_in_process_events(location: str = Query(..., description="Taipei / Hsinchu / Taichung / Tainan / all")):
-    results = fetch_in_process_events(location)
+async def get_in_process_events(location: str = Query(..., description="地區名稱（見 GET /settings/regions）或 all")):
+    results = await cached_call(IN_PROCESS, fetch_in_process_events, location)
     if results == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
     if results == 400:
@@ -58,20 +71,78 @@ def get_in_process_events(location: str = Query(..., description="Taipei / Hsinc
 
 
 @router.post("/repair")
-def repair_event(request: RepairEventRequest):
-    success = mark_event_as_repaired(request.event_id)
+async def repair_event(request: RepairEventRequest):
+    success = await call_db(mark_event_as_repaired, request.event_id)
     if success == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
+    if success == 409:
+        raise HTTPException(status_code=409, detail="Event is not in a state that allows this change")
     if success:
         return {"message": "Event marked as repaired"}
     raise HTTPException(status_code=404, detail="Event not found")
 
 
 @router.get("/closed")
-def get_closed_events(location: str = Query(..., description="Taipei / Hsinchu / Taichung / Tainan / all")):
-    results = fetch_closed_events(location)
+async def get_closed_events(location: str = Query(..., description="地區名稱（見 GET /settings/regions）或 all")):
+    results = await cached_call(CLOSED_LIST, fetch_closed_events, location)
     if results == 500:
         raise HTTPException(status_code=500, detail="Error occurred")
     if results == 400:
         raise HTTPException(status_code=400, detail="Invalid location")
     return results
+
+
+@router.post("/acknowledge/batch",
+             description="一次接收多筆事件（單一交易），回傳每筆 event_id 是否成功")
+async def acknowledge_events_batch(payload: BatchAcknowledgeRequest):
+    results = await call_db(acknowledge_events, payload.event_ids)
+    if results == 500:
+        raise HTTPException(status_code=500, detail="Error occurred")
+    return {"results": results}
+
+
+@router.post("/submit/batch",
+             description="多筆事件回報相同的 damage / operation_active（單一交易），回傳每筆 event_id 是否成功；不存在或非待回報狀態者為 false")
+async def submit_reports_batch(request: BatchSubmitReportRequest):
+    results = await call_db(
+        update_events_status, request.event_ids, request.damage, request.operation_active)
+    if results == 500:
+        raise HTTPException(status_code=500, detail="Error occurred")
+    return {"results": results}
+
+
+@router.post("/repair/batch",
+             description="一次將多筆事件標記為已修復（單一交易），回傳每筆 event_id 是否成功；不存在或非處理中狀態者為 false")
+async def repair_events_batch(request: BatchRepairEventRequest):
+    results = await call_db(mark_events_as_repaired, request.event_ids)
+    if results == 500:
+        raise HTTPException(status_code=500, detail="Error occurred")
+    return {"results": results}
+
+
+@router.get("/board",
+            description="unacknowledged / pending / in_process / closed 四個列表一次取回。支援 ETag / If-None-Match，內容未變時回 304")
+async def get_board(request: Request, location: str = Query(..., description="地區名稱（見 GET /settings/regions）或 all")):
+    board = await cached_call(BOARD, fetch_board, location)
+    if board == 500:
+        raise HTTPException(status_code=500, detail="Error occurred")
+    if board == 400:
+        raise HTTPException(status_code=400, detail="Invalid location")
+
+    etag = board_etag(board)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(jsonable_encoder(board), headers={"ETag": etag})
+
+
+@router.get("/stream",
+            description="Server-Sent Events：事件新增（created）與狀態變更（acknowledged / reported / closed / auto_closed）。收到 resync 時請重新載入列表")
+async def stream_events(location: str = Query(..., description="地區名稱（見 GET /settings/regions）或 all")):
+    if not is_valid_location(location):
+        raise HTTPException(status_code=400, detail="Invalid location")
+    return StreamingResponse(
+        stream_changes(location),
+        media_type="text/event-stream",
+        # nginx must not buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
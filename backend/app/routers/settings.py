@@ -1,6 +1,5 @@
-from fastapi import APIRouter, Query
-from app.db import get_mysql_connection
-from app.constants import DEFAULT_ALERT_SUPPRESS
+from fastapi import APIRouter, HTTPException, Query
+from app.services import settings_service
 
 router = APIRouter(
     prefix="/settings",
@@ -10,29 +9,16 @@ router = APIRouter(
 
 @router.post("/alert_suppress")
 def set_alert_suppress_time(alert_suppress_time: int = Query(..., description="設定警報抑制時間（單位：分鐘）")):
-    conn = get_mysql_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "REPLACE INTO settings (name, value) VALUES (%s, %s)",
-                ("alert_suppress_time", str(alert_suppress_time))
-            )
-        conn.commit()
-        return {"message": "alert suppress time updated", "alert_suppress_time": alert_suppress_time}
-    finally:
-        conn.close()
+    if settings_service.set_alert_suppress_time(alert_suppress_time) == 500:
+        raise HTTPException(status_code=500, detail="Error occurred")
+    return {"message": "alert suppress time updated", "alert_suppress_time": alert_suppress_time}
 
 
 @router.get("/alert_suppress")
 def get_alert_suppress_time():
-    conn = get_mysql_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT value FROM settings WHERE name = %s", ("alert_suppress_time",))
-            result = cursor.fetchone()
-            if result:
-                return {"alert_suppress_time": int(result["value"])}
-            return {"alert_suppress_time": DEFAULT_ALERT_SUPPRESS}  # fallback
-    finally:
-        conn.close()
+    return {"alert_suppress_time": settings_service.get_alert_suppress_time()}
+
+
+@router.get("/regions", description="目前載入的地區（region 資料表）")
+def get_regions():
+    return settings_service.get_regions()
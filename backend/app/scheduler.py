@@ -0,0 +1,109 @@
+"""
+The backend's periodic jobs, run by one AsyncIOScheduler inside the FastAPI
+event loop (started and stopped by the lifespan in app.main).
+
+Jobs are plain blocking functions; the scheduler hands them to the loop's
+default executor, so no thread sits idle between runs. Every job gets
+jitter, at most one running instance (late runs are coalesced) and
+duration / outcome metrics. A job that raises is logged and simply runs
+again at its next fire time. Jobs marked ``leader_only`` are skipped unless
+this process is the leader (see app.leader).
+"""
+import functools
+import logging
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from prometheus_client import Counter, Histogram
+
+from app.leader import leader
+
+logger = logging.getLogger(__name__)
+
+# Seconds a late run may still start; later runs are skipped
+MISFIRE_GRACE_TIME = 30
+
+scheduled_job_duration_seconds = Histogram(
+    'scheduled_job_duration_seconds', 'Duration of one run of a periodic backend job', ['job'])
+scheduled_job_runs = Counter(
+    'scheduled_job_runs', 'Runs of periodic backend jobs by outcome (ok / error / skipped)', ['job', 'result'])
+
+
+class PeriodicJob(NamedTuple):
+    id: str
+    func: Callable[[], object]
+    seconds: float
+    jitter: Optional[int] = None
+    # Run once right away instead of waiting for the first interval
+    run_at_start: bool = False
+    # Run only in the process holding the leader lock
+    leader_only: bool = False
+
+
+scheduler: Optional[AsyncIOScheduler] = None
+
+
+def instrumented(job_id: str, func: Callable[[], object], leader_only: bool = False):
+    @functools.wraps(func)
+    def run():
+        if leader_only and not leader.is_leader:
+            return
+        start = time.perf_counter()
+        result = "ok"
+        try:
+            func()
+        except Exception as e:
+            result = "error"
+            logger.error(f"Scheduled job {job_id} failed, retrying at its next run")
+            logger.exception(e)
+        finally:
+            scheduled_job_duration_seconds.labels(job=job_id).observe(time.perf_counter() - start)
+            scheduled_job_runs.labels(job=job_id, result=result).inc()
+    return run
+
+
+def _count_skipped(event):
+    scheduled_job_runs.labels(job=event.job_id, result="skipped").inc()
+
+
+def start_scheduler(jobs):
+    """Create the scheduler on the running event loop and start ``jobs``."""
+    global scheduler
+    tz = ZoneInfo("Asia/Taipei")
+    scheduler = AsyncIOScheduler(timezone=tz, job_defaults={
+        "max_instances": 1,
+        "coalesce": True,
+        "misfire_grace_time": MISFIRE_GRACE_TIME,
+    })
+    scheduler.add_listener(_count_skipped, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+    for job in jobs:
+        options = {"next_run_time": datetime.now(tz)} if job.run_at_start else {}
+        scheduler.add_job(instrumented(job.id, job.func, job.leader_only), "interval", id=job.id,
+                          seconds=job.seconds, jitter=job.jitter, **options)
+    scheduler.start()
+    return scheduler
+
+
+def shutdown_scheduler():
+    global scheduler
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    scheduler = None
+
+
+def run_job_now(job_id: str):
+    """
+    Bring the next run of ``job_id`` forward to now. Safe to call from any
+    thread; does nothing when the scheduler or job is not running.
+    """
+    if scheduler is None or not scheduler.running:
+        return
+    try:
+        scheduler.modify_job(job_id, next_run_time=datetime.now(ZoneInfo("Asia/Taipei")))
+    except JobLookupError:
+        pass
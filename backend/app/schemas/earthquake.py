@@ -1,7 +1,9 @@
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import List
 
+from app.constants import SIMULATION_BATCH_MAX
+
 
 class EarthquakeIn(BaseModel):
     earthquake_id: Optional[int] = None
@@ -24,6 +26,36 @@ class EarthquakeIngestRequest(BaseModel):
     locations: List[EarthquakeLocationIn]
 
 
+class AftershockSequence(BaseModel):
+    """A mainshock followed by ``count`` generated aftershocks."""
+    mainshock: EarthquakeIngestRequest
+    count: int = Field(..., ge=0, le=SIMULATION_BATCH_MAX)
+    # Mean aftershocks per minute; gaps are exponentially distributed
+    rate_per_minute: float = Field(10, gt=0)
+    # Gutenberg-Richter magnitudes between min_magnitude and max_magnitude
+    min_magnitude: float = Field(3.0, ge=0)
+    # Defaults to the mainshock magnitude - 1.2 (Båth's law)
+    max_magnitude: Optional[float] = None
+    b_value: float = Field(1.0, gt=0)
+    seed: Optional[int] = None
+
+
+class EarthquakeScenarioRequest(BaseModel):
+    earthquakes: List[EarthquakeIngestRequest] = []
+    aftershocks: Optional[AftershockSequence] = None
+
+    @model_validator(mode="after")
+    def check_size(self):
+        total = len(self.earthquakes)
+        if self.aftershocks:
+            total += 1 + self.aftershocks.count
+        if total == 0:
+            raise ValueError("scenario has no earthquakes")
+        if total > SIMULATION_BATCH_MAX:
+            raise ValueError(f"scenario has {total} earthquakes, at most {SIMULATION_BATCH_MAX} allowed")
+        return self
+
+
 class EarthquakeBaseOut(BaseModel):
     earthquake_time: str
     center: str
@@ -1,4 +1,8 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from app.constants import REPORT_BATCH_MAX
 
 
 class AcknowledgeRequest(BaseModel):
@@ -13,3 +17,17 @@ class SubmitReportRequest(BaseModel):
 
 class RepairEventRequest(BaseModel):
     event_id: str
+
+
+class BatchAcknowledgeRequest(BaseModel):
+    event_ids: List[str] = Field(..., min_length=1, max_length=REPORT_BATCH_MAX)
+
+
+class BatchSubmitReportRequest(BaseModel):
+    event_ids: List[str] = Field(..., min_length=1, max_length=REPORT_BATCH_MAX)
+    damage: bool
+    operation_active: bool
+
+
+class BatchRepairEventRequest(BaseModel):
+    event_ids: List[str] = Field(..., min_length=1, max_length=REPORT_BATCH_MAX)
@@ -1,48 +1,49 @@
 from datetime import datetime, timedelta
 import logging
-from typing import Optional
-from unittest.mock import DEFAULT
+import math
+import random
+from typing import List, Optional
 from zoneinfo import ZoneInfo
 
 from pymysql import Connection
+from alerting.engine import (EarthquakeInput, LocationIntensity, decide_alerts,
+                             insert_events)
+from alerting.regions import regions
+from alerting.suppression import SuppressionIndex
+from app.change_feed import poll_new_events
 from app.db import get_mysql_connection
-from app.constants import DEFAULT_ALERT_SUPPRESS
-from app.schemas.earthquake import EarthquakeIngestRequest
-from app.services.report_service import close_events
+from app.constants import DEBUG_MODE, SIMULATION_BATCH_CHUNK, SIMULATION_PAGE_SIZE
+from app.exporter import notify_new_earthquake
+from app.schemas.earthquake import (AftershockSequence, EarthquakeIngestRequest,
+                                    EarthquakeLocationIn, EarthquakeScenarioRequest)
+from app.services.settings_service import get_alert_suppress_time
 
 logger = logging.getLogger(__name__)
 
-location_suffix_map = {
-    "Taipei": "-tp",
-    "Hsinchu": "-hc",
-    "Taichung": "-tc",
-    "Tainan": "-tn"
-}
+suppression_index = SuppressionIndex(regions)
 
+SQL_INSERT_EARTHQUAKE = """
+INSERT INTO earthquake (id, earthquake_time, center, latitude, longitude, magnitude, depth, is_demo)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
-def determine_level(intensity: float, magnitude: float):
-    if intensity >= 3 or magnitude >= 5:
-        return 'L2'
-    elif intensity >= 1:
-        return 'L1'
-    else:
-        return 'NA'
+SQL_INSERT_LOCATION = """
+INSERT INTO earthquake_location (earthquake_id, location, intensity)
+VALUES (%s, %s, %s)
+"""
 
+SQL_SELECT_LOCATION_IDS = """
+SELECT id, earthquake_id, location FROM earthquake_location
+WHERE earthquake_id IN %s
+"""
 
-def get_alert_suppress_time_from_db():
-    conn = get_mysql_connection()
-    if not conn:
-        return DEFAULT_ALERT_SUPPRESS
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT value FROM settings WHERE name = %s", ("alert_suppress_time",))
-            result = cursor.fetchone()
-            if result:
-                return int(result["value"])
-            return DEFAULT_ALERT_SUPPRESS
-    finally:
-        conn.close()
+# Locks the top of the simulated id range until the transaction commits
+SQL_LOCK_MAX_SIMULATED_ID = """
+SELECT MAX(id) AS max_id FROM earthquake WHERE id >= 100000000 FOR UPDATE
+"""
+
+# Aftershocks are at most this much weaker than the mainshock by default (Båth's law)
+BATH_MAGNITUDE_GAP = 1.2
 
 
 def generate_simulated_earthquake_id(conn: Connection) -> int:
@@ -58,9 +59,28 @@ def generate_simulated_earthquake_id(conn: Connection) -> int:
         return max_sim_id + 1
 
 
+def reserve_simulated_earthquake_ids(cursor, earthquakes, taken) -> None:
+    """
+    Give the earthquakes without an id the next free simulated ids, skipping
+    ``taken`` (ids given explicitly in the same request). Call inside the
+    transaction that inserts them: the locking read makes other simulations
+    wait until it commits, so two requests never pick the same ids.
+    """
+    pending = [eq for eq in earthquakes if eq.earthquake_id is None]
+    if not pending:
+        return
+    cursor.execute(SQL_LOCK_MAX_SIMULATED_ID)
+    next_id = (cursor.fetchone()["max_id"] or 100000000) + 1
+    for eq in pending:
+        while next_id in taken:
+            next_id += 1
+        eq.earthquake_id = next_id
+        next_id += 1
+
+
 def process_earthquake_and_locations(req: EarthquakeIngestRequest, alert_suppress_time: Optional[int] = None):
     if alert_suppress_time is None:
-        alert_suppress_time = get_alert_suppress_time_from_db()
+        alert_suppress_time = get_alert_suppress_time()
 
     conn = get_mysql_connection()
     if not conn:
@@ -85,140 +105,247 @@ def process_earthquake_and_locations(req: EarthquakeIngestRequest, alert_suppres
                     f"Simulated earthquake time too early: {eq_time}")
                 return 400
 
-            sql_insert_eq = """
-            INSERT INTO earthquake (id, earthquake_time, center, latitude, longitude, magnitude, depth, is_demo)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(sql_insert_eq, (
+            cursor.execute(SQL_INSERT_EARTHQUAKE, (
                 eq.earthquake_id, eq_time_str, eq.center, eq.latitude, eq.longitude, eq.magnitude, eq.depth, eq.is_demo
             ))
 
             # === Insert earthquake_location ===
-            sql_insert_loc = """
-            INSERT INTO earthquake_location (earthquake_id, location, intensity)
-            VALUES (%s, %s, %s)
-            """
-            location_ids: list[tuple[str, int, str]] = []
+            locations: list[LocationIntensity] = []
 
             for loc in req.locations:
                 cursor.execute(
-                    sql_insert_loc, (eq.earthquake_id, loc.location, loc.intensity))
-                location_ids.append(
-                    (loc.location, cursor.lastrowid, loc.intensity))
+                    SQL_INSERT_LOCATION, (eq.earthquake_id, loc.location, loc.intensity))
+                locations.append(
+                    LocationIntensity(loc.location, loc.intensity, cursor.lastrowid))
 
             # === Insert event for each location ===
-            sql_insert_event = """
-            INSERT INTO event (id, location_eq_id, create_at, region, level, trigger_alert, ack, is_damage, is_operation_active, is_done)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-
-            for loc_name, location_eq_id, intensity in location_ids:
-                suffix: Optional[str] = None
-                for keyword, sfx in location_suffix_map.items():
-                    if keyword in loc_name:
-                        suffix = sfx
-                        break
-
-                if suffix:
-                    event_id = f"{eq.earthquake_id}{suffix}"
-                    level = determine_level(intensity, eq.magnitude)
-
-                    alert_suppress_threshold = (
-                        eq_time - timedelta(minutes=alert_suppress_time)).strftime("%Y-%m-%d %H:%M:%S")
-
-                    level_order = {"L1": 1, "L2": 2}
-                    this_level_score = level_order.get(level, 0)
-
-                    # 查詢 suppress 時間內、同地區發出的警報等級
-                    sql_check_alert = """
-                    SELECT level FROM event
-                    WHERE region = %s AND trigger_alert = 1
-                    AND create_at BETWEEN %s AND %s
-                    """
-                    cursor.execute(
-                        sql_check_alert, (loc_name, alert_suppress_threshold, eq_time_str))
-                    past_levels = cursor.fetchall()
-
-                    # 比較是否有等級 >= 本次的事件
-                    suppress = any(level_order.get(
-                        row["level"], 0) >= this_level_score for row in past_levels)
-
-                    # 決定是否觸發
-                    trigger_alert = 0
-                    if level in ['L1', 'L2'] and not suppress:
-                        trigger_alert = 1
-
-                    # 插入 event
-                    cursor.execute(sql_insert_event, (
-                        event_id,
-                        location_eq_id,
-                        eq_time.strftime("%Y-%m-%d %H:%M:%S"),
-                        loc_name,  # region 填入地點名稱
-                        level,
-                        trigger_alert,
-                        False,  # ack
-                        None,  # is_damage
-                        None,  # is_operation_active
-                        False   # is_done
-                    ))
-
-                    if trigger_alert == 0:
-                        close_events(cursor, event_id)
+            regions.reload_if_stale(cursor)
+            suppression_index.sync(cursor)
+            decisions = decide_alerts(
+                [EarthquakeInput(eq.earthquake_id, eq_time.replace(tzinfo=None), eq.magnitude, locations)],
+                suppression_index, cursor, timedelta(minutes=alert_suppress_time), verify=DEBUG_MODE)
+            insert_events(cursor, decisions)
 
             conn.commit()
+            notify_new_earthquake()
+            # Stream the new events now rather than on the next scheduled poll
+            poll_new_events(cursor)
             return True
 
     except Exception as e:
         logger.error("Failed to insert earthquake and events")
         logger.exception(e)
+        # Alerts recorded for the rolled back events must not suppress later ones
+        suppression_index.invalidate()
     finally:
         conn.close()
     return False
 
 
-def fetch_all_simulated_earthquakes():
+def parse_simulated_time(earthquake_time: str) -> datetime:
+    return datetime.strptime(earthquake_time.replace("T", " "), "%Y-%m-%d %H:%M:%S").replace(
+        tzinfo=ZoneInfo("Asia/Taipei"))
+
+
+def generate_aftershocks(sequence: AftershockSequence) -> List[EarthquakeIngestRequest]:
+    """
+    The mainshock followed by ``sequence.count`` aftershocks at the same
+    center: Poisson arrivals at ``rate_per_minute`` and truncated
+    Gutenberg-Richter magnitudes. Each location's intensity drops by one
+    level per magnitude unit below the mainshock.
+    """
+    rng = random.Random(sequence.seed)
+    main = sequence.mainshock.earthquake
+    min_magnitude = sequence.min_magnitude
+    max_magnitude = sequence.max_magnitude
+    if max_magnitude is None:
+        max_magnitude = main.magnitude - BATH_MAGNITUDE_GAP
+    max_magnitude = max(max_magnitude, min_magnitude)
+    # Inverse CDF of the Gutenberg-Richter distribution truncated at max_magnitude
+    span = 1 - 10 ** (-sequence.b_value * (max_magnitude - min_magnitude))
+
+    quakes = [sequence.mainshock]
+    eq_time = parse_simulated_time(main.earthquake_time)
+    for _ in range(sequence.count):
+        eq_time += timedelta(minutes=rng.expovariate(sequence.rate_per_minute))
+        magnitude = round(min_magnitude - math.log10(1 - rng.random() * span) / sequence.b_value, 1)
+        drop = main.magnitude - magnitude
+        quakes.append(EarthquakeIngestRequest(
+            earthquake=main.model_copy(update={
+                "earthquake_id": None,
+                "earthquake_time": eq_time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "magnitude": magnitude,
+            }),
+            locations=[EarthquakeLocationIn(location=loc.location, intensity=float(max(round(loc.intensity - drop), 0)))
+                       for loc in sequence.mainshock.locations],
+        ))
+    return quakes
+
+
+def _insert_simulated_chunk(cursor, chunk, window: timedelta):
+    """Insert ``(request, eq_time)`` pairs with their locations and events. The caller commits."""
+    cursor.executemany(SQL_INSERT_EARTHQUAKE, [
+        (req.earthquake.earthquake_id, eq_time.strftime("%Y-%m-%d %H:%M:%S"), req.earthquake.center,
+         req.earthquake.latitude, req.earthquake.longitude, req.earthquake.magnitude,
+         req.earthquake.depth, req.earthquake.is_demo)
+        for req, eq_time in chunk])
+    cursor.executemany(SQL_INSERT_LOCATION, [
+        (req.earthquake.earthquake_id, loc.location, loc.intensity)
+        for req, _ in chunk for loc in req.locations])
+
+    cursor.execute(SQL_SELECT_LOCATION_IDS, (tuple(req.earthquake.earthquake_id for req, _ in chunk),))
+    location_ids = {(row["earthquake_id"], row["location"]): row["id"] for row in cursor.fetchall()}
+
+    decisions = decide_alerts([
+        EarthquakeInput(
+            req.earthquake.earthquake_id, eq_time.replace(tzinfo=None), req.earthquake.magnitude,
+            [LocationIntensity(loc.location, loc.intensity,
+                               location_ids[(req.earthquake.earthquake_id, loc.location)])
+             for loc in req.locations])
+        for req, eq_time in chunk
+    ], suppression_index, cursor, window, verify=DEBUG_MODE)
+    insert_events(cursor, decisions)
+    return decisions
+
+
+def process_earthquake_scenario(req: EarthquakeScenarioRequest, chunk_size: int = SIMULATION_BATCH_CHUNK,
+                                alert_suppress_time: Optional[int] = None):
+    """ earthquake/simulate/batch
+    Ingest a scenario (explicit earthquakes and / or a generated aftershock
+    sequence) oldest first, ``chunk_size`` earthquakes per transaction, with
+    suppression decided by the in-memory index. Chunks committed before a
+    failure are kept. Returns a summary, 400 if an earthquake is more than
+    an hour old, or 500.
+    """
+    quakes = list(req.earthquakes)
+    if req.aftershocks:
+        quakes += generate_aftershocks(req.aftershocks)
+
+    timed = sorted(((q, parse_simulated_time(q.earthquake.earthquake_time)) for q in quakes),
+                   key=lambda pair: pair[1])
+    if timed[0][1] < datetime.now(ZoneInfo("Asia/Taipei")) - timedelta(hours=1):
+        logger.warning(f"Simulated earthquake time too early: {timed[0][1]}")
+        return 400
+
+    if alert_suppress_time is None:
+        alert_suppress_time = get_alert_suppress_time()
+    window = timedelta(minutes=alert_suppress_time)
+
+    conn = get_mysql_connection()
+    if not conn:
+        return 500
+    summary = {"earthquakes": 0, "events": 0, "alerts": 0, "earthquake_ids": []}
+    taken = {q.earthquake.earthquake_id for q, _ in timed if q.earthquake.earthquake_id is not None}
+    try:
+        with conn.cursor() as cursor:
+            regions.reload_if_stale(cursor)
+            for start in range(0, len(timed), chunk_size):
+                chunk = timed[start:start + chunk_size]
+                # Ids are reserved per chunk, in the transaction that inserts them
+                reserve_simulated_earthquake_ids(cursor, [q.earthquake for q, _ in chunk], taken)
+                suppression_index.sync(cursor)
+                decisions = _insert_simulated_chunk(cursor, chunk, window)
+                conn.commit()
+
+                summary["earthquakes"] += len(chunk)
+                summary["events"] += len(decisions)
+                summary["alerts"] += sum(d.trigger_alert for d in decisions)
+                summary["earthquake_ids"] += [q.earthquake.earthquake_id for q, _ in chunk]
+                poll_new_events(cursor)
+
+        notify_new_earthquake()
+        return summary
+    except Exception as e:
+        logger.error(f"Failed to insert simulated scenario after {summary['earthquakes']} earthquakes")
+        logger.exception(e)
+        # Alerts recorded for the rolled back chunk must not suppress later ones
+        suppression_index.invalidate()
+        return 500
+    finally:
+        conn.close()
+
+
+def rebuild_suppression_index():
+    conn = get_mysql_connection()
+    if not conn:
+        return
+    try:
+        with conn.cursor() as cursor:
+            suppression_index.rebuild(cursor)
+    except Exception as e:
+        logger.error("Failed to load the suppression index")
+        logger.exception(e)
+    finally:
+        conn.close()
+
+
+def fetch_all_simulated_earthquakes(limit: int = SIMULATION_PAGE_SIZE, before: Optional[datetime] = None,
+                                    before_id: Optional[int] = None):
+    """
+    One page of simulated earthquakes, newest first. ``before`` and
+    ``before_id`` are the earthquake_time and id of the last item of the
+    previous page (keyset pagination); the id breaks ties between quakes
+    sharing a second. Locations of the whole page are fetched with a single
+    query.
+    """
     conn = get_mysql_connection()
     if not conn:
         return 500
     try:
         with conn.cursor() as cursor:
             # 取出模擬地震
-            cursor.execute("""
-                SELECT * FROM earthquake
+            sql = """
+                SELECT id, earthquake_time, center, latitude, longitude, magnitude, depth
+                FROM earthquake
                 WHERE is_demo = TRUE
-                ORDER BY earthquake_time DESC
-            """)
+            """
+            params: list = []
+            if before is not None and before_id is not None:
+                sql += " AND (earthquake_time, id) < (%s, %s)"
+                params += [before.strftime("%Y-%m-%d %H:%M:%S"), before_id]
+            elif before is not None:
+                sql += " AND earthquake_time < %s"
+                params.append(before.strftime("%Y-%m-%d %H:%M:%S"))
+            sql += " ORDER BY earthquake_time DESC, id DESC LIMIT %s"
+            params.append(limit)
+
+            cursor.execute(sql, params)
             earthquakes = cursor.fetchall()
+            if not earthquakes:
+                return []
 
-            result = []
-            for eq in earthquakes:
-                cursor.execute("""
-                    SELECT el.location, el.intensity, e.level
-                    FROM earthquake_location AS el
-                    JOIN event AS e ON el.id = e.location_eq_id
-                    WHERE earthquake_id = %s
-                """, (eq["id"],))
-                locations = cursor.fetchall()
-                level_str_to_int = {
-                    "L1": 1,
-                    "L2": 2,
-                    "NA": 0
-                }
-                for loc in locations:
-                    loc["level"] = level_str_to_int.get(loc["level"], 0)
-
-                result.append({
-                    "earthquake": {
-                        "earthquake_time": eq["earthquake_time"].strftime("%Y-%m-%dT%H:%M:%S"),
-                        "center": eq["center"],
-                        "latitude": eq["latitude"],
-                        "longitude": eq["longitude"],
-                        "magnitude": eq["magnitude"],
-                        "depth": eq["depth"]
-                    },
-                    "locations": locations
+            cursor.execute("""
+                SELECT el.earthquake_id, el.location, el.intensity, e.level
+                FROM earthquake_location AS el
+                JOIN event AS e ON el.id = e.location_eq_id
+                WHERE el.earthquake_id IN %s
+            """, (tuple(eq["id"] for eq in earthquakes),))
+
+            level_str_to_int = {
+                "L1": 1,
+                "L2": 2,
+                "NA": 0
+            }
+            locations_by_eq: dict[int, list] = {eq["id"]: [] for eq in earthquakes}
+            for loc in cursor.fetchall():
+                locations_by_eq[loc["earthquake_id"]].append({
+                    "location": loc["location"],
+                    "intensity": loc["intensity"],
+                    "level": level_str_to_int.get(loc["level"], 0),
                 })
 
-            return result
+            return [{
+                # Not part of the response body; the router puts it in X-Next-Before-Id
+                "earthquake_id": eq["id"],
+                "earthquake": {
+                    "earthquake_time": eq["earthquake_time"].strftime("%Y-%m-%dT%H:%M:%S"),
+                    "center": eq["center"],
+                    "latitude": eq["latitude"],
+                    "longitude": eq["longitude"],
+                    "magnitude": eq["magnitude"],
+                    "depth": eq["depth"]
+                },
+                "locations": locations_by_eq[eq["id"]]
+            } for eq in earthquakes]
     finally:
         conn.close()
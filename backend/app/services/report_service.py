@@ -1,59 +1,343 @@
 from datetime import datetime, timedelta
+import hashlib
 import logging
+import time
 from zoneinfo import ZoneInfo
 
-import pymysql.cursors
+from prometheus_client import Counter, Histogram
 
+from alerting.regions import regions
+from app.change_feed import (ACKNOWLEDGED, AUTO_CLOSED, CLOSED, REPORTED,
+                             change_feed, publish_event_change)
+from app.constants import AUTO_CLOSE_BATCH_SIZE
 from app.db import get_mysql_connection
 
 logger = logging.getLogger(__name__)
 
-location_suffix_map = {
-    "Taipei": "-tp",
-    "Hsinchu": "-hc",
-    "Taichung": "-tc",
-    "Tainan": "-tn"
+auto_close_duration_seconds = Histogram(
+    'auto_close_duration_seconds', 'Duration of one auto_close_unprocessed_events run')
+auto_closed_events = Counter(
+    'auto_closed_events', 'Events closed by auto_close_unprocessed_events')
+
+# The SQL below is shared by the sync service functions in this module and
+# their async counterparts in app.services.report_service_async.
+
+SQL_EVENT_FROM = """
+    FROM event e
+    JOIN earthquake_location el ON e.location_eq_id = el.id
+    JOIN earthquake eq ON el.earthquake_id = eq.id
+"""
+
+# Conditions of the four dashboard lists, also combined by build_board_query
+WHERE_UNACKNOWLEDGED = "e.ack = FALSE AND e.is_done = FALSE AND e.create_at <= %s"
+WHERE_ACKNOWLEDGED = """e.ack = TRUE
+      AND e.is_damage IS NULL
+      AND e.is_done = FALSE
+      AND e.ack_time <= %s"""
+WHERE_IN_PROCESS = "e.is_damage = TRUE AND e.is_done = FALSE AND e.report_at <= %s"
+WHERE_CLOSED = "e.is_done = TRUE AND e.closed_at <= %s"
+
+SQL_UNACKNOWLEDGED = f"""
+    SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time,
+           eq.magnitude, el.intensity, e.level, e.region
+    {SQL_EVENT_FROM}
+    WHERE {WHERE_UNACKNOWLEDGED}
+"""
+
+SQL_ACKNOWLEDGED = f"""
+    SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time,
+           eq.magnitude, el.intensity, e.level, e.region, e.ack_time
+    {SQL_EVENT_FROM}
+    WHERE {WHERE_ACKNOWLEDGED}
+"""
+
+SQL_IN_PROCESS = f"""
+    SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time,
+           eq.magnitude, el.intensity, e.level, e.region, e.ack_time, e.is_operation_active
+    {SQL_EVENT_FROM}
+    WHERE {WHERE_IN_PROCESS}
+"""
+
+SQL_CLOSED = f"""
+    SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time,
+           eq.magnitude, el.intensity, e.level, e.region,
+           e.ack_time, e.is_damage, e.is_operation_active, e.process_time
+    {SQL_EVENT_FROM}
+    WHERE {WHERE_CLOSED}
+"""
+
+SQL_EVENT_EXISTS = "SELECT id FROM event WHERE id = %s"
+
+# Valid states for submit / repair. They are part of the UPDATE's WHERE clause,
+# so one statement both checks and applies the transition.
+WHERE_SUBMITTABLE = "ack = TRUE AND is_damage IS NULL AND is_done = FALSE"
+WHERE_REPAIRABLE = "is_damage = TRUE AND is_done = FALSE"
+
+SQL_ACKNOWLEDGE = """
+    UPDATE event
+    SET ack = TRUE, ack_time = %s
+    WHERE id = %s
+"""
+
+# {ids} is ONE for a single event or MANY for a batch
+ONE = "= %s"
+MANY = "IN %s"
+
+SQL_SUBMIT_NO_DAMAGE = f"""
+    UPDATE event
+    SET is_damage = FALSE,
+        is_operation_active = %s,
+        report_at = %s,
+        is_done = TRUE,
+        closed_at = %s,
+        process_time = TIMESTAMPDIFF(MINUTE, create_at, %s)
+    WHERE id {{ids}} AND {WHERE_SUBMITTABLE}
+"""
+
+SQL_SUBMIT_DAMAGE = f"""
+    UPDATE event
+    SET is_damage = TRUE,
+        is_operation_active = %s,
+        report_at = %s
+    WHERE id {{ids}} AND {WHERE_SUBMITTABLE}
+"""
+
+SQL_REPAIR = f"""
+    UPDATE event
+    SET is_done = TRUE,
+        closed_at = %s,
+        process_time = TIMESTAMPDIFF(MINUTE, create_at, %s)
+    WHERE id {{ids}} AND {WHERE_REPAIRABLE}
+"""
+
+# Batch variants: the ids that can make the transition are locked and read
+# once, then updated by one set-based UPDATE.
+SQL_LOCK_EVENTS = "SELECT id FROM event WHERE id IN %s FOR UPDATE"
+SQL_LOCK_SUBMITTABLE = f"SELECT id FROM event WHERE id IN %s AND {WHERE_SUBMITTABLE} FOR UPDATE"
+SQL_LOCK_REPAIRABLE = f"SELECT id FROM event WHERE id IN %s AND {WHERE_REPAIRABLE} FOR UPDATE"
+
+SQL_ACKNOWLEDGE_BATCH = """
+    UPDATE event
+    SET ack = TRUE, ack_time = %s
+    WHERE id IN %s
+"""
+
+# 自動結案：超過 1 小時未接收 / 接收後未回報 / 回報後未修復，process_time = -1 表示未處理
+SQL_AUTO_CLOSE = """
+    UPDATE event
+    SET is_done = TRUE,
+        closed_at = %s,
+        process_time = -1
+    WHERE closed_at IS NULL
+      AND ((ack_time IS NULL AND create_at <= %s)
+        OR (report_at IS NULL AND ack_time IS NOT NULL AND ack_time <= %s)
+        OR (report_at IS NOT NULL AND report_at <= %s))
+    LIMIT %s
+"""
+
+
+def format_time(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def taipei_now_str() -> str:
+    return format_time(datetime.now(ZoneInfo("Asia/Taipei")))
+
+
+def is_valid_location(location: str) -> bool:
+    return location in regions or location.lower() == "all"
+
+
+def _with_location_filter(sql: str, location: str, order_by: str):
+    params = [taipei_now_str()]
+    if location in regions:
+        # Served by the (region, is_done, ...) composite indexes on event
+        sql += " AND e.region = %s"
+        params.append(location)
+    return sql + order_by, params
+
+
+def build_unacknowledged_query(location: str):
+    return _with_location_filter(SQL_UNACKNOWLEDGED, location, " ORDER BY e.create_at DESC")
+
+
+def build_acknowledged_query(location: str):
+    return _with_location_filter(SQL_ACKNOWLEDGED, location, " ORDER BY e.ack_time DESC")
+
+
+def build_in_process_query(location: str):
+    return _with_location_filter(SQL_IN_PROCESS, location, " ORDER BY e.report_at DESC")
+
+
+def build_closed_query(location: str):
+    return _with_location_filter(SQL_CLOSED, location, " ORDER BY e.closed_at DESC LIMIT 10")
+
+
+# GET /report/board: bucket -> (condition, sort column, fields besides
+# BOARD_FIELDS, row limit). Fields match the four list endpoints.
+BOARD_BUCKETS = {
+    "unacknowledged": (WHERE_UNACKNOWLEDGED, "e.create_at", (), None),
+    "pending": (WHERE_ACKNOWLEDGED, "e.ack_time", ("ack_time",), None),
+    "in_process": (WHERE_IN_PROCESS, "e.report_at", ("ack_time", "is_operation_active"), None),
+    "closed": (WHERE_CLOSED, "e.closed_at",
+               ("ack_time", "is_damage", "is_operation_active", "process_time"), 10),
 }
+BOARD_FIELDS = ("event_id", "earthquake_time", "alert_time", "magnitude", "intensity", "level", "region")
+
+SQL_BOARD_SELECT = """
+    SELECT '{bucket}' AS bucket, {sort_column} AS sort_time,
+           e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time,
+           eq.magnitude, el.intensity, e.level, e.region,
+           e.ack_time, e.is_damage, e.is_operation_active, e.process_time
+"""
+
+
+def build_board_query(location: str):
+    """
+    The four dashboard lists as one UNION ALL, so the board costs a single
+    round trip. Rows come back newest first with their bucket name.
+    """
+    parts = []
+    params = []
+    for bucket, (where, sort_column, _, limit) in BOARD_BUCKETS.items():
+        sql = SQL_BOARD_SELECT.format(bucket=bucket, sort_column=sort_column) + SQL_EVENT_FROM + f" WHERE {where}"
+        order_by = f" ORDER BY {sort_column} DESC LIMIT {limit}" if limit else ""
+        sql, bucket_params = _with_location_filter(sql, location, order_by)
+        parts.append(f"({sql})")
+        params += bucket_params
+    return " UNION ALL ".join(parts) + " ORDER BY sort_time DESC", params
+
+
+def partition_board_rows(rows):
+    board = {bucket: [] for bucket in BOARD_BUCKETS}
+    for row in rows:
+        bucket = row["bucket"]
+        fields = BOARD_FIELDS + BOARD_BUCKETS[bucket][2]
+        board[bucket].append({field: row[field] for field in fields})
+    format_closed_rows(board["closed"])
+    return board
+
+
+def board_etag(board) -> str:
+    """
+    ETag of a board from the state of each row. Everything else in a row is
+    fixed once the event exists, so this avoids serialising the rows.
+    """
+    digest = hashlib.sha1()
+    for bucket, rows in board.items():
+        for row in rows:
+            digest.update(repr((bucket, row["event_id"], row.get("ack_time"), row.get("is_damage"),
+                                row.get("is_operation_active"), row.get("process_time"))).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def format_closed_rows(rows):
+    for row in rows:
+        if row["process_time"] == -1:
+            row["process_time"] = "未處理"
+    return rows
+
+
+def build_submit_statement(damage: bool, operation_active: bool, now: datetime, ids: str = ONE):
+    """UPDATE and its parameters, without the trailing event id(s)."""
+    now_str = format_time(now)
+    if not damage:
+        return SQL_SUBMIT_NO_DAMAGE.format(ids=ids), (operation_active, now_str, now_str, now_str)
+    return SQL_SUBMIT_DAMAGE.format(ids=ids), (operation_active, now_str)
+
+
+def build_repair_statement(now: datetime, ids: str = ONE):
+    """UPDATE and its parameters, without the trailing event id(s)."""
+    now_str = format_time(now)
+    return SQL_REPAIR.format(ids=ids), (now_str, now_str)
+
+
+def build_acknowledge_batch(now: datetime):
+    return SQL_LOCK_EVENTS, SQL_ACKNOWLEDGE_BATCH, (format_time(now),)
+
+
+def build_submit_batch(damage: bool, operation_active: bool, now: datetime):
+    return (SQL_LOCK_SUBMITTABLE, *build_submit_statement(damage, operation_active, now, MANY))
+
+
+def build_repair_batch(now: datetime):
+    return (SQL_LOCK_REPAIRABLE, *build_repair_statement(now, MANY))
+
+
+def batch_results(event_ids, updated_ids):
+    """Per-id result of a batch request, in request order."""
+    updated_ids = set(updated_ids)
+    return [{"event_id": event_id, "success": event_id in updated_ids} for event_id in event_ids]
+
+
+def _apply_batch(event_ids, batch, change_type: str, action: str):
+    """
+    Run one batch transition in a single transaction: lock the requested
+    rows that can make the transition, update them with one UPDATE, commit.
+    Returns the per-id results, or 500.
+    """
+    event_ids = list(dict.fromkeys(event_ids))
+    conn = get_mysql_connection()
+    if not conn:
+        return 500
+    try:
+        with conn.cursor() as cursor:
+            lock_sql, sql, params = batch
+            cursor.execute(lock_sql, (event_ids,))
+            found = [row["id"] for row in cursor.fetchall()]
+            if found:
+                cursor.execute(sql, (*params, found))
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Batch {action} failed")
+        logger.exception(e)
+        return 500
+    finally:
+        conn.close()
+
+    for event_id in found:
+        publish_event_change(change_type, event_id)
+    return batch_results(event_ids, found)
 
 
 def fetch_unacknowledged_events(location: str):
     """ report/unacknowledged
     Fetch unacknowledged events
     """
-    suffix = location_suffix_map.get(location)
-    if not suffix and location.lower() != "all":
+    if not is_valid_location(location):
         return 400
 
     conn = get_mysql_connection()
     if not conn:
         return 500
 
-    now = datetime.now(ZoneInfo("Asia/Taipei"))
-
     try:
         with conn.cursor() as cursor:
-            sql = """
-                SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time, 
-                       eq.magnitude, el.intensity, e.level, e.region 
-                FROM event e
-                JOIN earthquake_location el ON e.location_eq_id = el.id
-                JOIN earthquake eq ON el.earthquake_id = eq.id
-                WHERE e.ack = FALSE AND e.is_done = FALSE AND e.create_at <= %s
-            """
-            params = [now.strftime("%Y-%m-%d %H:%M:%S")]
-
-            if suffix:
-                sql += " AND e.id LIKE %s"
-                params.append(f"%{suffix}")
-
-            sql += " ORDER BY e.create_at DESC"
-
-            cursor.execute(sql, params)
+            cursor.execute(*build_unacknowledged_query(location))
             return cursor.fetchall()
     finally:
         conn.close()
 
 
+def fetch_board(location: str):
+    """ report/board
+    All four dashboard lists of a location in one query
+    """
+    if not is_valid_location(location):
+        return 400
+
+    conn = get_mysql_connection()
+    if not conn:
+        return 500
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(*build_board_query(location))
+            return partition_board_rows(cursor.fetchall())
+    finally:
+        conn.close()
+
+
 def acknowledge_event_by_id(event_id: str):
     """ report/acknowledge
     Acknowledge event by ID
@@ -64,17 +348,14 @@ def acknowledge_event_by_id(event_id: str):
     try:
         with conn.cursor() as cursor:
             # 先檢查事件是否存在
-            cursor.execute("SELECT id FROM event WHERE id = %s", (event_id,))
+            cursor.execute(SQL_EVENT_EXISTS, (event_id,))
             if not cursor.fetchone():
                 return False
 
             # 更新 ack 與 ack_time
-            cursor.execute("""
-                UPDATE event
-                SET ack = TRUE, ack_time = %s
-                WHERE id = %s
-            """, (datetime.now(ZoneInfo("Asia/Taipei")).strftime("%Y-%m-%d %H:%M:%S"), event_id))
+            cursor.execute(SQL_ACKNOWLEDGE, (taipei_now_str(), event_id))
             conn.commit()
+            publish_event_change(ACKNOWLEDGED, event_id)
             return True
     except Exception as e:
         logger.error("Acknowledge event failed")
@@ -88,95 +369,49 @@ def fetch_acknowledged_events(location: str):
     """ report/acknowledged
     Fetch acknowledged events
     """
-    suffix = location_suffix_map.get(location)
-    if not suffix and location.lower() != "all":
+    if not is_valid_location(location):
         return 400
 
     conn = get_mysql_connection()
     if not conn:
         return 500
 
-    now = datetime.now(ZoneInfo("Asia/Taipei"))
-
     try:
         with conn.cursor() as cursor:
-            sql = """
-                SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time, 
-                       eq.magnitude, el.intensity, e.level, e.region, e.ack_time
-                FROM event e
-                JOIN earthquake_location el ON e.location_eq_id = el.id
-                JOIN earthquake eq ON el.earthquake_id = eq.id
-                WHERE e.ack = TRUE 
-                  AND e.is_damage IS NULL 
-                  AND e.is_done = FALSE 
-                  AND e.ack_time <= %s
-            """
-            params = [now.strftime("%Y-%m-%d %H:%M:%S")]
-
-            if suffix:
-                sql += " AND e.id LIKE %s"
-                params.append(f"%{suffix}")
-
-            sql += " ORDER BY e.ack_time DESC"
-
-            cursor.execute(sql, params)
+            cursor.execute(*build_acknowledged_query(location))
             return cursor.fetchall()
     finally:
         conn.close()
 
 
+def _missing_or_conflict(cursor, event_id: str):
+    """After a transition matched no row: False if the event does not exist, else 409."""
+    cursor.execute(SQL_EVENT_EXISTS, (event_id,))
+    if not cursor.fetchone():
+        return False
+    logger.warning(f"Event {event_id} is not in a state that allows this change")
+    return 409
+
+
 def update_event_status(event_id: str, damage: bool, operation_active: bool):
     """ report/submit
-    Update event status
+    Update event status. Only acknowledged, not yet reported events can be
+    submitted; returns 409 otherwise.
     """
     conn = get_mysql_connection()
     if not conn:
         return 500
     try:
         with conn.cursor() as cursor:
-            now = datetime.now(ZoneInfo("Asia/Taipei"))
-            now_str = now.strftime("%Y-%m-%d %H:%M:%S")
-
-            if not damage:
-                # 查 create_at 並計算處理時間（分鐘）
-                cursor.execute(
-                    "SELECT create_at FROM event WHERE id = %s", (event_id,))
-                result = cursor.fetchone()
-                logger.debug(f"Fetching event {event_id} returns: {result}")
-                if result:
-                    create_at = result["create_at"]
-                    create_at = create_at.replace(
-                        tzinfo=ZoneInfo("Asia/Taipei"))
-                    process_minutes = int(
-                        (now - create_at).total_seconds() // 60)
-
-                sql = """
-                    UPDATE event
-                    SET is_damage = %s,
-                        is_operation_active = %s,
-                        report_at = %s,
-                        is_done = TRUE,
-                        closed_at = %s,
-                        process_time = %s
-                    WHERE id = %s
-                """
-                cursor.execute(sql, (damage, operation_active,
-                               now_str, now_str, process_minutes, event_id))
-            else:
-                sql = """
-                    UPDATE event
-                    SET is_damage = %s,
-                        is_operation_active = %s,
-                        report_at = %s
-                    WHERE id = %s
-                """
-                cursor.execute(
-                    sql, (damage, operation_active, now_str, event_id))
+            sql, params = build_submit_statement(
+                damage, operation_active, datetime.now(ZoneInfo("Asia/Taipei")))
+            cursor.execute(sql, (*params, event_id))
 
             if cursor.rowcount == 0:
-                return False
+                return _missing_or_conflict(cursor, event_id)
 
         conn.commit()
+        publish_event_change(REPORTED if damage else CLOSED, event_id)
         return True
     except Exception as e:
         logger.error("Failed to update event status")
@@ -190,37 +425,16 @@ def fetch_in_process_events(location: str):
     """ report/in_process
     Fetch events where is_damage=True and is_done=False, with optional location filter
     """
-    suffix = location_suffix_map.get(location)
-    if not suffix and location.lower() != "all":
+    if not is_valid_location(location):
         return 400
 
     conn = get_mysql_connection()
     if not conn:
         return 500
 
-    now = datetime.now(ZoneInfo("Asia/Taipei"))
-
     try:
         with conn.cursor() as cursor:
-
-            sql = """
-                SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time,
-                       eq.magnitude, el.intensity, e.level, e.region, e.ack_time, e.is_operation_active
-                FROM event e
-                JOIN earthquake_location el ON e.location_eq_id = el.id
-                JOIN earthquake eq ON el.earthquake_id = eq.id
-                WHERE e.is_damage = TRUE AND e.is_done = FALSE AND e.report_at <= %s
-            """
-            params = [now.strftime("%Y-%m-%d %H:%M:%S")]
-
-            if suffix:
-                sql += " AND e.id LIKE %s"
-                sql += " ORDER BY e.report_at DESC"
-                params.append(f"%{suffix}")
-            else:
-                sql += " ORDER BY e.report_at DESC"
-
-            cursor.execute(sql, params)
+            cursor.execute(*build_in_process_query(location))
             return cursor.fetchall()
     finally:
         conn.close()
@@ -228,45 +442,22 @@ def fetch_in_process_events(location: str):
 
 def mark_event_as_repaired(event_id: str):
     """ report/repair
-    Repair event by ID
+    Repair event by ID. Only events reported as damaged and still open can
+    be repaired; returns 409 otherwise.
     """
     conn = get_mysql_connection()
     if not conn:
         return 500
     try:
         with conn.cursor() as cursor:
-            closed_at = datetime.now(ZoneInfo("Asia/Taipei"))
-            closed_str = closed_at.strftime("%Y-%m-%d %H:%M:%S")
-
-            # 更新 is_done 與 closed_at
-            cursor.execute("""
-                UPDATE event
-                SET is_done = %s,
-                    closed_at = %s
-                WHERE id = %s
-            """, (True, closed_str, event_id))
-
-            # 查 create_at 並計算處理時間（分鐘）
-            cursor.execute(
-                "SELECT create_at FROM event WHERE id = %s", (event_id,))
-            result = cursor.fetchone()
-            logger.debug(f"Fetching event {event_id} returns: {result}")
-
-            if not result:
-                logger.warning(f"Event {event_id} not found. Repair failed.")
-                return False
-            if result:
-                create_at = result["create_at"]
-                create_at = create_at.replace(tzinfo=ZoneInfo("Asia/Taipei"))
-                process_minutes = int(
-                    (closed_at - create_at).total_seconds() // 60)
+            sql, params = build_repair_statement(datetime.now(ZoneInfo("Asia/Taipei")))
+            cursor.execute(sql, (*params, event_id))
 
-                cursor.execute(
-                    "UPDATE event SET process_time = %s WHERE id = %s",
-                    (process_minutes, event_id)
-                )
+            if cursor.rowcount == 0:
+                return _missing_or_conflict(cursor, event_id)
 
         conn.commit()
+        publish_event_change(CLOSED, event_id)
         return True
     except Exception as e:
         logger.error("Failed to mark event as repaired")
@@ -280,131 +471,85 @@ def fetch_closed_events(location: str):
     """ report/closed
     Fetch the 10 most recent closed events with optional location filter
     """
-    suffix = location_suffix_map.get(location)
-    if not suffix and location.lower() != "all":
+    if not is_valid_location(location):
         return 400
 
     conn = get_mysql_connection()
     if not conn:
         return 500
 
-    now = datetime.now(ZoneInfo("Asia/Taipei"))
-
     try:
         with conn.cursor() as cursor:
-
-            sql = """
-                SELECT e.id AS event_id, eq.earthquake_time, e.create_at AS alert_time,
-                       eq.magnitude, el.intensity, e.level, e.region, 
-                       e.ack_time, e.is_damage, e.is_operation_active, e.process_time
-                FROM event e
-                JOIN earthquake_location el ON e.location_eq_id = el.id
-                JOIN earthquake eq ON el.earthquake_id = eq.id
-                WHERE e.is_done = TRUE AND e.closed_at <= %s
-            """
-            params = [now.strftime("%Y-%m-%d %H:%M:%S")]
-
-            if suffix:
-                sql += " AND e.id LIKE %s"
-                params.append(f"%{suffix}")
-
-            sql += " ORDER BY e.closed_at DESC LIMIT 10"
-            cursor.execute(sql, params)
-
-            rows = cursor.fetchall()
-            for row in rows:
-                if row["process_time"] == -1:
-                    row["process_time"] = "未處理"
-            return rows
-
+            cursor.execute(*build_closed_query(location))
+            return format_closed_rows(cursor.fetchall())
     finally:
         conn.close()
 
 
-def close_events(cursor: pymysql.cursors.Cursor, event_id: int | str):
+def acknowledge_events(event_ids):
+    """ report/acknowledge/batch
+    Acknowledge several events in one transaction
     """
-    This is to close events that have not been processed.
-    Usually called by
-    * auto_close_unprocessed_events, which close all unprocessed events past 1 hour.
-    * An event that does not trigger alert (having trigger_alert = FALSE), which will close the event immediately.
+    return _apply_batch(event_ids, build_acknowledge_batch(datetime.now(ZoneInfo("Asia/Taipei"))),
+                        ACKNOWLEDGED, "acknowledge")
+
 
-    The caller should ensure that the event_id exists in the database.
-    This function will not commit the transaction, so the caller should handle the commit.
+def update_events_status(event_ids, damage: bool, operation_active: bool):
+    """ report/submit/batch
+    Submit the same report for several events in one transaction
     """
+    statement = build_submit_batch(damage, operation_active, datetime.now(ZoneInfo("Asia/Taipei")))
+    return _apply_batch(event_ids, statement, REPORTED if damage else CLOSED, "submit")
+
 
-    sql_update = """
-        UPDATE event
-        SET is_done = TRUE,
-            closed_at = %s,
-            process_time = %s
-        WHERE id = %s
+def mark_events_as_repaired(event_ids):
+    """ report/repair/batch
+    Repair several events in one transaction
     """
-    now = datetime.now(ZoneInfo("Asia/Taipei"))
-    cursor.execute(sql_update, (
-        now.strftime("%Y-%m-%d %H:%M:%S"),
-        -1,  # -1 表示未處理
-        event_id
-    ))
+    return _apply_batch(event_ids, build_repair_batch(datetime.now(ZoneInfo("Asia/Taipei"))),
+                        CLOSED, "repair")
 
 
-def auto_close_unprocessed_events():
+def auto_close_unprocessed_events(batch_size: int = AUTO_CLOSE_BATCH_SIZE):
+    """
+    Close every event that has been stuck in one state for over an hour,
+    using set-based UPDATEs of at most ``batch_size`` rows each. Every chunk
+    is committed on its own so row locks are held only briefly.
+    Returns the number of events closed.
+    """
+    # LIMIT 0 would close nothing and never leave the chunk loop
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
     conn = get_mysql_connection()
     if not conn:
         return 0
+
+    start = time.perf_counter()
+    closed = 0
     try:
         with conn.cursor() as cursor:
             # 台灣現在時間
             now = datetime.now(ZoneInfo("Asia/Taipei"))
-            one_hour_ago = now - timedelta(hours=1)
-
-            # 條件 1
-            sql1 = """
-                SELECT id FROM event
-                WHERE ack_time IS NULL
-                  AND create_at <= %s
-                  AND closed_at IS NULL
-            """
-            cursor.execute(sql1, (one_hour_ago.strftime("%Y-%m-%d %H:%M:%S"),))
-            to_close_1 = cursor.fetchall()
-
-            # 條件 2
-            sql2 = """
-                SELECT id FROM event
-                WHERE report_at IS NULL
-                  AND ack_time IS NOT NULL
-                  AND ack_time <= %s
-                  AND closed_at IS NULL
-            """
-            cursor.execute(sql2, (one_hour_ago.strftime("%Y-%m-%d %H:%M:%S"),))
-            to_close_2 = cursor.fetchall()
-
-            # 條件 3
-            sql3 = """
-                SELECT id FROM event
-                WHERE report_at IS NOT NULL
-                  AND report_at <= %s
-                  AND closed_at IS NULL
-            """
-            cursor.execute(sql3, (one_hour_ago.strftime("%Y-%m-%d %H:%M:%S"),))
-            to_close_3 = cursor.fetchall()
-
-            to_close_raw = list(to_close_1) + \
-                list(to_close_2) + list(to_close_3)
-            unique_ids = {row["id"] for row in to_close_raw}  # 用 set 去重
-
-            to_close = [{"id": event_id} for event_id in unique_ids]
-            logger.info(f"Auto-close events: {to_close}")
-
-            for row in to_close:
-                event_id = row['id']
-                close_events(cursor, event_id)
-
-        conn.commit()
-        logger.info(f"Auto-closed {len(to_close)} events successfully")
-        return len(to_close)
+            one_hour_ago = format_time(now - timedelta(hours=1))
+
+            while True:
+                cursor.execute(SQL_AUTO_CLOSE, (
+                    format_time(now), one_hour_ago, one_hour_ago, one_hour_ago, batch_size))
+                affected = cursor.rowcount
+                conn.commit()
+                closed += affected
+                if affected < batch_size:
+                    break
+
+        logger.info(f"Auto-closed {closed} events successfully")
+        if closed:
+            change_feed.publish({"type": AUTO_CLOSED, "region": None, "count": closed})
+        return closed
     except Exception as e:
         logger.error("Failed to auto-close events")
         logger.exception(e)
-        return 0
+        return closed
     finally:
+        auto_close_duration_seconds.observe(time.perf_counter() - start)
+        auto_closed_events.inc(closed)
         conn.close()
@@ -0,0 +1,184 @@
+"""
+asyncio versions of the dispatcher endpoints in app.services.report_service.
+
+They run the same SQL through aiomysql so a single uvicorn worker can serve
+many concurrent polls without tying up the threadpool. Return values follow
+the sync functions (400 / 500 / bool / rows).
+"""
+from datetime import datetime
+import logging
+from zoneinfo import ZoneInfo
+
+from app.change_feed import ACKNOWLEDGED, CLOSED, REPORTED, publish_event_change
+from app.db_async import get_async_mysql_connection
+from app.services.report_service import (SQL_ACKNOWLEDGE, SQL_EVENT_EXISTS,
+                                         batch_results,
+                                         build_acknowledge_batch,
+                                         build_acknowledged_query,
+                                         build_board_query,
+                                         build_closed_query,
+                                         build_in_process_query,
+                                         build_repair_batch,
+                                         build_repair_statement,
+                                         build_submit_batch,
+                                         build_submit_statement,
+                                         build_unacknowledged_query,
+                                         format_closed_rows,
+                                         is_valid_location,
+                                         partition_board_rows, taipei_now_str)
+
+logger = logging.getLogger(__name__)
+
+
+async def _fetch_events(location: str, build_query):
+    if not is_valid_location(location):
+        return 400
+
+    async with get_async_mysql_connection() as conn:
+        if not conn:
+            return 500
+        async with conn.cursor() as cursor:
+            await cursor.execute(*build_query(location))
+            return await cursor.fetchall()
+
+
+async def fetch_unacknowledged_events(location: str):
+    """ report/unacknowledged """
+    return await _fetch_events(location, build_unacknowledged_query)
+
+
+async def fetch_acknowledged_events(location: str):
+    """ report/pending """
+    return await _fetch_events(location, build_acknowledged_query)
+
+
+async def fetch_in_process_events(location: str):
+    """ report/in_process """
+    return await _fetch_events(location, build_in_process_query)
+
+
+async def fetch_closed_events(location: str):
+    """ report/closed """
+    rows = await _fetch_events(location, build_closed_query)
+    if isinstance(rows, int):
+        return rows
+    return format_closed_rows(list(rows))
+
+
+async def fetch_board(location: str):
+    """ report/board """
+    rows = await _fetch_events(location, build_board_query)
+    if isinstance(rows, int):
+        return rows
+    return partition_board_rows(list(rows))
+
+
+async def acknowledge_event_by_id(event_id: str):
+    """ report/acknowledge """
+    async with get_async_mysql_connection() as conn:
+        if not conn:
+            return 500
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute(SQL_EVENT_EXISTS, (event_id,))
+                if not await cursor.fetchone():
+                    return False
+
+                await cursor.execute(SQL_ACKNOWLEDGE, (taipei_now_str(), event_id))
+            await conn.commit()
+            publish_event_change(ACKNOWLEDGED, event_id)
+            return True
+        except Exception as e:
+            logger.error("Acknowledge event failed")
+            logger.exception(e)
+            return False
+
+
+async def _missing_or_conflict(cursor, event_id: str):
+    await cursor.execute(SQL_EVENT_EXISTS, (event_id,))
+    if not await cursor.fetchone():
+        return False
+    logger.warning(f"Event {event_id} is not in a state that allows this change")
+    return 409
+
+
+async def update_event_status(event_id: str, damage: bool, operation_active: bool):
+    """ report/submit """
+    async with get_async_mysql_connection() as conn:
+        if not conn:
+            return 500
+        try:
+            async with conn.cursor() as cursor:
+                sql, params = build_submit_statement(
+                    damage, operation_active, datetime.now(ZoneInfo("Asia/Taipei")))
+                await cursor.execute(sql, (*params, event_id))
+                if cursor.rowcount == 0:
+                    return await _missing_or_conflict(cursor, event_id)
+            await conn.commit()
+            publish_event_change(REPORTED if damage else CLOSED, event_id)
+            return True
+        except Exception as e:
+            logger.error("Failed to update event status")
+            logger.exception(e)
+            return False
+
+
+async def mark_event_as_repaired(event_id: str):
+    """ report/repair """
+    async with get_async_mysql_connection() as conn:
+        if not conn:
+            return 500
+        try:
+            async with conn.cursor() as cursor:
+                sql, params = build_repair_statement(datetime.now(ZoneInfo("Asia/Taipei")))
+                await cursor.execute(sql, (*params, event_id))
+                if cursor.rowcount == 0:
+                    return await _missing_or_conflict(cursor, event_id)
+            await conn.commit()
+            publish_event_change(CLOSED, event_id)
+            return True
+        except Exception as e:
+            logger.error("Failed to mark event as repaired")
+            logger.exception(e)
+            return False
+
+
+async def _apply_batch(event_ids, batch, change_type: str, action: str):
+    event_ids = list(dict.fromkeys(event_ids))
+    async with get_async_mysql_connection() as conn:
+        if not conn:
+            return 500
+        try:
+            async with conn.cursor() as cursor:
+                lock_sql, sql, params = batch
+                await cursor.execute(lock_sql, (event_ids,))
+                found = [row["id"] for row in await cursor.fetchall()]
+                if found:
+                    await cursor.execute(sql, (*params, found))
+            await conn.commit()
+        except Exception as e:
+            logger.error(f"Batch {action} failed")
+            logger.exception(e)
+            return 500
+
+    for event_id in found:
+        publish_event_change(change_type, event_id)
+    return batch_results(event_ids, found)
+
+
+async def acknowledge_events(event_ids):
+    """ report/acknowledge/batch """
+    return await _apply_batch(event_ids, build_acknowledge_batch(datetime.now(ZoneInfo("Asia/Taipei"))),
+                              ACKNOWLEDGED, "acknowledge")
+
+
+async def update_events_status(event_ids, damage: bool, operation_active: bool):
+    """ report/submit/batch """
+    statement = build_submit_batch(damage, operation_active, datetime.now(ZoneInfo("Asia/Taipei")))
+    return await _apply_batch(event_ids, statement, REPORTED if damage else CLOSED, "submit")
+
+
+async def mark_events_as_repaired(event_ids):
+    """ report/repair/batch """
+    return await _apply_batch(event_ids, build_repair_batch(datetime.now(ZoneInfo("Asia/Taipei"))),
+                              CLOSED, "repair")
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from alerting.regions import regions
+from app.constants import DEFAULT_ALERT_SUPPRESS, SETTINGS_CACHE_TTL
+from app.db import get_mysql_connection
+
+logger = logging.getLogger(__name__)
+
+ALERT_SUPPRESS_TIME = "alert_suppress_time"
+# Bumped on every settings write so data_ingestion can detect changes cheaply
+SETTINGS_VERSION = "settings_version"
+
+
+def get_alert_suppress_time_from_db():
+    conn = get_mysql_connection()
+    if not conn:
+        return DEFAULT_ALERT_SUPPRESS
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT value FROM settings WHERE name = %s", (ALERT_SUPPRESS_TIME,))
+            result = cursor.fetchone()
+            if result:
+                return int(result["value"])
+            return DEFAULT_ALERT_SUPPRESS
+    finally:
+        conn.close()
+
+
+class SettingsCache:
+    """
+    Caches the alert suppress time for ``ttl`` seconds. Writes through
+    set_alert_suppress_time invalidate it right away; other backend workers
+    pick the change up when their TTL expires.
+    """
+
+    def __init__(self, ttl: float = SETTINGS_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._alert_suppress_time: Optional[int] = None
+        self._loaded_at = 0.0
+        # Bumped on every invalidation so a read that raced a write is not stored
+        self.generation = 0
+
+    def get_alert_suppress_time(self) -> int:
+        with self._lock:
+            if self._alert_suppress_time is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._alert_suppress_time
+            generation = self.generation
+
+        value = get_alert_suppress_time_from_db()
+        with self._lock:
+            if generation == self.generation:
+                self._alert_suppress_time = value
+                self._loaded_at = time.monotonic()
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._alert_suppress_time = None
+
+
+settings_cache = SettingsCache()
+
+
+def get_alert_suppress_time() -> int:
+    return settings_cache.get_alert_suppress_time()
+
+
+def set_alert_suppress_time(alert_suppress_time: int):
+    conn = get_mysql_connection()
+    if not conn:
+        return 500
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "REPLACE INTO settings (name, value) VALUES (%s, %s)",
+                (ALERT_SUPPRESS_TIME, str(alert_suppress_time))
+            )
+            cursor.execute("""
+                INSERT INTO settings (name, value) VALUES (%s, '1')
+                ON DUPLICATE KEY UPDATE value = CAST(value AS UNSIGNED) + 1
+            """, (SETTINGS_VERSION,))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error("Failed to update alert suppress time")
+        logger.exception(e)
+        return 500
+    finally:
+        settings_cache.invalidate()
+        conn.close()
+
+
+def load_regions():
+    conn = get_mysql_connection()
+    if not conn:
+        return
+    try:
+        with conn.cursor() as cursor:
+            regions.load(cursor)
+    except Exception as e:
+        logger.error("Failed to load regions, keeping the current ones")
+        logger.exception(e)
+    finally:
+        conn.close()
+
+
+def get_regions():
+    return [region._asdict() for region in regions.all()]
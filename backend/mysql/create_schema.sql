@@ -6,7 +6,9 @@ CREATE TABLE IF NOT EXISTS earthquake (
     longitude VARCHAR(20),              -- 經度
     magnitude FLOAT,                    -- 芮氏規模
     depth FLOAT,                        -- 震源深度（公里）
-    is_demo BOOLEAN                     -- 是否為 demo 地震（T/F）
+    is_demo BOOLEAN,                    -- 是否為 demo 地震（T/F）
+    INDEX idx_earthquake_time (earthquake_time),
+    INDEX idx_earthquake_demo_time (is_demo, earthquake_time)
 );
 
 CREATE TABLE IF NOT EXISTS earthquake_location (
@@ -14,7 +16,8 @@ CREATE TABLE IF NOT EXISTS earthquake_location (
     earthquake_id INT,                     -- 對應 earthquake.id
     location VARCHAR(255),                 -- 地點名稱
     intensity FLOAT,                       -- 各地震度
-    FOREIGN KEY (earthquake_id) REFERENCES earthquake(id)
+    FOREIGN KEY (earthquake_id) REFERENCES earthquake(id),
+    INDEX idx_earthquake_location_eq (earthquake_id, location, intensity)
 );
 
 CREATE TABLE IF NOT EXISTS event (
@@ -32,7 +35,19 @@ CREATE TABLE IF NOT EXISTS event (
     report_at TIMESTAMP NULL,             -- 回報時間
     closed_at TIMESTAMP NULL,             -- 確認修復完成時間
     process_time INT NULL,                -- 處理時間(分鐘)
-    FOREIGN KEY (location_eq_id) REFERENCES earthquake_location(id)
+    FOREIGN KEY (location_eq_id) REFERENCES earthquake_location(id),
+    -- 儀表板查詢（/report/*）依地區篩選用
+    INDEX idx_event_region_unack (region, is_done, ack, create_at),
+    INDEX idx_event_region_pending (region, is_done, is_damage, ack_time),
+    INDEX idx_event_region_in_process (region, is_done, is_damage, report_at),
+    INDEX idx_event_region_closed (region, is_done, closed_at),
+    -- 警報抑制檢查
+    INDEX idx_event_region_alert (region, trigger_alert, create_at, level),
+    -- auto_close_unprocessed_events
+    INDEX idx_event_open (closed_at, create_at, ack_time, report_at),
+    -- location = all 的儀表板查詢
+    INDEX idx_event_state (is_done, ack, is_damage, create_at),
+    INDEX idx_event_done_closed (is_done, closed_at)
 );
 
 -- CREATE TABLE IF NOT EXISTS alert (
@@ -46,4 +61,31 @@ CREATE TABLE IF NOT EXISTS event (
 CREATE TABLE IF NOT EXISTS settings (
     name VARCHAR(255) PRIMARY KEY,
     value VARCHAR(255)
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS region (
+    name VARCHAR(64) PRIMARY KEY,             -- 標準地區名稱（event.region）
+    suffix VARCHAR(8) NOT NULL UNIQUE,        -- event id 後綴
+    county VARCHAR(32) NOT NULL,              -- CWA 報告的 CountyName
+    l1_intensity FLOAT NOT NULL DEFAULT 1,    -- 震度 >= 此值為 L1
+    l2_intensity FLOAT NOT NULL DEFAULT 3,    -- 震度 >= 此值為 L2
+    l2_magnitude FLOAT NOT NULL DEFAULT 5,    -- 規模 >= 此值為 L2
+    active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+INSERT IGNORE INTO region (name, suffix, county) VALUES
+    ('Taipei', '-tp', '臺北市'),
+    ('Hsinchu', '-hc', '新竹市'),
+    ('Taichung', '-tc', '臺中市'),
+    ('Tainan', '-tn', '臺南市');
+
+-- 由 app/migrations.py 管理的 schema 版本；新建資料庫已包含下列 migration
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(255) PRIMARY KEY,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO schema_migrations (version) VALUES
+    ('001_event_region_indexes'),
+    ('002_hot_path_indexes'),
+    ('003_region_registry');
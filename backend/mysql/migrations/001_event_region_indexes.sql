@@ -0,0 +1,14 @@
+-- 001: Filter dashboard queries by event.region instead of `e.id LIKE '%-tp'`.
+-- Fresh databases already get these indexes from create_schema.sql.
+
+-- 舊資料的 region 存的是原始地點名稱，依事件 ID 後綴改為標準地區名稱
+UPDATE event SET region = 'Taipei'   WHERE id LIKE '%-tp';
+UPDATE event SET region = 'Hsinchu'  WHERE id LIKE '%-hc';
+UPDATE event SET region = 'Taichung' WHERE id LIKE '%-tc';
+UPDATE event SET region = 'Tainan'   WHERE id LIKE '%-tn';
+
+ALTER TABLE event
+    ADD INDEX idx_event_region_unack (region, is_done, ack, create_at),
+    ADD INDEX idx_event_region_pending (region, is_done, is_damage, ack_time),
+    ADD INDEX idx_event_region_in_process (region, is_done, is_damage, report_at),
+    ADD INDEX idx_event_region_closed (region, is_done, closed_at);
@@ -0,0 +1,19 @@
+-- 002: Covering indexes for the remaining hot queries.
+
+-- 警報抑制檢查：WHERE region = ? AND trigger_alert = 1 AND create_at BETWEEN ? AND ?（取 level）
+-- auto_close_unprocessed_events：closed_at IS NULL 搭配 create_at / ack_time / report_at
+-- location = all 的儀表板查詢（沒有 region 條件）
+ALTER TABLE event
+    ADD INDEX idx_event_region_alert (region, trigger_alert, create_at, level),
+    ADD INDEX idx_event_open (closed_at, create_at, ack_time, report_at),
+    ADD INDEX idx_event_state (is_done, ack, is_damage, create_at),
+    ADD INDEX idx_event_done_closed (is_done, closed_at);
+
+-- exporter 依 earthquake_id + location 取震度，以及 earthquake_id 的 JOIN
+ALTER TABLE earthquake_location
+    ADD INDEX idx_earthquake_location_eq (earthquake_id, location, intensity);
+
+-- 最新地震（exporter）與模擬地震列表
+ALTER TABLE earthquake
+    ADD INDEX idx_earthquake_time (earthquake_time),
+    ADD INDEX idx_earthquake_demo_time (is_demo, earthquake_time);
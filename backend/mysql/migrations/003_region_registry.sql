@@ -0,0 +1,18 @@
+-- 003: Region registry, replacing the region lists hard-coded in the backend and data_ingestion.
+-- Both load active regions at startup and reload them every minute.
+
+CREATE TABLE IF NOT EXISTS region (
+    name VARCHAR(64) PRIMARY KEY,             -- 標準地區名稱（event.region）
+    suffix VARCHAR(8) NOT NULL UNIQUE,        -- event id 後綴
+    county VARCHAR(32) NOT NULL,              -- CWA 報告的 CountyName
+    l1_intensity FLOAT NOT NULL DEFAULT 1,    -- 震度 >= 此值為 L1
+    l2_intensity FLOAT NOT NULL DEFAULT 3,    -- 震度 >= 此值為 L2
+    l2_magnitude FLOAT NOT NULL DEFAULT 5,    -- 規模 >= 此值為 L2
+    active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+INSERT IGNORE INTO region (name, suffix, county) VALUES
+    ('Taipei', '-tp', '臺北市'),
+    ('Hsinchu', '-hc', '新竹市'),
+    ('Taichung', '-tc', '臺中市'),
+    ('Tainan', '-tn', '臺南市');
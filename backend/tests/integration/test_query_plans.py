@@ -0,0 +1,179 @@
+"""
+Runs the service functions against a real MySQL database and EXPLAINs every
+SELECT / UPDATE they issue. Fails when any table outside SMALL_TABLES is read
+without an index (``type = ALL`` or no ``key``), even when the optimizer had
+one it could have used.
+
+Needs a scratch database, which is dropped and recreated from
+``mysql/create_schema.sql``. CI runs it against a MySQL 8.0 service
+container (see .github/workflows/develop_ci.yaml); locally:
+
+    TEST_DB_NAME=earthquake_test DB_HOST=127.0.0.1 DB_PASSWORD=... \
+        PYTHONPATH=. pytest tests/integration
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pymysql
+import pytest
+from app.migrations import split_statements
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("TEST_DB_NAME"), reason="TEST_DB_NAME not set")
+
+CREATE_SCHEMA = Path(__file__).resolve().parents[2] / "mysql" / "create_schema.sql"
+TABLES = ("schema_migrations", "settings", "event", "earthquake_location", "earthquake")
+# Small lookup tables that are read whole on purpose
+LOOKUP_TABLES = ("region",)
+# Tables allowed to be scanned: a few rows each, read whole on purpose
+SMALL_TABLES = ("schema_migrations", "settings") + LOOKUP_TABLES
+SERVICE_MODULES = (
+    "app.services.report_service",
+    "app.services.earthquake_service",
+    "app.services.settings_service",
+    "app.exporter",
+)
+
+
+def connect():
+    return pymysql.connect(
+        host=os.getenv("DB_HOST", ""),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("TEST_DB_NAME"),
+        cursorclass=pymysql.cursors.DictCursor,
+        init_command="SET time_zone = '+08:00'",
+    )
+
+
+class ExplainingCursor:
+    def __init__(self, cursor, plans):
+        self._cursor = cursor
+        self._plans = plans
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            self._cursor.execute("EXPLAIN " + sql, params)
+            self._plans.append((" ".join(sql.split()), self._cursor.fetchall()))
+        return self._cursor.execute(sql, params)
+
+
+class ExplainingConnection:
+    def __init__(self, conn, plans):
+        self._conn = conn
+        self._plans = plans
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args):
+        return ExplainingCursor(self._conn.cursor(*args), self._plans)
+
+
+@pytest.fixture(scope="module")
+def database():
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            for table in TABLES + LOOKUP_TABLES:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            for statement in split_statements(CREATE_SCHEMA.read_text(encoding="utf-8")):
+                cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def plans(database, monkeypatch):
+    import importlib
+
+    recorded = []
+    # The closed-event tracker only reads in the scheduler leader
+    monkeypatch.setattr(importlib.import_module("app.leader").leader, "is_leader", True)
+    for module_name in SERVICE_MODULES:
+        module = importlib.import_module(module_name)
+        monkeypatch.setattr(module, "get_mysql_connection",
+                            lambda: ExplainingConnection(connect(), recorded))
+    return recorded
+
+
+def run_service_queries():
+    from app import exporter
+    from app.schemas.earthquake import EarthquakeIngestRequest, EarthquakeScenarioRequest
+    from app.services import earthquake_service, report_service, settings_service
+
+    now = datetime.now(ZoneInfo("Asia/Taipei")).strftime("%Y-%m-%dT%H:%M:%S")
+    req = EarthquakeIngestRequest(
+        earthquake={"earthquake_time": now, "center": "test", "latitude": "24.5",
+                    "longitude": "121.8", "magnitude": 4.5, "depth": 10.0, "is_demo": True},
+        locations=[{"location": "Taipei", "intensity": 3}, {"location": "Hsinchu", "intensity": 1},
+                   {"location": "Taichung", "intensity": 2}, {"location": "Tainan", "intensity": 0}],
+    )
+    settings_service.load_regions()
+    earthquake_service.rebuild_suppression_index()
+    assert earthquake_service.process_earthquake_and_locations(req, alert_suppress_time=30) is True
+    eq_id = req.earthquake.earthquake_id
+    # Enough rows that the optimizer does not prefer scanning a near-empty table
+    scenario = EarthquakeScenarioRequest(aftershocks={
+        "mainshock": req.model_dump(exclude={"earthquake": {"earthquake_id"}}), "count": 250, "seed": 1})
+    assert isinstance(earthquake_service.process_earthquake_scenario(scenario, chunk_size=50), dict)
+
+    for location in ("Taipei", "all"):
+        report_service.fetch_unacknowledged_events(location)
+        report_service.fetch_acknowledged_events(location)
+        report_service.fetch_in_process_events(location)
+        report_service.fetch_closed_events(location)
+        report_service.fetch_board(location)
+
+    report_service.acknowledge_event_by_id(f"{eq_id}-tp")
+    report_service.update_event_status(f"{eq_id}-tp", True, True)
+    report_service.mark_event_as_repaired(f"{eq_id}-tp")
+    report_service.acknowledge_event_by_id(f"{eq_id}-hc")
+    report_service.update_event_status(f"{eq_id}-hc", False, False)
+    report_service.acknowledge_events([f"{eq_id}-tc", f"{eq_id}-tn"])
+    report_service.update_events_status([f"{eq_id}-tc"], True, False)
+    report_service.mark_events_as_repaired([f"{eq_id}-tc"])
+    report_service.update_events_status([f"{eq_id}-tn"], False, False)
+    report_service.auto_close_unprocessed_events()
+
+    earthquake_service.fetch_all_simulated_earthquakes()
+    settings_service.set_alert_suppress_time(30)
+    settings_service.get_alert_suppress_time_from_db()
+    exporter.update_new_data()
+
+
+def is_unindexed_read(row) -> bool:
+    table = row["table"]
+    # No table (e.g. "Impossible WHERE") or a derived / temporary result
+    if table is None or table.startswith("<") or table in SMALL_TABLES:
+        return False
+    # Aliased tables (``event AS e``) are reported under their alias, so
+    # every other table counts
+    return row["type"] == "ALL" or row["key"] is None
+
+
+def test_service_queries_use_indexes(plans):
+    run_service_queries()
+
+    assert plans, "no queries were captured"
+    full_scans = [
+        (sql, row["table"])
+        for sql, rows in plans
+        for row in rows
+        if is_unindexed_read(row)
+    ]
+    assert not full_scans, "queries fall back to full table scans:\n" + "\n".join(
+        f"  [{table}] {sql}" for sql, table in full_scans)
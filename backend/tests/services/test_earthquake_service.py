@@ -1,15 +1,18 @@
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from unittest import mock
 from unittest.mock import MagicMock, patch
 
 import pytest
-from app.services.earthquake_service import (determine_level,
-                                             fetch_all_simulated_earthquakes,
+from alerting.suppression import SuppressionIndex
+from app.schemas.earthquake import AftershockSequence, EarthquakeScenarioRequest
+from app.services.earthquake_service import (fetch_all_simulated_earthquakes,
+                                             generate_aftershocks,
                                              generate_simulated_earthquake_id,
-                                             get_alert_suppress_time_from_db,
-                                             process_earthquake_and_locations)
+                                             process_earthquake_and_locations,
+                                             process_earthquake_scenario,
+                                             reserve_simulated_earthquake_ids)
 
 
 def normalize_sql(sql):
@@ -29,8 +32,10 @@ def mock_db_connection(mocker):
     # Mock the get_mysql_connection function globally for the main function
     mocker.patch("app.services.earthquake_service.get_mysql_connection", return_value=mock_conn)
     
-    # Mock the get_alert_suppress_time_from_db function directly
-    mocker.patch("app.services.earthquake_service.get_alert_suppress_time_from_db", return_value=30)
+    # Mock the cached alert suppress setting directly
+    mocker.patch("app.services.earthquake_service.get_alert_suppress_time", return_value=30)
+    mocker.patch("app.services.earthquake_service.suppression_index",
+                 SuppressionIndex(["Taipei", "Hsinchu", "Taichung", "Tainan"]))
 
     return mock_conn, mock_cursor
 
@@ -67,54 +72,6 @@ def mock_request():
 
     return MockRequest()
 
-# determine_level
-def test_determine_level():
-    assert determine_level(1, 4.5) == "L1"
-    assert determine_level(2, 5.0) == "L2"
-    assert determine_level(3, 3.0) == "L2"
-    assert determine_level(0, 3.0) == "NA"
-
-# get_alert_suppress_time_from_db
-def test_get_alert_suppress_time_from_db(mocker):
-    # Mock the database connection and cursor
-    mock_conn = MagicMock()
-    mock_cursor = MagicMock()
-    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-    mocker.patch("app.services.earthquake_service.get_mysql_connection", return_value=mock_conn)
-
-    # Mock the query result
-    mock_cursor.fetchone.return_value = {"value": "45"}
-
-    # Call the function
-    result = get_alert_suppress_time_from_db()
-
-    # Assertions
-    assert result == 45
-    mock_cursor.execute.assert_called_once_with(
-        "SELECT value FROM settings WHERE name = %s", ("alert_suppress_time",)
-    )
-    mock_conn.close.assert_called_once()
-
-def test_get_alert_suppress_time_from_db_default(mocker):
-    # Mock the database connection and cursor
-    mock_conn = MagicMock()
-    mock_cursor = MagicMock()
-    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-    mocker.patch("app.services.earthquake_service.get_mysql_connection", return_value=mock_conn)
-
-    # Mock the query result to return None
-    mock_cursor.fetchone.return_value = None
-
-    # Call the function
-    result = get_alert_suppress_time_from_db()
-
-    # Assertions
-    assert result == 30  # Default value
-    mock_cursor.execute.assert_called_once_with(
-        "SELECT value FROM settings WHERE name = %s", ("alert_suppress_time",)
-    )
-    mock_conn.close.assert_called_once()
-
 # generate_simulated_earthquake_id
 def test_generate_simulated_earthquake_id(mocker):
     mock_conn = MagicMock()
@@ -151,6 +108,101 @@ def test_process_earthquake_and_locations(mock_db_connection, mock_request):
     assert result is True
     assert mock_cursor.execute.call_count > 0
 
+def test_process_earthquake_suppressed_by_index(mock_db_connection, mock_request, mocker):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = []
+    index = SuppressionIndex(["Taipei", "Hsinchu", "Taichung", "Tainan"])
+    index.rebuild(mock_cursor)
+    eq_time = datetime.strptime(mock_request.earthquake.earthquake_time, "%Y-%m-%dT%H:%M:%S")
+    index.record(1, "Tainan", "L2", eq_time)
+    mocker.patch("app.services.earthquake_service.suppression_index", index)
+
+    assert process_earthquake_and_locations(mock_request) is True
+
+    sql, rows = mock_cursor.executemany.call_args[0]
+    assert "INSERT INTO event" in sql
+    assert {row[3]: row[5] for row in rows} == {"Taipei": True, "Hsinchu": True, "Taichung": True, "Tainan": False}
+    # The suppressed event is stored already closed
+    assert rows[3][9] is True and rows[3][11] == -1
+    # The index answers without the per-location window query
+    assert not any("create_at BETWEEN" in call[0][0] for call in mock_cursor.execute.call_args_list)
+
+# process_earthquake_scenario
+def scenario_mainshock(minutes_ago=0):
+    eq_time = datetime.now(ZoneInfo("Asia/Taipei")) - timedelta(minutes=minutes_ago)
+    return {
+        "earthquake": {"earthquake_time": eq_time.strftime("%Y-%m-%dT%H:%M:%S"), "center": "test",
+                       "latitude": "24.5", "longitude": "121.8", "magnitude": 6.5, "depth": 10.0, "is_demo": True},
+        "locations": [{"location": "Taipei", "intensity": 5}, {"location": "Tainan", "intensity": 1}],
+    }
+
+def test_generate_aftershocks_is_reproducible():
+    sequence = AftershockSequence(mainshock=scenario_mainshock(), count=50, rate_per_minute=30, seed=7)
+    quakes = generate_aftershocks(sequence)
+
+    assert len(quakes) == 51
+    assert [q.model_dump() for q in quakes] == [q.model_dump() for q in generate_aftershocks(sequence)]
+    times = [q.earthquake.earthquake_time for q in quakes]
+    assert times == sorted(times)
+    # Truncated at mainshock - 1.2 by default
+    assert all(3.0 <= q.earthquake.magnitude <= 5.3 for q in quakes[1:])
+    assert all(q.locations[0].intensity <= 5 for q in quakes[1:])
+
+def test_scenario_requires_earthquakes():
+    with pytest.raises(ValueError):
+        EarthquakeScenarioRequest()
+
+def test_process_earthquake_scenario_in_chunks(mock_db_connection, mocker):
+    mock_conn, mock_cursor = mock_db_connection
+    mocker.patch("app.services.earthquake_service.poll_new_events")
+    mocker.patch("app.services.earthquake_service.notify_new_earthquake")
+    # The locked MAX(id) read of each chunk sees the ids committed by the previous ones
+    mock_cursor.fetchone.side_effect = [{"max_id": None}, {"max_id": 100000002}, {"max_id": 100000004}]
+
+    def fetchall():
+        sql, params = mock_cursor.execute.call_args[0]
+        if "FROM earthquake_location" not in sql:
+            return []
+        return [{"id": i * 10 + j, "earthquake_id": eq_id, "location": location}
+                for i, eq_id in enumerate(params[0]) for j, location in enumerate(("Taipei", "Tainan"))]
+    mock_cursor.fetchall.side_effect = fetchall
+
+    req = EarthquakeScenarioRequest(
+        aftershocks={"mainshock": scenario_mainshock(), "count": 4, "seed": 1})
+    summary = process_earthquake_scenario(req, chunk_size=2)
+
+    assert summary["earthquakes"] == 5
+    assert summary["events"] == 10
+    assert summary["earthquake_ids"] == list(range(100000001, 100000006))
+    # Three chunks: one commit and three executemany (earthquakes, locations, events) each
+    assert mock_conn.commit.call_count == 3
+    assert mock_cursor.executemany.call_count == 9
+    # The mainshock alerts; the aftershocks inside the window are suppressed
+    assert 2 <= summary["alerts"] < summary["events"]
+    locked_reads = [c for c in mock_cursor.execute.call_args_list if "FOR UPDATE" in c[0][0]]
+    assert len(locked_reads) == 3
+
+def test_reserved_ids_skip_ids_given_in_the_request(mocker):
+    cursor = MagicMock()
+    cursor.fetchone.return_value = {"max_id": 100000010}
+    earthquakes = [MagicMock(earthquake_id=None) for _ in range(3)] + [MagicMock(earthquake_id=5)]
+
+    reserve_simulated_earthquake_ids(cursor, earthquakes, taken={5, 100000012})
+
+    assert [eq.earthquake_id for eq in earthquakes] == [100000011, 100000013, 100000014, 5]
+    assert normalize_sql(cursor.execute.call_args[0][0]).endswith("FORUPDATE")
+
+def test_reserve_ids_without_id_less_earthquakes_reads_nothing():
+    cursor = MagicMock()
+    reserve_simulated_earthquake_ids(cursor, [MagicMock(earthquake_id=7)], taken={7})
+    cursor.execute.assert_not_called()
+
+def test_process_earthquake_scenario_too_early(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    req = EarthquakeScenarioRequest(earthquakes=[scenario_mainshock(minutes_ago=90)])
+    assert process_earthquake_scenario(req) == 400
+    mock_cursor.execute.assert_not_called()
+
 # fetch_all_simulated_earthquakes
 def test_fetch_all_simulated_earthquakes(mock_db_connection):
     """
@@ -172,8 +224,8 @@ def test_fetch_all_simulated_earthquakes(mock_db_connection):
             }
         ],
         [
-            {"location": "Taipei", "intensity": 1, "level": 1},
-            {"location": "Hsinchu", "intensity": 2, "level": 2},
+            {"earthquake_id": 1, "location": "Taipei", "intensity": 1, "level": "L1"},
+            {"earthquake_id": 1, "location": "Hsinchu", "intensity": 2, "level": "L2"},
         ],
     ]
     
@@ -181,5 +233,32 @@ def test_fetch_all_simulated_earthquakes(mock_db_connection):
     
     assert len(result) == 1
     assert result[0]["earthquake"]["center"] == "嘉義縣政府東南東方  30.8  公里 (位於嘉義縣大埔鄉)"
+    assert result[0]["earthquake_id"] == 1
     assert len(result[0]["locations"]) == 2
-    assert result[0]["locations"][0]["location"] == "Taipei"
\ No newline at end of file
+    assert result[0]["locations"][0]["location"] == "Taipei"
+    assert result[0]["locations"][1]["level"] == 2
+    # One query for the page, one for all of its locations
+    assert mock_cursor.execute.call_count == 2
+
+def test_fetch_all_simulated_earthquakes_before(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = []
+
+    result = fetch_all_simulated_earthquakes(limit=10, before=datetime(2025, 5, 1, 12, 0, 0))
+
+    assert result == []
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "earthquake_time < %s" in sql
+    assert params == ["2025-05-01 12:00:00", 10]
+
+
+def test_fetch_all_simulated_earthquakes_before_id_breaks_ties(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = []
+
+    fetch_all_simulated_earthquakes(limit=10, before=datetime(2025, 5, 1, 12, 0, 0), before_id=42)
+
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "(earthquake_time, id) < (%s, %s)" in sql
+    assert "ORDER BY earthquake_time DESC, id DESC" in sql
+    assert params == ["2025-05-01 12:00:00", 42, 10]
\ No newline at end of file
@@ -1,15 +1,20 @@
 from datetime import datetime, timedelta
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, PropertyMock, patch
 
 import pytest
 from app.services.report_service import (acknowledge_event_by_id,
+                                         acknowledge_events,
                                          auto_close_unprocessed_events,
+                                         board_etag,
                                          fetch_acknowledged_events,
+                                         fetch_board,
                                          fetch_closed_events,
                                          fetch_in_process_events,
                                          fetch_unacknowledged_events,
                                          mark_event_as_repaired,
-                                         update_event_status)
+                                         mark_events_as_repaired,
+                                         update_event_status,
+                                         update_events_status)
 
 
 @pytest.fixture
@@ -30,6 +35,23 @@ def test_fetch_unacknowledged_events(mock_db_connection):
     assert result == [{"event_id": "114097-tp", "region": "Taipei", "level": "L2"}]
     mock_cursor.execute.assert_called_once()
 
+def test_fetch_unacknowledged_events_filters_by_region(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = []
+    fetch_unacknowledged_events("Taipei")
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "e.region = %s" in sql
+    assert "LIKE" not in sql
+    assert params[-1] == "Taipei"
+
+def test_fetch_unacknowledged_events_all_locations(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = []
+    fetch_unacknowledged_events("all")
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "e.region = %s" not in sql
+    assert len(params) == 1
+
 def test_fetch_unacknowledged_events_invalid_location(mock_db_connection):
     result = fetch_unacknowledged_events("InvalidLocation")
     assert result == 400
@@ -65,14 +87,32 @@ def test_update_event_status_success(mock_db_connection):
     mock_cursor.rowcount = 1
     result = update_event_status("114097-tp", True, True)
     assert result is True
-    mock_cursor.execute.assert_called()
+    mock_cursor.execute.assert_called_once()
+
+def test_update_event_status_single_conditional_update(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.rowcount = 1
+    assert update_event_status("114097-tp", False, True) is True
+    mock_cursor.execute.assert_called_once()
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "TIMESTAMPDIFF(MINUTE, create_at, %s)" in sql
+    assert "ack = TRUE AND is_damage IS NULL AND is_done = FALSE" in sql
+    assert params[-1] == "114097-tp"
 
 def test_update_event_status_failure(mock_db_connection):
     mock_conn, mock_cursor = mock_db_connection
     mock_cursor.rowcount = 0
+    mock_cursor.fetchone.return_value = None
     result = update_event_status("114097-tp", True, True)
     assert result is False
 
+def test_update_event_status_invalid_state(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.rowcount = 0
+    mock_cursor.fetchone.return_value = {"id": "114097-tp"}
+    assert update_event_status("114097-tp", True, True) == 409
+    mock_conn.commit.assert_not_called()
+
 # fetch_in_process_events
 def test_fetch_in_process_events(mock_db_connection):
     mock_conn, mock_cursor = mock_db_connection
@@ -87,17 +127,26 @@ def test_fetch_in_process_events(mock_db_connection):
 # mark_event_as_repaired
 def test_mark_event_as_repaired_success(mock_db_connection):
     mock_conn, mock_cursor = mock_db_connection
-    mock_cursor.fetchone.return_value = {"create_at": datetime.now()}
+    mock_cursor.rowcount = 1
     result = mark_event_as_repaired("114097-tp")
     assert result is True
-    mock_cursor.execute.assert_called()
+    mock_cursor.execute.assert_called_once()
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "is_damage = TRUE AND is_done = FALSE" in sql
 
 def test_mark_event_as_repaired_failure(mock_db_connection):
     mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.rowcount = 0
     mock_cursor.fetchone.return_value = None
     result = mark_event_as_repaired("114097-tp")
     assert result is False
 
+def test_mark_event_as_repaired_invalid_state(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.rowcount = 0
+    mock_cursor.fetchone.return_value = {"id": "114097-tp"}
+    assert mark_event_as_repaired("114097-tp") == 409
+
 # fetch_closed_events
 def test_fetch_closed_events(mock_db_connection):
     mock_conn, mock_cursor = mock_db_connection
@@ -122,15 +171,105 @@ def test_fetch_closed_events_unprocessed(mock_db_connection):
 # auto_close_unprocessed_events
 def test_auto_close_unprocessed_events_success(mock_db_connection):
     mock_conn, mock_cursor = mock_db_connection
-    mock_cursor.fetchall.return_value = [{"id": "114097-tp"}]
     mock_cursor.rowcount = 1
     result = auto_close_unprocessed_events()
     assert result == 1
-    mock_cursor.execute.assert_called()
+    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_args[0][0].lstrip().startswith("UPDATE event")
+    mock_conn.commit.assert_called_once()
+
+def test_auto_close_unprocessed_events_in_batches(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    type(mock_cursor).rowcount = PropertyMock(side_effect=[2, 2, 1])
+    result = auto_close_unprocessed_events(batch_size=2)
+    assert result == 5
+    assert mock_cursor.execute.call_count == 3
+    assert mock_cursor.execute.call_args[0][1][-1] == 2
+    assert mock_conn.commit.call_count == 3
+
+@pytest.mark.parametrize("batch_size", [0, -1])
+def test_auto_close_unprocessed_events_rejects_empty_batches(mock_db_connection, batch_size):
+    mock_conn, mock_cursor = mock_db_connection
+    with pytest.raises(ValueError):
+        auto_close_unprocessed_events(batch_size=batch_size)
+    mock_cursor.execute.assert_not_called()
 
 def test_auto_close_unprocessed_events_failure(mock_db_connection):
     mock_conn, mock_cursor = mock_db_connection
-    mock_cursor.fetchall.return_value = []
+    mock_cursor.execute.side_effect = Exception("lock wait timeout")
     result = auto_close_unprocessed_events()
     assert result == 0
-    mock_cursor.execute.assert_called()
\ No newline at end of file
+    mock_cursor.execute.assert_called()
+
+# fetch_board
+def board_row(bucket, event_id, **state):
+    row = {"bucket": bucket, "sort_time": datetime(2025, 5, 1, 12, 0, 0), "event_id": event_id,
+           "earthquake_time": datetime(2025, 5, 1, 11, 59, 0), "alert_time": datetime(2025, 5, 1, 12, 0, 0),
+           "magnitude": 5.1, "intensity": 3, "level": "L2", "region": "Taipei",
+           "ack_time": None, "is_damage": None, "is_operation_active": None, "process_time": None}
+    row.update(state)
+    return row
+
+def test_fetch_board_single_query(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = [
+        board_row("unacknowledged", "1-tp"),
+        board_row("closed", "2-tp", is_damage=False, process_time=-1),
+    ]
+    board = fetch_board("Taipei")
+
+    mock_cursor.execute.assert_called_once()
+    sql, params = mock_cursor.execute.call_args[0]
+    assert sql.count("UNION ALL") == 3
+    assert params.count("Taipei") == 4
+    assert [row["event_id"] for row in board["unacknowledged"]] == ["1-tp"]
+    assert board["pending"] == [] and board["in_process"] == []
+    assert "ack_time" not in board["unacknowledged"][0]
+    assert board["closed"][0]["process_time"] == "未處理"
+
+def test_fetch_board_invalid_location(mock_db_connection):
+    assert fetch_board("InvalidLocation") == 400
+
+def test_board_etag_follows_row_state():
+    board = {"unacknowledged": [board_row("unacknowledged", "1-tp")], "pending": []}
+    moved = {"unacknowledged": [], "pending": [board_row("pending", "1-tp", ack_time=datetime(2025, 5, 1, 12, 5, 0))]}
+    assert board_etag(board) == board_etag({"unacknowledged": [board_row("unacknowledged", "1-tp")], "pending": []})
+    assert board_etag(board) != board_etag(moved)
+
+# batch acknowledge / submit / repair
+def test_acknowledge_events_one_update(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = [{"id": "1-tp"}, {"id": "1-hc"}]
+    result = acknowledge_events(["1-tp", "1-hc", "1-xx", "1-tp"])
+    assert result == [
+        {"event_id": "1-tp", "success": True},
+        {"event_id": "1-hc", "success": True},
+        {"event_id": "1-xx", "success": False},
+    ]
+    assert mock_cursor.execute.call_count == 2
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "WHERE id IN %s" in sql
+    assert params[-1] == ["1-tp", "1-hc"]
+    mock_conn.commit.assert_called_once()
+
+def test_update_events_status_no_damage_computes_process_time_in_sql(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = [{"id": "1-tp"}]
+    assert update_events_status(["1-tp"], False, True) == [{"event_id": "1-tp", "success": True}]
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "TIMESTAMPDIFF(MINUTE, create_at, %s)" in sql
+    assert "WHERE id IN %s" in sql
+    lock_sql = mock_cursor.execute.call_args_list[0][0][0]
+    assert "is_damage IS NULL" in lock_sql
+
+def test_mark_events_as_repaired_none_found(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = []
+    assert mark_events_as_repaired(["1-tp"]) == [{"event_id": "1-tp", "success": False}]
+    mock_cursor.execute.assert_called_once()
+
+def test_batch_failure_returns_500(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.execute.side_effect = Exception("DB error")
+    assert acknowledge_events(["1-tp"]) == 500
+    mock_conn.commit.assert_not_called()
@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from app.services.report_service_async import (acknowledge_event_by_id,
+                                               acknowledge_events,
+                                               fetch_closed_events,
+                                               fetch_unacknowledged_events,
+                                               update_event_status)
+
+
+@pytest.fixture
+def mock_async_connection(mocker):
+    mock_cursor = AsyncMock()
+    mock_cursor.rowcount = 1
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value.__aenter__.return_value = mock_cursor
+    mock_conn.commit = AsyncMock()
+
+    @asynccontextmanager
+    async def fake_connection():
+        yield mock_conn
+
+    mocker.patch("app.services.report_service_async.get_async_mysql_connection", fake_connection)
+    return mock_conn, mock_cursor
+
+
+def test_fetch_unacknowledged_events(mock_async_connection):
+    mock_conn, mock_cursor = mock_async_connection
+    mock_cursor.fetchall.return_value = [
+        {"event_id": "114097-tp", "region": "Taipei", "level": "L2"}
+    ]
+    result = asyncio.run(fetch_unacknowledged_events("Taipei"))
+    assert result == [{"event_id": "114097-tp", "region": "Taipei", "level": "L2"}]
+    mock_cursor.execute.assert_awaited_once()
+
+
+def test_fetch_unacknowledged_events_invalid_location(mock_async_connection):
+    assert asyncio.run(fetch_unacknowledged_events("InvalidLocation")) == 400
+
+
+def test_fetch_events_connection_error(mocker):
+    @asynccontextmanager
+    async def no_connection():
+        yield None
+
+    mocker.patch("app.services.report_service_async.get_async_mysql_connection", no_connection)
+    assert asyncio.run(fetch_unacknowledged_events("Taipei")) == 500
+
+
+def test_fetch_closed_events_unprocessed(mock_async_connection):
+    mock_conn, mock_cursor = mock_async_connection
+    mock_cursor.fetchall.return_value = [
+        {"event_id": "114097-tp", "region": "Taipei", "level": "L2", "process_time": -1}
+    ]
+    result = asyncio.run(fetch_closed_events("Taipei"))
+    assert result[0]["process_time"] == "未處理"
+
+
+def test_acknowledge_event_by_id(mock_async_connection):
+    mock_conn, mock_cursor = mock_async_connection
+    mock_cursor.fetchone.return_value = {"id": "114097-tp"}
+    assert asyncio.run(acknowledge_event_by_id("114097-tp")) is True
+    mock_conn.commit.assert_awaited_once()
+
+
+def test_acknowledge_event_by_id_not_found(mock_async_connection):
+    mock_conn, mock_cursor = mock_async_connection
+    mock_cursor.fetchone.return_value = None
+    assert asyncio.run(acknowledge_event_by_id("114097-tp")) is False
+    mock_conn.commit.assert_not_awaited()
+
+
+def test_update_event_status_failure(mock_async_connection):
+    mock_conn, mock_cursor = mock_async_connection
+    mock_cursor.rowcount = 0
+    mock_cursor.fetchone.return_value = None
+    assert asyncio.run(update_event_status("114097-tp", True, True)) is False
+
+
+def test_update_event_status_invalid_state(mock_async_connection):
+    mock_conn, mock_cursor = mock_async_connection
+    mock_cursor.rowcount = 0
+    mock_cursor.fetchone.return_value = {"id": "114097-tp"}
+    assert asyncio.run(update_event_status("114097-tp", True, True)) == 409
+    mock_conn.commit.assert_not_awaited()
+
+
+def test_acknowledge_events(mock_async_connection):
+    mock_conn, mock_cursor = mock_async_connection
+    mock_cursor.fetchall.return_value = [{"id": "1-tp"}]
+    result = asyncio.run(acknowledge_events(["1-tp", "1-hc"]))
+    assert result == [{"event_id": "1-tp", "success": True}, {"event_id": "1-hc", "success": False}]
+    assert mock_cursor.execute.await_count == 2
+    mock_conn.commit.assert_awaited_once()
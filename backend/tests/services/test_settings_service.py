@@ -0,0 +1,99 @@
+from unittest.mock import MagicMock
+
+import pytest
+from app.services.settings_service import (SettingsCache,
+                                           get_alert_suppress_time_from_db,
+                                           get_regions, load_regions,
+                                           set_alert_suppress_time,
+                                           settings_cache)
+
+
+@pytest.fixture
+def mock_db_connection(mocker):
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mocker.patch("app.services.settings_service.get_mysql_connection", return_value=mock_conn)
+    return mock_conn, mock_cursor
+
+
+# get_alert_suppress_time_from_db
+def test_get_alert_suppress_time_from_db(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = {"value": "45"}
+
+    assert get_alert_suppress_time_from_db() == 45
+    mock_cursor.execute.assert_called_once_with(
+        "SELECT value FROM settings WHERE name = %s", ("alert_suppress_time",)
+    )
+    mock_conn.close.assert_called_once()
+
+
+def test_get_alert_suppress_time_from_db_default(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = None
+
+    assert get_alert_suppress_time_from_db() == 30  # Default value
+    mock_conn.close.assert_called_once()
+
+
+# SettingsCache
+def test_settings_cache_reuses_value_within_ttl(mocker):
+    loader = mocker.patch("app.services.settings_service.get_alert_suppress_time_from_db",
+                          side_effect=[45, 10])
+    cache = SettingsCache(ttl=60)
+
+    assert cache.get_alert_suppress_time() == 45
+    assert cache.get_alert_suppress_time() == 45
+    assert loader.call_count == 1
+
+    cache.invalidate()
+    assert cache.get_alert_suppress_time() == 10
+
+
+def test_settings_cache_does_not_store_a_read_that_raced_a_write(mocker):
+    cache = SettingsCache(ttl=60)
+
+    def read_during_write():
+        # set_alert_suppress_time commits and invalidates while this read runs
+        cache.invalidate()
+        return 45
+
+    loader = mocker.patch("app.services.settings_service.get_alert_suppress_time_from_db",
+                          side_effect=read_during_write)
+    assert cache.get_alert_suppress_time() == 45
+
+    loader.side_effect = [10]
+    assert cache.get_alert_suppress_time() == 10
+
+
+# set_alert_suppress_time
+def test_set_alert_suppress_time_bumps_version_and_invalidates(mock_db_connection, mocker):
+    mock_conn, mock_cursor = mock_db_connection
+    invalidate = mocker.patch.object(settings_cache, "invalidate")
+
+    assert set_alert_suppress_time(15) is True
+    assert mock_cursor.execute.call_count == 2
+    assert mock_cursor.execute.call_args_list[0][0][1] == ("alert_suppress_time", "15")
+    assert mock_cursor.execute.call_args_list[1][0][1] == ("settings_version",)
+    mock_conn.commit.assert_called_once()
+    invalidate.assert_called_once()
+
+
+def test_set_alert_suppress_time_failure(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.execute.side_effect = Exception("DB error")
+
+    assert set_alert_suppress_time(15) == 500
+    mock_conn.commit.assert_not_called()
+
+
+# load_regions
+def test_load_regions_keeps_current_on_error(mock_db_connection):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.execute.side_effect = Exception("Table 'region' doesn't exist")
+
+    load_regions()
+
+    assert [region["name"] for region in get_regions()] == ["Taipei", "Hsinchu", "Taichung", "Tainan"]
+    mock_conn.close.assert_called_once()
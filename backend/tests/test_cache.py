@@ -0,0 +1,143 @@
+import asyncio
+
+from app import cache
+from app.cache import BOARD, CLOSED_LIST, PENDING, UNACKNOWLEDGED, ResponseCache, cached_call
+from app.change_feed import ACKNOWLEDGED, AUTO_CLOSED, ChangeFeed
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    response_cache = ResponseCache(ttl=5, clock=clock)
+    response_cache.set((PENDING, "Taipei"), [1])
+
+    clock.now = 4.9
+    assert response_cache.get((PENDING, "Taipei")) == [1]
+    clock.now = 5
+    assert response_cache.get((PENDING, "Taipei")) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    response_cache = ResponseCache(max_size=2)
+    response_cache.set((PENDING, "Taipei"), 1)
+    response_cache.set((PENDING, "Hsinchu"), 2)
+    response_cache.get((PENDING, "Taipei"))
+    response_cache.set((PENDING, "Tainan"), 3)
+
+    assert response_cache.get((PENDING, "Hsinchu")) is None
+    assert response_cache.get((PENDING, "Taipei")) == 1
+
+
+def test_change_drops_only_affected_lists_of_its_region():
+    response_cache = ResponseCache()
+    feed = ChangeFeed()
+    feed.add_listener(response_cache.on_change)
+    for endpoint in (UNACKNOWLEDGED, PENDING, CLOSED_LIST, BOARD):
+        for location in ("Taipei", "Hsinchu", "all"):
+            response_cache.set((endpoint, location), [])
+
+    feed.publish({"type": ACKNOWLEDGED, "event_id": "1-tp", "region": "Taipei"})
+
+    for location in ("Taipei", "all"):
+        assert response_cache.get((UNACKNOWLEDGED, location)) is None
+        assert response_cache.get((PENDING, location)) is None
+        assert response_cache.get((BOARD, location)) is None
+        assert response_cache.get((CLOSED_LIST, location)) == []
+    assert response_cache.get((PENDING, "Hsinchu")) == []
+
+    feed.publish({"type": AUTO_CLOSED, "region": None, "count": 3})
+    assert len(response_cache) == 0
+
+
+def test_cached_call_reads_through_once(monkeypatch):
+    response_cache = ResponseCache()
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+    calls = []
+
+    def fetch(location):
+        calls.append(location)
+        return [{"event_id": "1-tp"}]
+
+    async def main():
+        first = await cached_call(PENDING, fetch, "Taipei")
+        second = await cached_call(PENDING, fetch, "Taipei")
+        return first, second
+
+    assert asyncio.run(main()) == ([{"event_id": "1-tp"}], [{"event_id": "1-tp"}])
+    assert calls == ["Taipei"]
+
+
+def test_cached_call_does_not_store_errors_or_raced_reads(monkeypatch):
+    response_cache = ResponseCache()
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+
+    def fetch_error(location):
+        return 500
+
+    def fetch_during_write(location):
+        # A write lands while the list is being read
+        response_cache.invalidate([PENDING], location)
+        return []
+
+    asyncio.run(cached_call(PENDING, fetch_error, "Taipei"))
+    asyncio.run(cached_call(PENDING, fetch_during_write, "Hsinchu"))
+
+    assert len(response_cache) == 0
+
+
+def test_cached_call_treats_any_case_of_all_as_all(monkeypatch):
+    response_cache = ResponseCache()
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+    calls = []
+
+    def fetch(location):
+        calls.append(location)
+        return []
+
+    asyncio.run(cached_call(PENDING, fetch, "ALL"))
+    asyncio.run(cached_call(PENDING, fetch, "All"))
+    assert calls == ["all"]
+
+    response_cache.invalidate([PENDING], "Taipei")
+    assert len(response_cache) == 0
+
+
+def test_only_stored_keys_are_tracked_for_warming(monkeypatch):
+    response_cache = ResponseCache()
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+
+    # Invalid locations come back as 400 and are never stored
+    for location in ("nowhere-1", "nowhere-2"):
+        asyncio.run(cached_call(PENDING, lambda location: 400, location))
+
+    assert response_cache.keys_to_warm(cache.CACHE_WARM_WINDOW, 3) == []
+
+
+def test_warm_refreshes_recently_requested_entries_before_expiry(monkeypatch):
+    clock = FakeClock()
+    response_cache = ResponseCache(ttl=5, clock=clock)
+    monkeypatch.setattr(cache, "WARM_FETCHERS", {
+        PENDING: lambda location: [location],
+        BOARD: lambda location: 500,
+    })
+    response_cache.set((PENDING, "Taipei"), ["old"])
+    response_cache.set((BOARD, "all"), [])
+    clock.now = 2
+    response_cache.get((PENDING, "Taipei"))
+    response_cache.set((PENDING, "Hsinchu"), ["cached"])
+
+    # Hsinchu is still fresh past the next run; the board read fails and is not stored
+    assert cache.warm_response_cache(response_cache, margin=3) == 1
+    assert response_cache.get((PENDING, "Taipei")) == ["Taipei"]
+    assert response_cache.get((PENDING, "Hsinchu")) == ["cached"]
+
+    # Keys nobody asked for within CACHE_WARM_WINDOW are forgotten
+    clock.now = cache.CACHE_WARM_WINDOW + 3
+    assert response_cache.keys_to_warm(cache.CACHE_WARM_WINDOW, 3) == []
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from app.change_feed import (CREATED, RESYNC, ChangeFeed, EventWatcher,
+                             format_sse, stream_changes)
+
+
+def test_publish_from_another_thread():
+    feed = ChangeFeed()
+
+    async def main():
+        feed.bind(asyncio.get_running_loop())
+        async with feed.subscribe() as queue:
+            thread = threading.Thread(target=feed.publish, args=({"type": "closed", "region": "Taipei"},))
+            thread.start()
+            thread.join()
+            return await asyncio.wait_for(queue.get(), 1)
+
+    assert asyncio.run(main()) == {"type": "closed", "region": "Taipei"}
+
+
+def test_slow_client_gets_resync():
+    feed = ChangeFeed(queue_size=2)
+
+    async def main():
+        feed.bind(asyncio.get_running_loop())
+        async with feed.subscribe() as queue:
+            for i in range(3):
+                feed.publish({"type": "closed", "event_id": str(i)})
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    assert asyncio.run(main()) == [{"type": RESYNC}]
+
+
+def test_publish_without_loop_is_noop():
+    ChangeFeed().publish({"type": "closed"})
+
+
+def test_stream_filters_by_location(mocker):
+    feed = ChangeFeed()
+    mocker.patch("app.change_feed.change_feed", feed)
+
+    async def main():
+        feed.bind(asyncio.get_running_loop())
+        stream = stream_changes("Taipei")
+        chunks = [await stream.__anext__()]
+        feed.publish({"type": "closed", "region": "Tainan"})
+        feed.publish({"type": "closed", "region": "Taipei"})
+        feed.publish({"type": "auto_closed", "region": None})
+        chunks.append(await stream.__anext__())
+        chunks.append(await stream.__anext__())
+        feed.close()
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        return chunks
+
+    chunks = asyncio.run(main())
+    assert chunks[0] == ": connected\n\n"
+    assert chunks[1] == format_sse({"type": "closed", "region": "Taipei"})
+    assert chunks[2].startswith("event: auto_closed\n")
+
+
+def test_event_watcher_publishes_new_rows(mocker):
+    publish = mocker.patch("app.change_feed.change_feed.publish")
+    cursor = MagicMock()
+    watcher = EventWatcher()
+
+    cursor.fetchone.return_value = {"max_id": 200}
+    assert watcher.poll(cursor) == 0
+
+    row = {"event_id": "114097-tp", "location_eq_id": 201, "region": "Taipei", "level": "L2",
+           "trigger_alert": 1, "alert_time": datetime(2025, 5, 1, 12, 0, 0)}
+    cursor.fetchall.return_value = [row]
+    assert watcher.poll(cursor) == 1
+    # Recent ids are re-read on the next poll without publishing them again
+    assert watcher.poll(cursor) == 0
+
+    assert cursor.execute.call_args[0][1] == (200, 500)
+    publish.assert_called_once_with({
+        "type": CREATED, "event_id": "114097-tp", "region": "Taipei", "level": "L2",
+        "trigger_alert": True, "alert_time": "2025-05-01 12:00:00"})
+
+
+def test_event_watcher_publishes_lower_id_committed_after_higher_one(mocker):
+    publish = mocker.patch("app.change_feed.change_feed.publish")
+    cursor = MagicMock()
+    watcher = EventWatcher()
+    start = datetime(2025, 5, 1, 12, 0, 0)
+
+    def row(location_eq_id):
+        return {"event_id": f"{location_eq_id}-tp", "location_eq_id": location_eq_id, "region": "Taipei",
+                "level": "L1", "trigger_alert": 1, "alert_time": start}
+
+    cursor.fetchone.return_value = {"max_id": 200}
+    watcher.poll(cursor, start)
+    # A drill chunk holding ids 201-600 is still open when id 601 commits
+    cursor.fetchall.return_value = [row(601)]
+    assert watcher.poll(cursor, start + timedelta(seconds=5)) == 1
+    cursor.fetchall.return_value = [row(201), row(601)]
+    assert watcher.poll(cursor, start + timedelta(seconds=10)) == 1
+
+    assert cursor.execute.call_args[0][1] == (200, 500)
+    assert [c.args[0]["event_id"] for c in publish.call_args_list] == ["601-tp", "201-tp"]
@@ -0,0 +1,93 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from app.db import ConnectionPool, PooledConnection, PoolTimeout
+
+
+def make_conn():
+    conn = MagicMock()
+    conn.open = True
+    conn.server_status = 0
+    return conn
+
+
+@pytest.fixture
+def connect():
+    return MagicMock(side_effect=lambda: make_conn())
+
+
+def test_pool_reuses_released_connection(connect):
+    pool = ConnectionPool(connect=connect, max_size=2, timeout=1)
+
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+
+    assert second is first
+    assert connect.call_count == 1
+
+
+def test_pool_times_out_when_exhausted(connect):
+    pool = ConnectionPool(connect=connect, max_size=1, timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert connect.call_count == 1
+
+
+def test_pool_waiter_gets_released_connection(connect):
+    pool = ConnectionPool(connect=connect, max_size=1, timeout=2)
+    conn = pool.acquire()
+
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+    assert pool.acquire() is conn
+
+
+def test_pool_evicts_idle_connections(connect):
+    pool = ConnectionPool(connect=connect, max_size=2, timeout=1, idle_timeout=0.01)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    time.sleep(0.02)
+    fresh = pool.acquire()
+
+    assert fresh is not conn
+    conn.close.assert_called_once()
+
+
+def test_pool_discards_connection_failing_health_check(connect):
+    pool = ConnectionPool(connect=connect, max_size=1, timeout=1, ping_interval=0)
+    conn = pool.acquire()
+    conn.ping.side_effect = Exception("gone away")
+    pool.release(conn)
+
+    fresh = pool.acquire()
+
+    assert fresh is not conn
+    assert connect.call_count == 2
+
+
+def test_pool_rolls_back_open_transaction_on_release(connect):
+    pool = ConnectionPool(connect=connect, max_size=1, timeout=1)
+    conn = pool.acquire()
+    conn.server_status = 1  # SERVER_STATUS_IN_TRANS
+
+    pool.release(conn)
+
+    conn.rollback.assert_called_once()
+
+
+def test_pooled_connection_close_returns_to_pool(connect):
+    pool = ConnectionPool(connect=connect, max_size=1, timeout=0.05)
+    conn = PooledConnection(pool, pool.acquire())
+
+    conn.close()
+    conn.close()  # closing twice must not release twice
+
+    assert pool.acquire() is not None
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
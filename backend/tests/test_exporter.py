@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from app import exporter
+from app.exporter import ClosedEventTracker, update_last_earthquake
+from prometheus_client import REGISTRY
+
+
+@pytest.fixture
+def mock_cursor(mocker):
+    mocker.patch.object(exporter, "last_earthquake", exporter.Earthquake())
+    return MagicMock()
+
+
+def latest_earthquake_row(earthquake_id):
+    return {"id": earthquake_id, "earthquake_time": datetime(2025, 5, 1, 12, 0, 0), "magnitude": 4.5,
+            "depth": 10.0, "longitude": "121.8", "latitude": "24.5"}
+
+
+def test_update_last_earthquake_only_on_change(mock_cursor, mocker):
+    update_metric = mocker.patch("app.exporter.update_metric")
+    mock_cursor.fetchone.return_value = latest_earthquake_row(114097)
+    mock_cursor.fetchall.return_value = [{"location": "Taipei", "intensity": 3.0}]
+
+    update_last_earthquake(mock_cursor)
+    update_last_earthquake(mock_cursor)
+
+    update_metric.assert_called_once()
+    assert exporter.last_earthquake.earthquake_id == 114097
+    assert exporter.last_earthquake.intensity == {"Taipei": 3.0}
+    # The unchanged refresh only ran the latest-earthquake query
+    assert mock_cursor.execute.call_count == 3
+
+
+def closed_row(event_id, closed_at, process_time=12):
+    create_at = closed_at - timedelta(minutes=30)
+    return {"id": event_id, "region": "Tainan", "create_at": create_at,
+            "ack_time": create_at + timedelta(minutes=2), "report_at": create_at + timedelta(minutes=5),
+            "closed_at": closed_at, "process_time": process_time}
+
+
+def sample_count(metric):
+    return REGISTRY.get_sample_value(f"{metric}_count", {"region": "Tainan"}) or 0
+
+
+def test_closed_event_tracker_counts_each_event_once():
+    tracker = ClosedEventTracker()
+    closed_at = tracker.watermark + timedelta(seconds=5)
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [closed_row("1-tn", closed_at), closed_row("2-tn", closed_at)],
+        # Next refresh sees the same rows again plus a newer one
+        [closed_row("1-tn", closed_at), closed_row("2-tn", closed_at),
+         closed_row("3-tn", closed_at + timedelta(seconds=1), process_time=-1)],
+    ]
+    ack_before = sample_count("event_ack_latency_seconds")
+    process_before = sample_count("event_process_time_minutes")
+
+    tracker.update(cursor)
+    tracker.update(cursor)
+
+    assert sample_count("event_ack_latency_seconds") - ack_before == 3
+    # Auto-closed events (process_time = -1) are not dispatcher process times
+    assert sample_count("event_process_time_minutes") - process_before == 2
+    assert tracker.watermark == closed_at + timedelta(seconds=1)
+    # Still inside the lookback since start, so the read starts where counting started
+    floor_param = cursor.execute.call_args[0][1][0]
+    assert floor_param == tracker.started_at.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def test_closed_event_tracker_counts_closes_committed_late():
+    tracker = ClosedEventTracker()
+    tracker.started_at -= timedelta(hours=1)
+    late_close = tracker.watermark + timedelta(seconds=5)
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [closed_row("2-tn", late_close + timedelta(minutes=1))],
+        # 1-tn was closed earlier but its transaction committed after the first read
+        [closed_row("1-tn", late_close), closed_row("2-tn", late_close + timedelta(minutes=1))],
+    ]
+    ack_before = sample_count("event_ack_latency_seconds")
+
+    tracker.update(cursor)
+    tracker.update(cursor)
+
+    assert sample_count("event_ack_latency_seconds") - ack_before == 2
+    floor_param = cursor.execute.call_args[0][1][0]
+    assert floor_param == (tracker.watermark - tracker.lookback).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def test_closed_event_tracker_pages_through_a_burst(mocker):
+    mocker.patch.object(ClosedEventTracker, "PAGE_SIZE", 2)
+    tracker = ClosedEventTracker()
+    closed_at = tracker.watermark + timedelta(seconds=5)
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [closed_row("1-tn", closed_at), closed_row("2-tn", closed_at)],
+        [closed_row("3-tn", closed_at)],
+    ]
+    ack_before = sample_count("event_ack_latency_seconds")
+
+    tracker.update(cursor)
+
+    assert sample_count("event_ack_latency_seconds") - ack_before == 3
+    # The second page continues after the last (closed_at, id) read
+    assert cursor.execute.call_args[0][1][1:3] == (closed_at.strftime("%Y-%m-%d %H:%M:%S"), "2-tn")
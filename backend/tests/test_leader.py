@@ -0,0 +1,88 @@
+from unittest.mock import MagicMock
+
+import pytest
+from app.leader import LEADER_DB_TIMEOUT, LeaderElection, _lock_connection
+
+
+@pytest.fixture
+def mock_cursor():
+    return MagicMock()
+
+
+@pytest.fixture
+def connect(mock_cursor):
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    return MagicMock(return_value=mock_conn)
+
+
+def test_follower_takes_free_lock_without_waiting(connect, mock_cursor):
+    election = LeaderElection(connect=connect, enabled=True)
+    mock_cursor.fetchone.return_value = {"held": 1}
+
+    assert election.check() is True
+    assert "GET_LOCK(%s, 0)" in mock_cursor.execute.call_args[0][0]
+
+
+def test_leader_confirms_lock_on_same_connection(connect, mock_cursor):
+    election = LeaderElection(connect=connect, enabled=True)
+    mock_cursor.fetchone.return_value = {"held": 1}
+    election.check()
+
+    mock_cursor.fetchone.return_value = {"held": 0}
+    assert election.check() is False
+    assert "IS_USED_LOCK" in mock_cursor.execute.call_args[0][0]
+    connect.assert_called_once()
+
+
+def test_lost_connection_steps_down_and_reconnects(connect, mock_cursor):
+    election = LeaderElection(connect=connect, enabled=True)
+    mock_cursor.fetchone.return_value = {"held": 1}
+    election.check()
+
+    mock_cursor.execute.side_effect = ConnectionError("MySQL server has gone away")
+    assert election.check() is False
+
+    mock_cursor.execute.side_effect = None
+    assert election.check() is True
+    assert connect.call_count == 2
+
+
+def test_release_frees_the_lock(connect, mock_cursor):
+    election = LeaderElection(connect=connect, enabled=True)
+    mock_cursor.fetchone.return_value = {"held": 1}
+    election.check()
+
+    election.release()
+
+    assert "RELEASE_LOCK" in mock_cursor.execute.call_args[0][0]
+    assert election.is_leader is False
+
+
+def test_disabled_election_is_always_leader(connect):
+    election = LeaderElection(connect=connect, enabled=False)
+
+    assert election.check() is True
+    connect.assert_not_called()
+
+
+def test_lock_connection_has_timeouts(mocker):
+    pymysql_connect = mocker.patch("app.db.pymysql.connect")
+
+    _lock_connection()
+
+    options = pymysql_connect.call_args.kwargs
+    assert options["read_timeout"] == options["write_timeout"] == LEADER_DB_TIMEOUT
+
+
+def test_leader_checks_the_lock_on_every_tick(connect, mock_cursor):
+    election = LeaderElection(connect=connect, enabled=True)
+    mock_cursor.fetchone.return_value = {"held": 1}
+
+    for _ in range(3):
+        assert election.check() is True
+
+    statements = [call[0][0] for call in mock_cursor.execute.call_args_list]
+    assert "GET_LOCK" in statements[0]
+    assert all("IS_USED_LOCK" in statement for statement in statements[1:])
+    assert len(statements) == 3
@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+
+import pytest
+from app.migrations import apply_migrations, split_statements
+
+
+def test_split_statements_skips_comments():
+    sql = """
+    -- 001: example
+    UPDATE event SET region = 'Taipei' WHERE id LIKE '%-tp';
+
+    ALTER TABLE event
+        ADD INDEX idx_a (region),  -- trailing comment
+        ADD INDEX idx_b (is_done);
+    """
+    statements = split_statements(sql)
+    assert len(statements) == 2
+    assert statements[0].strip() == "UPDATE event SET region = 'Taipei' WHERE id LIKE '%-tp'"
+    assert statements[1].strip().startswith("ALTER TABLE event")
+    assert not statements[1].endswith(";")
+
+
+@pytest.fixture
+def migrations_dir(tmp_path):
+    (tmp_path / "001_first.sql").write_text("ALTER TABLE event ADD INDEX idx_a (region);")
+    (tmp_path / "002_second.sql").write_text("ALTER TABLE event ADD INDEX idx_b (is_done);")
+    return tmp_path
+
+
+@pytest.fixture
+def mock_db_connection(mocker):
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = {"locked": 1}
+    mocker.patch("app.migrations.get_mysql_connection", return_value=mock_conn)
+    return mock_conn, mock_cursor
+
+
+def test_apply_migrations_skips_applied_versions(mock_db_connection, migrations_dir):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = [{"version": "001_first"}]
+
+    applied = apply_migrations(migrations_dir)
+
+    assert applied == ["002_second"]
+    executed = [call[0][0] for call in mock_cursor.execute.call_args_list]
+    assert "ALTER TABLE event ADD INDEX idx_b (is_done)" in executed
+    assert "ALTER TABLE event ADD INDEX idx_a (region)" not in executed
+    mock_conn.commit.assert_called_once()
+    assert "RELEASE_LOCK" in executed[-1]
+
+
+def test_apply_migrations_gives_up_without_lock(mock_db_connection, migrations_dir):
+    mock_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = {"locked": 0}
+
+    assert apply_migrations(migrations_dir) == []
+    mock_conn.commit.assert_not_called()
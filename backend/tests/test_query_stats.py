@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from prometheus_client import REGISTRY
+from starlette.concurrency import run_in_threadpool
+
+from app.db import PooledConnection
+from app.query_stats import QueryStatsMiddleware, current_query_stats
+
+
+def make_cursor(rows=2):
+    cursor = MagicMock()
+    cursor.description = (("id",),)
+    cursor.rowcount = rows
+    return cursor
+
+
+def run_request(app, path="/report/pending", debug_headers=False):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+    asyncio.run(QueryStatsMiddleware(app, debug_headers=debug_headers)(scope, receive, send))
+    return dict(messages[0]["headers"])
+
+
+def endpoint_app(route, statements):
+    """ASGI app running ``statements`` SQL statements in the threadpool, like a sync service."""
+    raw_conn = MagicMock()
+    raw_conn.cursor.return_value = make_cursor()
+    conn = PooledConnection(MagicMock(), raw_conn)
+
+    def service():
+        with conn.cursor() as cursor:
+            for _ in range(statements):
+                cursor.execute("SELECT 1")
+
+    async def app(scope, receive, send):
+        scope["route"] = SimpleNamespace(path=route)
+        await run_in_threadpool(service)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    return app
+
+
+def sample(name, route):
+    return REGISTRY.get_sample_value(name, {"method": "GET", "route": route})
+
+
+def test_cursor_outside_request_records_nothing():
+    raw_conn = MagicMock()
+    raw_conn.cursor.return_value = make_cursor()
+    with PooledConnection(MagicMock(), raw_conn).cursor() as cursor:
+        cursor.execute("SELECT 1")
+    assert current_query_stats() is None
+    raw_conn.cursor.return_value.execute.assert_called_once_with("SELECT 1", None)
+
+
+def test_statements_in_threadpool_are_counted_per_route():
+    route = "/test/query_stats"
+    before = sample("http_request_db_statements_sum", route) or 0
+
+    run_request(endpoint_app(route, statements=3), route)
+
+    assert sample("http_request_db_statements_sum", route) - before == 3
+    assert sample("http_request_db_rows_sum", route) >= 6
+    assert sample("http_request_duration_seconds_count", route) >= 1
+
+
+def test_debug_headers():
+    headers = run_request(endpoint_app("/test/debug_headers", statements=2), debug_headers=True)
+    assert headers[b"x-db-statements"] == b"2"
+    assert b'desc="2 statements, 4 rows"' in headers[b"server-timing"]
+
+
+def test_no_debug_headers_by_default():
+    headers = run_request(endpoint_app("/test/no_debug_headers", statements=1))
+    assert b"x-db-statements" not in headers
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+from app import scheduler
+from app.scheduler import PeriodicJob, instrumented, run_job_now, shutdown_scheduler, start_scheduler
+from prometheus_client import REGISTRY
+
+
+def job_runs(job_id, result):
+    return REGISTRY.get_sample_value("scheduled_job_runs_total", {"job": job_id, "result": result}) or 0
+
+
+def test_failing_job_is_counted_and_does_not_raise():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database went away")
+
+    run = instrumented("test_flaky", flaky)
+    run()
+    run()
+
+    assert len(calls) == 2
+    assert job_runs("test_flaky", "error") == 1
+    assert job_runs("test_flaky", "ok") == 1
+    assert REGISTRY.get_sample_value(
+        "scheduled_job_duration_seconds_count", {"job": "test_flaky"}) == 2
+
+
+def test_leader_only_job_is_skipped_in_followers(mocker):
+    calls = []
+    mocker.patch.object(scheduler.leader, "is_leader", False)
+
+    instrumented("test_leader_only", lambda: calls.append(1), leader_only=True)()
+    assert calls == []
+
+    scheduler.leader.is_leader = True
+    instrumented("test_leader_only", lambda: calls.append(1), leader_only=True)()
+    assert calls == [1]
+
+
+def test_jobs_run_in_a_worker_thread_and_can_be_run_now():
+    ran = []
+
+    def record():
+        ran.append(threading.current_thread())
+
+    async def main():
+        start_scheduler([
+            PeriodicJob("test_startup", record, 3600, run_at_start=True),
+            PeriodicJob("test_on_demand", record, 3600),
+        ])
+        try:
+            await asyncio.sleep(0.2)
+            # Called from a thread, like notify_new_earthquake in a sync service
+            await asyncio.to_thread(run_job_now, "test_on_demand")
+            await asyncio.sleep(0.2)
+        finally:
+            shutdown_scheduler()
+
+    asyncio.run(main())
+
+    assert len(ran) == 2
+    assert all(thread is not threading.main_thread() for thread in ran)
+    assert scheduler.scheduler is None
+
+
+def test_run_job_now_without_scheduler_is_a_no_op():
+    run_job_now("exporter_refresh")
@@ -0,0 +1,4 @@
+"""
+Load and benchmark harness for the dispatcher API and the ingestion path.
+See benchmarks/README.md.
+"""
@@ -0,0 +1,138 @@
+"""
+Load driver for a running backend.
+
+1. Quake storm: replays synthetic quakes through POST /earthquake/simulate.
+2. Dispatchers: concurrent workers, one location each, poll the four
+   /report lists and acknowledge / submit / repair what they find.
+
+Reports p50 / p99 latency and requests/sec per endpoint, and MySQL
+statements per request of each phase when DB_* points at the backend's
+database:
+
+    DB_HOST=127.0.0.1 DB_PASSWORD=... DB_NAME=... \
+        python -m benchmarks.api_load --base-url http://localhost:8000
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from benchmarks.common import add_baseline_arguments, HttpClient, LatencyRecorder, QueryCounter, finish
+from benchmarks.fixtures import generate_quakes, to_simulate_request
+
+LISTS = ("unacknowledged", "pending", "in_process", "closed")
+# Simulations may not be older than an hour; keep the storm well inside it
+STORM_SPAN = timedelta(minutes=50)
+
+
+def is_ok(status: int) -> bool:
+    # 404 / 409 are expected when dispatchers of one location race each other
+    return 200 <= status < 400 or status in (404, 409)
+
+
+def run_storm(client: HttpClient, recorder: LatencyRecorder, regions, count: int,
+              concurrency: int, seed: int):
+    interval = min(timedelta(seconds=10), STORM_SPAN / max(count, 1))
+    start = datetime.now(ZoneInfo("Asia/Taipei")).replace(tzinfo=None) - count * interval
+    quakes = generate_quakes(count, start, interval, seed=seed, region_names=regions)
+
+    def post(quake):
+        status, _, seconds = client.request("POST", "/earthquake/simulate", to_simulate_request(quake))
+        recorder.record("POST /earthquake/simulate", seconds, is_ok(status))
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(post, quakes))
+
+
+def dispatcher(client: HttpClient, recorder: LatencyRecorder, location: str,
+               deadline: float, poll_interval: float, seed: int):
+    rng = random.Random(seed)
+
+    def call(method, path, body=None):
+        status, data, seconds = client.request(method, path, body)
+        recorder.record(f"{method} {path.split('?')[0]}", seconds, is_ok(status))
+        return data if 200 <= status < 300 else None
+
+    while time.monotonic() < deadline:
+        lists = {name: call("GET", f"/report/{name}?location={location}") or [] for name in LISTS}
+        if lists["unacknowledged"]:
+            call("POST", "/report/acknowledge", {"event_id": lists["unacknowledged"][0]["event_id"]})
+        if lists["pending"]:
+            call("POST", "/report/submit", {"event_id": lists["pending"][0]["event_id"],
+                                            "damage": rng.random() < 0.5,
+                                            "operation_active": rng.random() < 0.5})
+        if lists["in_process"]:
+            call("POST", "/report/repair", {"event_id": lists["in_process"][0]["event_id"]})
+        if poll_interval:
+            time.sleep(poll_interval)
+
+
+def run_dispatchers(client: HttpClient, recorder: LatencyRecorder, regions, workers: int,
+                    duration: float, poll_interval: float, seed: int):
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=dispatcher, args=(
+            client, recorder, regions[i % len(regions)], deadline, poll_interval, seed + i))
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_phase(name: str, counter: QueryCounter, phase) -> dict:
+    """Run ``phase(recorder)`` and summarise it; the phase totals are stored under ``name``."""
+    recorder = LatencyRecorder()
+    counter.start()
+    start = time.perf_counter()
+    phase(recorder)
+    duration = time.perf_counter() - start
+    queries = counter.stop()
+
+    results = recorder.summary(duration)
+    results[name] = {
+        "requests": recorder.total,
+        "rps": round(recorder.total / duration, 2),
+        "queries_per_request": round(queries / recorder.total, 2) if queries is not None and recorder.total else None,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--quakes", type=int, default=200, help="quakes in the storm")
+    parser.add_argument("--storm-concurrency", type=int, default=1,
+                        help="parallel simulate requests (simulated ids are MAX(id) + 1, so >1 may collide)")
+    parser.add_argument("--dispatchers", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of dispatcher traffic")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="pause between a dispatcher's polls, 0 to poll flat out")
+    parser.add_argument("--seed", type=int, default=0)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    client = HttpClient(args.base_url)
+    status, data, _ = client.request("GET", "/settings/regions")
+    if status != 200:
+        sys.exit(f"Backend not reachable at {args.base_url} (HTTP {status})")
+    regions = [region["name"] for region in data]
+
+    counter = QueryCounter()
+    try:
+        results = run_phase("storm", counter, lambda recorder: run_storm(
+            client, recorder, regions, args.quakes, args.storm_concurrency, args.seed))
+        results.update(run_phase("dispatch", counter, lambda recorder: run_dispatchers(
+            client, recorder, regions, args.dispatchers, args.duration, args.poll_interval, args.seed)))
+    finally:
+        counter.close()
+    sys.exit(finish("api", results, args.update_baseline, args.baseline))
+
+
+if __name__ == "__main__":
+    main()
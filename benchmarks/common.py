@@ -0,0 +1,215 @@
+"""
+Shared pieces of the benchmark scripts: a keep-alive HTTP client, latency
+recording, MySQL statement counting and the baseline comparison.
+"""
+import http.client
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+import pymysql
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+# Allowed drift before a metric counts as a regression
+LATENCY_TOLERANCE = 0.5      # p50 / p99 may grow by 50%
+THROUGHPUT_TOLERANCE = 0.3   # requests/sec may drop by 30%
+QUERY_TOLERANCE = 0.5        # statements per request, absolute
+
+
+def percentile(samples, p: float) -> float:
+    """Nearest-rank percentile, ``p`` in 0..100."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class HttpClient:
+    """One keep-alive connection per thread to the backend."""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method: str, path: str, body: Optional[dict] = None):
+        """Returns (status, parsed JSON or None, seconds); status 0 on a transport error."""
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        start = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request(method, self.prefix + path, body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self._local.conn = None
+            return 0, None, time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+        try:
+            parsed = json.loads(data) if data else None
+        except ValueError:
+            parsed = None
+        return response.status, parsed, elapsed
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(list)
+        self._errors = defaultdict(int)
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self._samples[name].append(seconds)
+            if not ok:
+                self._errors[name] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(len(samples) for samples in self._samples.values())
+
+    def summary(self, duration: float) -> dict:
+        return {
+            name: {
+                "count": len(samples),
+                "errors": self._errors[name],
+                "rps": round(len(samples) / duration, 2) if duration else 0.0,
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            }
+            for name, samples in sorted(self._samples.items())
+        }
+
+
+class QueryCounter:
+    """
+    Counts statements executed by the whole MySQL server (status variable
+    ``Questions``) between start() and stop(). Background jobs of the
+    backend and data_ingestion are included, so run benchmarks on an
+    otherwise idle database. Disabled (stop() returns None) when MySQL
+    cannot be reached with the DB_* environment variables.
+    """
+
+    def __init__(self):
+        try:
+            self._conn = pymysql.connect(
+                host=os.getenv("DB_HOST", "127.0.0.1"),
+                port=int(os.getenv("DB_PORT", 3306)),
+                user=os.getenv("DB_USER", "root"),
+                password=os.getenv("DB_PASSWORD", ""),
+                database=os.getenv("DB_NAME", ""),
+            )
+        except pymysql.MySQLError as e:
+            print(f"Query counting disabled: {e}")
+            self._conn = None
+        self._start = None
+
+    def _questions(self) -> int:
+        with self._conn.cursor() as cursor:
+            cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+            return int(cursor.fetchone()[1])
+
+    def start(self):
+        if self._conn:
+            self._start = self._questions()
+
+    def stop(self) -> Optional[int]:
+        if not self._conn or self._start is None:
+            return None
+        # The SHOW STATUS of start() is counted as well
+        return self._questions() - self._start - 1
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(section: str, results: dict, path: Path = BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline[section] = results
+    path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def compare_to_baseline(results: dict, baseline: dict) -> list:
+    """
+    Regressions of ``results`` against ``baseline`` (same nested shape:
+    name -> metric -> value). Metrics missing from the baseline are skipped.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base_metrics = baseline.get(name) or {}
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if base is None or value is None:
+                continue
+            if metric.endswith("_ms") and value > base * (1 + LATENCY_TOLERANCE):
+                regressions.append(f"{name} {metric}: {value} ms (baseline {base} ms)")
+            elif metric.endswith("per_sec") or metric == "rps":
+                if value < base * (1 - THROUGHPUT_TOLERANCE):
+                    regressions.append(f"{name} {metric}: {value} (baseline {base})")
+            elif metric.startswith("queries_per") and value > base + QUERY_TOLERANCE:
+                regressions.append(f"{name} {metric}: {value} (baseline {base})")
+            elif metric == "errors" and value > base:
+                regressions.append(f"{name} errors: {value} (baseline {base})")
+    return regressions
+
+
+# Exit codes of finish()
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_NO_BASELINE = 2
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH,
+                        help="baseline file, one per reference machine (default: benchmarks/baseline.json)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="record this run as the baseline instead of comparing")
+
+
+def finish(section: str, results: dict, update_baseline: bool, baseline_path: Path = BASELINE_PATH) -> int:
+    """
+    Print results, then update or check the baseline. Returns EXIT_OK,
+    EXIT_REGRESSION, or EXIT_NO_BASELINE when nothing has been recorded for
+    ``section`` yet, so an unconfigured gate is told apart from a regression.
+    """
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if update_baseline:
+        save_baseline(section, results, baseline_path)
+        print(f"Baseline '{section}' written to {baseline_path}")
+        return EXIT_OK
+
+    baseline = load_baseline(baseline_path).get(section)
+    if not baseline:
+        # Passing without anything to compare against would hide every regression
+        print(f"FAILED: no baseline for '{section}' in {baseline_path}; "
+              f"run with --update-baseline on the reference machine to record one")
+        return EXIT_NO_BASELINE
+    regressions = compare_to_baseline(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return EXIT_REGRESSION if regressions else EXIT_OK
@@ -0,0 +1,120 @@
+"""
+Stand-in for the CWA E-A0015-001 report API.
+
+Publishes synthetic reports over time and answers the queries CwaClient
+makes (Authorization / limit / timeFrom, ETag + If-None-Match), so the
+data_ingestion poll loop can be driven without the real API:
+
+    python -m benchmarks.cwa_stub --port 8081 --quakes 500 --initial 50 --rate 2
+    CWA_API_URL=http://localhost:8081/api/v1/rest/datastore/E-A0015-001 \
+        API_KEY=benchmark python data_ingestion/main.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.fixtures import generate_quakes, to_cwa_report
+
+# Report numbers of the stand-in, clear of real CWA numbers
+STUB_FIRST_ID = 50_000_000
+
+
+class ReportFeed:
+    """Reports published so far, newest first like the real API."""
+
+    def __init__(self, reports, initial: int):
+        self._pending = list(reports)
+        self._published = []
+        self._lock = threading.Lock()
+        self.publish(initial)
+
+    def publish(self, count: int = 1) -> int:
+        with self._lock:
+            batch, self._pending = self._pending[:count], self._pending[count:]
+            self._published[:0] = reversed(batch)
+            return len(batch)
+
+    def query(self, limit: int, time_from: str = None):
+        with self._lock:
+            reports = self._published
+            if time_from:
+                since = time_from.replace("T", " ")
+                reports = [r for r in reports if r["EarthquakeInfo"]["OriginTime"] >= since]
+            return reports[:limit]
+
+    @property
+    def remaining(self) -> int:
+        return len(self._pending)
+
+
+def make_handler(feed: ReportFeed):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            params = parse_qs(urlsplit(self.path).query)
+            if not params.get("Authorization"):
+                self._send(401, b'{"message": "Unauthorized"}')
+                return
+
+            limit = int(params.get("limit", ["100"])[0])
+            reports = feed.query(limit, params.get("timeFrom", [None])[0])
+            body = json.dumps({"success": "true", "records": {"Earthquake": reports}},
+                              ensure_ascii=False).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", etag)
+            else:
+                self._send(200, body, etag)
+
+        def _send(self, status: int, body: bytes, etag: str = None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--quakes", type=int, default=500, help="reports published in total")
+    parser.add_argument("--initial", type=int, default=50, help="reports available at startup")
+    parser.add_argument("--rate", type=float, default=1.0, help="new reports per second after startup")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    interval = timedelta(seconds=30)
+    start = datetime.now() - args.quakes * interval
+    reports = [to_cwa_report(q) for q in generate_quakes(
+        args.quakes, start, interval, first_id=STUB_FIRST_ID, seed=args.seed)]
+    feed = ReportFeed(reports, args.initial)
+
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), make_handler(feed))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"CWA stand-in on :{args.port}, {args.initial} reports published, {feed.remaining} to go")
+    try:
+        while feed.remaining and args.rate > 0:
+            time.sleep(1 / args.rate)
+            feed.publish()
+        print("All reports published")
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Synthetic earthquakes, reproducible from a seed, in the three shapes the
+harness feeds to the system: POST /earthquake/simulate bodies, CWA
+E-A0015-001 report records and data_ingestion Earthquake fields.
+"""
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+from alerting.regions import DEFAULT_REGIONS
+
+# CWA intensity strings, inverse of fetch_earthquake.intensity_to_float
+CWA_INTENSITY = {
+    0.0: '0級', 1.0: '1級', 2.0: '2級', 3.0: '3級', 4.0: '4級',
+    5.0: '5弱', 5.5: '5強', 6.0: '6弱', 6.5: '6強', 7.0: '7級',
+}
+MIN_MAGNITUDE = 3.0
+MAX_MAGNITUDE = 7.5
+# Gutenberg-Richter b-value: each unit of magnitude is ten times rarer
+B_VALUE = 1.0
+
+
+class SyntheticQuake(NamedTuple):
+    earthquake_id: int
+    time: datetime  # naive, Asia/Taipei
+    magnitude: float
+    center: str
+    depth: float
+    latitude: float
+    longitude: float
+    intensities: Dict[str, float]  # region name -> intensity
+
+
+def _intensity(rng: random.Random, magnitude: float) -> float:
+    value = round(magnitude - 2.5 + rng.gauss(0, 1))
+    return float(min(max(value, 0), 7))
+
+
+def generate_quakes(count: int, start: datetime, interval: timedelta,
+                    first_id: int = 0, seed: int = 0,
+                    region_names=None) -> List[SyntheticQuake]:
+    """``count`` quakes ``interval`` apart from ``start``, oldest first."""
+    rng = random.Random(seed)
+    region_names = list(region_names or (region.name for region in DEFAULT_REGIONS))
+    quakes = []
+    for i in range(count):
+        magnitude = min(MIN_MAGNITUDE + rng.expovariate(B_VALUE * math.log(10)), MAX_MAGNITUDE)
+        magnitude = round(magnitude, 1)
+        quakes.append(SyntheticQuake(
+            earthquake_id=first_id + i,
+            time=start + i * interval,
+            magnitude=magnitude,
+            center=f"benchmark quake {i}",
+            depth=round(rng.uniform(5, 60), 1),
+            latitude=round(rng.uniform(22.0, 25.3), 2),
+            longitude=round(rng.uniform(120.1, 122.0), 2),
+            intensities={name: _intensity(rng, magnitude) for name in region_names},
+        ))
+    return quakes
+
+
+def to_simulate_request(quake: SyntheticQuake) -> dict:
+    return {
+        "earthquake": {
+            "earthquake_time": quake.time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "center": quake.center,
+            "latitude": str(quake.latitude),
+            "longitude": str(quake.longitude),
+            "magnitude": quake.magnitude,
+            "depth": quake.depth,
+            "is_demo": True,
+        },
+        "locations": [{"location": name, "intensity": intensity}
+                      for name, intensity in quake.intensities.items()],
+    }
+
+
+def to_cwa_report(quake: SyntheticQuake) -> dict:
+    counties = {region.name: region.county for region in DEFAULT_REGIONS}
+    return {
+        "EarthquakeNo": quake.earthquake_id,
+        "EarthquakeInfo": {
+            "OriginTime": quake.time.strftime("%Y-%m-%d %H:%M:%S"),
+            "FocalDepth": quake.depth,
+            "Epicenter": {
+                "Location": quake.center,
+                "EpicenterLatitude": quake.latitude,
+                "EpicenterLongitude": quake.longitude,
+            },
+            "EarthquakeMagnitude": {"MagnitudeValue": quake.magnitude},
+        },
+        "Intensity": {
+            "ShakingArea": [
+                {"CountyName": counties[name], "AreaIntensity": CWA_INTENSITY[intensity]}
+                for name, intensity in quake.intensities.items()
+                if intensity > 0 and name in counties
+            ],
+        },
+    }
+
+
+def to_ingest_fields(quake: SyntheticQuake) -> dict:
+    """Keyword arguments for data_ingestion's fetch_earthquake.Earthquake."""
+    return {
+        "earthquake_id": quake.earthquake_id,
+        "timestamp": quake.time.strftime("%Y-%m-%d %H:%M:%S"),
+        "magnitude": quake.magnitude,
+        "center": quake.center,
+        "depth": quake.depth,
+        "longitude": quake.longitude,
+        "latitude": quake.latitude,
+        "intensity": dict(quake.intensities),
+    }
@@ -0,0 +1,104 @@
+"""
+Benchmark of data_ingestion's batch_insert_earthquake on synthetic fetches.
+
+Inserts ``--quakes`` earthquakes in fetches of ``--batch-size``, the way the
+poll loop hands them over, into the database configured by DB_*:
+
+    DB_HOST=127.0.0.1 DB_PASSWORD=... DB_NAME=... \
+        python -m benchmarks.ingest_bench --quakes 1000 --batch-size 100
+
+Earthquake ids are taken from INGEST_FIRST_ID up, after the highest id a
+previous run left, so runs can be repeated on the same database.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.common import add_baseline_arguments, QueryCounter, finish, percentile
+
+ROOT = Path(__file__).resolve().parents[1]
+INGEST_FIRST_ID = 60_000_000
+# Simulated earthquakes start at 100,000,000
+INGEST_LAST_ID = 99_999_999
+
+
+def import_ingestion():
+    """data_ingestion is not a package on the path; import it the way its Dockerfile runs it."""
+    sys.path[:0] = [str(ROOT), str(ROOT / "data_ingestion")]
+    # fetch_earthquake refuses to import without a CWA key; the benchmark never calls CWA
+    os.environ.setdefault("API_KEY", "benchmark")
+    import fetch_earthquake
+    from db import get_mysql_connection
+    return fetch_earthquake, get_mysql_connection
+
+
+def next_free_id(get_mysql_connection) -> int:
+    conn = get_mysql_connection()
+    if not conn:
+        sys.exit("MySQL not reachable; set DB_HOST / DB_USER / DB_PASSWORD / DB_NAME")
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT MAX(id) AS max_id FROM earthquake WHERE id BETWEEN %s AND %s",
+                           (INGEST_FIRST_ID, INGEST_LAST_ID))
+            max_id = cursor.fetchone()["max_id"]
+        return max_id + 1 if max_id else INGEST_FIRST_ID
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quakes", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100, help="earthquakes per fetch")
+    parser.add_argument("--seed", type=int, default=0)
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    fetch_earthquake, get_mysql_connection = import_ingestion()
+    from benchmarks.fixtures import generate_quakes, to_ingest_fields
+
+    first_id = next_free_id(get_mysql_connection)
+    interval = timedelta(seconds=30)
+    quakes = generate_quakes(args.quakes, datetime.now() - args.quakes * interval, interval,
+                             first_id=first_id, seed=args.seed)
+    batches = [
+        [fetch_earthquake.Earthquake(**to_ingest_fields(q)) for q in quakes[i:i + args.batch_size]]
+        for i in range(0, len(quakes), args.batch_size)
+    ]
+
+    fetch_earthquake.load_regions()
+    fetch_earthquake.seed_known_earthquake_ids()
+    fetch_earthquake.rebuild_suppression_index()
+
+    counter = QueryCounter()
+    counter.start()
+    timings = []
+    failures = 0
+    start = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        if not fetch_earthquake.batch_insert_earthquake(batch):
+            failures += 1
+        timings.append(time.perf_counter() - batch_start)
+    duration = time.perf_counter() - start
+    queries = counter.stop()
+    counter.close()
+
+    results = {
+        "batch_insert_earthquake": {
+            "batches": len(batches),
+            "errors": failures,
+            "quakes_per_sec": round(args.quakes / duration, 2),
+            "p50_ms": round(percentile(timings, 50) * 1000, 2),
+            "p99_ms": round(percentile(timings, 99) * 1000, 2),
+            "queries_per_batch": round(queries / len(batches), 2) if queries is not None and batches else None,
+        },
+    }
+    sys.exit(finish("ingest", results, args.update_baseline, args.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from benchmarks.common import (EXIT_NO_BASELINE, EXIT_OK, EXIT_REGRESSION, compare_to_baseline,
+                               finish, percentile)
+from benchmarks.cwa_stub import ReportFeed
+from benchmarks.fixtures import generate_quakes, to_cwa_report, to_simulate_request
+
+
+def test_percentile_nearest_rank():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([], 99) == 0.0
+
+
+def test_compare_to_baseline():
+    baseline = {"GET /report/pending": {"p99_ms": 10.0, "rps": 100.0, "errors": 0},
+                "dispatch": {"queries_per_request": 1.0, "rps": None}}
+    results = {"GET /report/pending": {"p99_ms": 16.0, "rps": 90.0, "errors": 0},
+               "dispatch": {"queries_per_request": 2.0, "rps": 1.0},
+               "POST /report/repair": {"p99_ms": 500.0}}
+
+    regressions = compare_to_baseline(results, baseline)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("GET /report/pending p99_ms")
+    assert regressions[1].startswith("dispatch queries_per_request")
+
+
+def test_finish_fails_without_baseline(tmp_path):
+    path = tmp_path / "baseline.json"
+    results = {"GET /report/pending": {"p99_ms": 10.0}}
+
+    assert finish("api", results, update_baseline=False, baseline_path=path) == EXIT_NO_BASELINE
+    assert finish("api", results, update_baseline=True, baseline_path=path) == EXIT_OK
+    assert finish("api", results, update_baseline=False, baseline_path=path) == EXIT_OK
+    assert finish("api", {"GET /report/pending": {"p99_ms": 20.0}},
+                  update_baseline=False, baseline_path=path) == EXIT_REGRESSION
+
+
+def test_fixtures_are_reproducible():
+    start = datetime(2025, 1, 1)
+    first = generate_quakes(5, start, timedelta(seconds=30), seed=1)
+    assert first == generate_quakes(5, start, timedelta(seconds=30), seed=1)
+    assert to_simulate_request(first[0])["earthquake"]["earthquake_time"] == "2025-01-01T00:00:00"
+    assert {loc["location"] for loc in to_simulate_request(first[0])["locations"]} == set(first[0].intensities)
+
+
+def test_stub_feed_publishes_newest_first_and_filters_by_time():
+    quakes = generate_quakes(3, datetime(2025, 1, 1), timedelta(minutes=10))
+    feed = ReportFeed([to_cwa_report(q) for q in quakes], initial=2)
+
+    assert [r["EarthquakeNo"] for r in feed.query(10)] == [1, 0]
+    feed.publish()
+    assert [r["EarthquakeNo"] for r in feed.query(10, "2025-01-01T00:10:00")] == [2, 1]
+    assert feed.remaining == 0
@@ -1,13 +1,22 @@
 from datetime import datetime, timedelta
-from typing import Dict, List
-from zoneinfo import ZoneInfo
+import hashlib
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional
+from prometheus_client import Counter, Histogram
 from pydantic import BaseModel
 import pymysql
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 
 import logging
 
+from alerting.engine import (EarthquakeInput, LocationIntensity, decide_alerts,
+                             insert_events)
+from alerting.regions import regions
+from alerting.suppression import SuppressionIndex
 from db import get_mysql_connection
 
 logger = logging.getLogger(__name__)
@@ -16,7 +25,22 @@ API_KEY = os.getenv('API_KEY')
 if API_KEY == None:
     raise EnvironmentError('API_KEY not set')
 # 顯著有感地震報告資料-顯著有感地震報告
-URL = 'https://opendata.cwa.gov.tw/api//v1/rest/datastore/E-A0015-001'
+# CWA_API_URL can point at a local stand-in server replaying recorded payloads
+URL = os.getenv('CWA_API_URL', 'https://opendata.cwa.gov.tw/api//v1/rest/datastore/E-A0015-001')
+FETCH_LIMIT = 100
+FETCH_TIMEOUT = 10
+# Re-request reports this far before the newest OriginTime seen, since CWA
+# may publish a report some time after the quake
+FETCH_OVERLAP = timedelta(hours=6)
+# Also ask MySQL on every suppression decision and log disagreements with the index
+DEBUG_MODE = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+
+cwa_fetch_duration_seconds = Histogram(
+    'cwa_fetch_duration_seconds', 'Latency of CWA report API requests, retries included')
+cwa_fetch_bytes = Counter(
+    'cwa_fetch_bytes', 'Bytes received from the CWA report API')
+cwa_fetch_requests = Counter(
+    'cwa_fetch_requests', 'CWA report API polls by outcome', ['result'])
 
 
 class Earthquake(BaseModel):
@@ -56,225 +80,388 @@ def parse_earthquake(data) -> Earthquake:
         latitude=data['EarthquakeInfo']['Epicenter']['EpicenterLatitude'],
     )
 
-    areaNameMapper = {
-        '臺北市': 'Taipei',
-        '新竹市': 'Hsinchu',
-        '臺中市': 'Taichung',
-        '臺南市': 'Tainan',
-    }
+    # Initialize every region with level 0
+    for name in regions.names():
+        parsed_earthquake.intensity[name] = intensity_to_float('0級')
 
-    # Initialize every area with level 0
-    for area in areaNameMapper.keys():
-        parsed_earthquake.intensity[areaNameMapper[area]
-                                    ] = intensity_to_float('0級')
-
-    # Assign each found area
+    # Assign each found area to the regions in its county
     for area in data['Intensity']['ShakingArea']:
-        county_name = area['CountyName']
-        if county_name in areaNameMapper.keys():
-            parsed_earthquake.intensity[areaNameMapper[county_name]
-                                        ] = intensity_to_float(area['AreaIntensity'])
+        for region in regions.by_county(area['CountyName']):
+            parsed_earthquake.intensity[region.name] = intensity_to_float(area['AreaIntensity'])
 
     return parsed_earthquake
 
 
-def crawl_new_earthquakes() -> List[Earthquake]:
-    res = requests.get(URL, {
-        'Authorization': API_KEY,
-        'limit': 100,
-    })
+class CwaClient:
+    """
+    Polls the CWA report API over one keep-alive session.
 
-    if res.status_code != 200:
-        logger.error('API error')
-        exit(1)
+    Transient failures are retried with exponential backoff; a poll that
+    still fails returns no earthquakes and the next cycle tries again.
+    Once a report has been seen, later polls only ask for reports since the
+    newest OriginTime (minus FETCH_OVERLAP), and a response identical to the
+    previous one is dropped before JSON parsing.
+    """
 
-    earthquakes = res.json()['records']['Earthquake']
-    return list(map(parse_earthquake, earthquakes))
+    def __init__(self, url: str = URL, api_key: str = API_KEY, retries: int = 3, backoff_factor: float = 1.0):
+        self.url = url
+        self.api_key = api_key
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff_factor,
+                      status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+        self.session.mount("http://", HTTPAdapter(max_retries=retry))
+        self.session.mount("https://", HTTPAdapter(max_retries=retry))
+
+        self.latest_origin_time: Optional[datetime] = None
+        self._last_digest: Optional[str] = None
+        self._etag: Optional[str] = None
+
+    def _params(self) -> dict:
+        params = {
+            'Authorization': self.api_key,
+            'limit': FETCH_LIMIT,
+        }
+        if self.latest_origin_time:
+            params['timeFrom'] = (self.latest_origin_time -
+                                  FETCH_OVERLAP).strftime("%Y-%m-%dT%H:%M:%S")
+        return params
+
+    def fetch(self) -> List[Earthquake]:
+        headers = {'If-None-Match': self._etag} if self._etag else {}
+        start = time.perf_counter()
+        try:
+            res = self.session.get(self.url, params=self._params(),
+                                   headers=headers, timeout=FETCH_TIMEOUT)
+        except requests.RequestException as e:
+            cwa_fetch_requests.labels(result="error").inc()
+            logger.error(f'API error: {e}')
+            return []
+        finally:
+            cwa_fetch_duration_seconds.observe(time.perf_counter() - start)
+
+        cwa_fetch_bytes.inc(len(res.content))
+        if res.status_code == 304:
+            cwa_fetch_requests.labels(result="unchanged").inc()
+            return []
+        if res.status_code != 200:
+            cwa_fetch_requests.labels(result="error").inc()
+            logger.error(f'API error: HTTP {res.status_code}')
+            return []
+
+        self._etag = res.headers.get('ETag')
+        digest = hashlib.sha256(res.content).hexdigest()
+        if digest == self._last_digest:
+            cwa_fetch_requests.labels(result="unchanged").inc()
+            logger.debug('CWA payload unchanged.')
+            return []
+
+        try:
+            earthquakes = list(
+                map(parse_earthquake, res.json()['records']['Earthquake']))
+        except (ValueError, KeyError, TypeError) as e:
+            cwa_fetch_requests.labels(result="error").inc()
+            logger.error(f'Unexpected API payload: {e}')
+            return []
+        self._last_digest = digest
+        cwa_fetch_requests.labels(result="changed").inc()
+        return earthquakes
+
+    def mark_ingested(self, earthquakes: List[Earthquake]):
+        """Advance the incremental window once a fetch has been stored."""
+        if not earthquakes:
+            return
+        newest = max(datetime.strptime(eq.timestamp, "%Y-%m-%d %H:%M:%S")
+                     for eq in earthquakes)
+        if self.latest_origin_time is None or newest > self.latest_origin_time:
+            self.latest_origin_time = newest
+
+    def reset_change_detection(self):
+        """Make the next poll parse the payload even if it has not changed."""
+        self._last_digest = None
+        self._etag = None
+
+
+cwa_client = CwaClient()
 
 
-location_suffix_map = {
-    "Taipei": "-tp",
-    "Hsinchu": "-hc",
-    "Taichung": "-tc",
-    "Tainan": "-tn",
-}
+def crawl_new_earthquakes() -> List[Earthquake]:
+    return cwa_client.fetch()
 
 
-def determine_level(intensity: float, magnitude: float) -> str:
-    if intensity >= 3 or magnitude >= 5:
-        return 'L2'
-    elif intensity >= 1:
-        return 'L1'
-    else:
-        return 'NA'
+DEFAULT_ALERT_SUPPRESS = 30
 
 
-def close_events(cursor: pymysql.cursors.Cursor, event_id: int | str):
-    """
-    This is to close events that have not been processed.
-    Usually called by
-    * auto_close_unprocessed_events, which close all unprocessed events past 1 hour.
-    * An event that does not trigger alert (having trigger_alert = FALSE), which will close the event immediately.
+# Seconds between checks of the settings version written by the backend
+SETTINGS_CHECK_INTERVAL = 60
 
-    The caller should ensure that the event_id exists in the database.
-    This function will not commit the transaction, so the caller should handle the commit.
-    """
 
-    sql_update = """
-        UPDATE event
-        SET is_done = TRUE,
-            closed_at = %s,
-            process_time = %s
-        WHERE id = %s
+class AlertSuppressSetting:
+    """
+    Alert suppress time cached across fetches. Once the check interval has
+    passed only the ``settings_version`` row is read; the value itself is
+    reloaded when the backend has bumped that version.
     """
-    now = datetime.now(ZoneInfo("Asia/Taipei"))
-    cursor.execute(sql_update, (
-        now.strftime("%Y-%m-%d %H:%M:%S"),
-        -1,  # -1 表示未處理
-        event_id
-    ))
 
+    def __init__(self, check_interval: float = SETTINGS_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.value: Optional[int] = None
+        self.version: Optional[str] = None
+        self.checked_at = 0.0
+
+    def get(self, cursor: pymysql.cursors.Cursor) -> int:
+        now = time.monotonic()
+        if self.value is not None and now - self.checked_at < self.check_interval:
+            return self.value
+
+        cursor.execute(
+            "SELECT value FROM settings WHERE name = %s", ("settings_version",))
+        result = cursor.fetchone()
+        version = result["value"] if result else None
+        if self.value is None or version != self.version:
+            cursor.execute(
+                "SELECT value FROM settings WHERE name = %s", ("alert_suppress_time",))
+            result = cursor.fetchone()
+            self.value = int(result["value"]) if result else DEFAULT_ALERT_SUPPRESS
+            self.version = version
+        self.checked_at = now
+        return self.value
+
+
+alert_suppress_setting = AlertSuppressSetting()
+
+
+def get_alert_suppress_time(cursor: pymysql.cursors.Cursor) -> int:
+    return alert_suppress_setting.get(cursor)
 
-DEFAULT_ALERT_SUPPRESS = 30
 
+suppression_index = SuppressionIndex(regions)
 
-def get_alert_suppress_time_from_db() -> int:
+
+def load_regions():
     conn = get_mysql_connection()
     if not conn:
-        return DEFAULT_ALERT_SUPPRESS
+        logger.error("Failed to connect to the database.")
+        return
     try:
         with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT value FROM settings WHERE name = %s", ("alert_suppress_time",))
-            result = cursor.fetchone()
-            if result:
-                return int(result["value"])
-            return DEFAULT_ALERT_SUPPRESS
+            regions.load(cursor)
+    except Exception as e:
+        logger.exception(f"[ERROR] Failed to load regions, keeping the current ones: {e}")
+    finally:
+        conn.close()
+
+
+def refresh_regions():
+    """
+    Reload the region registry when due. Runs before a poll so new reports
+    are parsed with the current regions; no connection is opened otherwise.
+    """
+    if not regions.is_stale():
+        return
+    conn = get_mysql_connection()
+    if not conn:
+        logger.error("Failed to connect to the database.")
+        return
+    try:
+        with conn.cursor() as cursor:
+            regions.reload_if_stale(cursor)
     finally:
         conn.close()
 
 
-def insert_earthquake(eq: Earthquake, conn: pymysql.Connection):
-    alert_suppress_time = get_alert_suppress_time_from_db()
+def rebuild_suppression_index():
+    conn = get_mysql_connection()
+    if not conn:
+        logger.error("Failed to connect to the database.")
+        return
+    try:
+        with conn.cursor() as cursor:
+            suppression_index.rebuild(cursor)
+    finally:
+        conn.close()
+
+
+def insert_earthquakes(data: List[Earthquake], conn: pymysql.Connection) -> List[int]:
+    """
+    Insert the earthquakes of one fetch that are not stored yet, together
+    with their locations and events, in a single transaction.
+    The caller commits. Returns the inserted earthquake ids.
+    """
+    batch = {eq.earthquake_id: eq for eq in data}
+    if not batch:
+        return []
+
     with conn.cursor() as cursor:
-        sql_check_eq = """
-        SELECT id FROM earthquake WHERE id = %s
-        """
-        cursor.execute(sql_check_eq, (eq.earthquake_id))
-        result = cursor.fetchone()
-        if result:
-            return False
+        cursor.execute(
+            "SELECT id FROM earthquake WHERE id IN %s", (tuple(batch.keys()),))
+        known = {row["id"] for row in cursor.fetchall()}
 
-        eq_time_str = eq.timestamp
+        new_eqs = [eq for eq_id, eq in batch.items() if eq_id not in known]
+        if not new_eqs:
+            return []
 
-        sql_insert_eq = """
+        alert_suppress_time = get_alert_suppress_time(cursor)
+        suppress_window = timedelta(minutes=alert_suppress_time)
+        suppression_index.sync(cursor)
+
+        cursor.executemany("""
         INSERT INTO earthquake (id, earthquake_time, center, latitude, longitude, magnitude, depth, is_demo)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(sql_insert_eq, (
-            eq.earthquake_id, eq_time_str, eq.center, eq.latitude, eq.longitude, eq.magnitude, eq.depth, False
-        ))
+        """, [(eq.earthquake_id, eq.timestamp, eq.center, eq.latitude, eq.longitude, eq.magnitude, eq.depth, False)
+              for eq in new_eqs])
 
         # === Insert earthquake_location ===
-        sql_insert_loc = """
+        cursor.executemany("""
         INSERT INTO earthquake_location (earthquake_id, location, intensity)
         VALUES (%s, %s, %s)
-        """
-        location_ids = []
+        """, [(eq.earthquake_id, loc, intensity)
+              for eq in new_eqs for loc, intensity in eq.intensity.items()])
 
-        for (loc, intensity) in eq.intensity.items():
-            cursor.execute(
-                sql_insert_loc, (eq.earthquake_id, loc, intensity))
-            location_ids.append(
-                (loc, cursor.lastrowid, intensity))
+        cursor.execute("""
+        SELECT id, earthquake_id, location FROM earthquake_location
+        WHERE earthquake_id IN %s
+        """, (tuple(eq.earthquake_id for eq in new_eqs),))
+        location_ids = {(row["earthquake_id"], row["location"]): row["id"]
+                        for row in cursor.fetchall()}
 
         # === Insert event for each location ===
-        sql_insert_event = """
-        INSERT INTO event (id, location_eq_id, create_at, region, level, trigger_alert, ack, is_damage, is_operation_active, is_done)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        for loc_name, location_eq_id, intensity in location_ids:
-            suffix = None
-            for keyword, sfx in location_suffix_map.items():
-                if keyword in loc_name:
-                    suffix = sfx
-                    break
-            else:
-                raise ValueError(
-                    'Location name not found in location_suffix_map')
-
-            event_id = f"{eq.earthquake_id}{suffix}"
-            level = determine_level(intensity, eq.magnitude)
-
-            alert_suppress_threshold = (
-                datetime.strptime(eq_time_str, "%Y-%m-%d %H:%M:%S") -
-                timedelta(minutes=alert_suppress_time)
-            ).strftime("%Y-%m-%d %H:%M:%S")
-
-            level_order = {"L1": 1, "L2": 2}
-            this_level_score = level_order.get(level, 0)
-
-            # 查詢 suppress 時間內、同地區發出的警報等級
-            sql_check_alert = """
-            SELECT level FROM event
-            WHERE region = %s AND trigger_alert = 1
-            AND create_at BETWEEN %s AND %s
-            """
-            cursor.execute(
-                sql_check_alert, (loc_name, alert_suppress_threshold, eq_time_str))
-            past_levels = cursor.fetchall()
-
-            # 比較是否有等級 >= 本次的事件
-            suppress = any(level_order.get(
-                row["level"], 0) >= this_level_score for row in past_levels)
-
-            # 決定是否觸發
-            trigger_alert = 0
-            if level in ['L1', 'L2'] and not suppress:
-                trigger_alert = 1
-
-            # 插入 event
-            cursor.execute(sql_insert_event, (
-                event_id,
-                location_eq_id,
-                eq_time_str,  # For fetched earthquakes,
-                              # the alert time is the same as the earthquake time
-                loc_name,  # region 填入地點名稱
-                level,
-                trigger_alert,
-                False,  # ack
-                None,  # is_damage
-                None,  # is_operation_active
-                False   # is_done
-            ))
-
-            if trigger_alert == 0:
-                close_events(cursor, event_id)
+        decisions = decide_alerts([
+            EarthquakeInput(
+                eq.earthquake_id,
+                # For fetched earthquakes, the alert time is the same as the earthquake time
+                datetime.strptime(eq.timestamp, "%Y-%m-%d %H:%M:%S"),
+                eq.magnitude,
+                [LocationIntensity(loc, intensity, location_ids[(eq.earthquake_id, loc)])
+                 for loc, intensity in eq.intensity.items()])
+            for eq in new_eqs
+        ], suppression_index, cursor, suppress_window, verify=DEBUG_MODE)
+        insert_events(cursor, decisions)
 
-        conn.commit()
-        return True
-    return False
+    return [eq.earthquake_id for eq in new_eqs]
+
+
+# Simulated earthquakes created by the backend use ids from here on
+SIMULATED_ID_START = 100000000
+KNOWN_IDS_MAX_SIZE = 1000
 
 
-def batch_insert_earthquake(data: List[Earthquake]):
+class KnownEarthquakeIds:
+    """
+    Bounded set of CWA EarthquakeNo values already stored in MySQL.
+
+    CWA numbers reports in increasing order, so once the set is full the
+    smallest ids are evicted and everything at or below ``floor`` counts as
+    known. ``high_water_mark`` is the newest id seen.
+    """
+
+    def __init__(self, max_size: int = KNOWN_IDS_MAX_SIZE):
+        self.max_size = max_size
+        self.seeded = False
+        self.floor = None
+        self.high_water_mark = 0
+        self._ids = set()
+        self._heap = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def is_known(self, earthquake_id: int) -> bool:
+        if earthquake_id in self._ids:
+            return True
+        return self.floor is not None and earthquake_id <= self.floor
+
+    def add(self, earthquake_ids: Iterable[int]):
+        for earthquake_id in earthquake_ids:
+            if self.is_known(earthquake_id):
+                continue
+            self._ids.add(earthquake_id)
+            heapq.heappush(self._heap, earthquake_id)
+            self.high_water_mark = max(self.high_water_mark, earthquake_id)
+
+        while len(self._ids) > self.max_size:
+            evicted = heapq.heappop(self._heap)
+            self._ids.discard(evicted)
+            self.floor = evicted
+
+    def seed(self, cursor: pymysql.cursors.Cursor):
+        cursor.execute("""
+            SELECT id FROM earthquake
+            WHERE id < %s
+            ORDER BY id DESC
+            LIMIT %s
+        """, (SIMULATED_ID_START, self.max_size))
+        rows = cursor.fetchall()
+        self.add(row["id"] for row in rows)
+        if len(rows) == self.max_size and self.floor is None:
+            # Older ids than the ones loaded are in the DB as well
+            self.floor = rows[-1]["id"] - 1
+        self.seeded = True
+        logger.info(
+            f"Loaded {len(rows)} known earthquake ids, high-water mark {self.high_water_mark}")
+
+
+known_earthquake_ids = KnownEarthquakeIds()
+
+
+def seed_known_earthquake_ids():
     conn = get_mysql_connection()
     if not conn:
         logger.error("Failed to connect to the database.")
         return
+    try:
+        with conn.cursor() as cursor:
+            known_earthquake_ids.seed(cursor)
+    finally:
+        conn.close()
+
+
+def batch_insert_earthquake(data: List[Earthquake]) -> bool:
+    """
+    Store the new earthquakes of one fetch.
+    Returns False when they could not be stored.
+    """
     logger.info(f'Fetched {len(data)} earthquakes...')
+    if known_earthquake_ids.seeded:
+        # Steady state: nothing new means no database round trip at all
+        data = [eq for eq in data
+                if not known_earthquake_ids.is_known(eq.earthquake_id)]
+        if not data:
+            logger.debug("No new earthquakes.")
+            return True
+    elif not data:
+        return True
+
+    conn = get_mysql_connection()
+    if not conn:
+        logger.error("Failed to connect to the database.")
+        return False
     try:
-        for eq in data:
-            if insert_earthquake(eq, conn):
-                logger.info(
-                    f"Inserted earthquake {eq.earthquake_id} successfully.")
+        if not known_earthquake_ids.seeded:
+            with conn.cursor() as cursor:
+                known_earthquake_ids.seed(cursor)
+        inserted = insert_earthquakes(data, conn)
+        conn.commit()
+        known_earthquake_ids.add(eq.earthquake_id for eq in data)
+        for earthquake_id in inserted:
+            logger.info(
+                f"Inserted earthquake {earthquake_id} successfully.")
         logger.info("All earthquakes inserted successfully.")
+        return True
     except Exception as e:
+        conn.rollback()
+        # Alerts recorded for the rolled back events must not suppress later ones
+        suppression_index.invalidate()
         logger.exception(f"[ERROR] Failed to insert earthquake: {e}")
+        return False
     finally:
         conn.close()
 
 
 def update_new_data():
+    refresh_regions()
     data = crawl_new_earthquakes()
-    batch_insert_earthquake(data)
+    if batch_insert_earthquake(data):
+        cwa_client.mark_ingested(data)
+    else:
+        # Parse the same payload again next cycle instead of skipping it
+        cwa_client.reset_change_detection()
@@ -1,14 +1,18 @@
 import datetime
 import logging
+import os
 import sys
 import time
 import signal
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from prometheus_client import start_http_server
 
-from fetch_earthquake import update_new_data
+from fetch_earthquake import (load_regions, rebuild_suppression_index,
+                              seed_known_earthquake_ids, update_new_data)
 
 UPDATE_INTERVAL = 10
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9200))
 DEBUG_MODE = True
 
 logging.basicConfig(
@@ -18,6 +22,11 @@ logging.basicConfig(
 )
 
 if __name__ == "__main__":
+    start_http_server(METRICS_PORT)
+    load_regions()
+    seed_known_earthquake_ids()
+    rebuild_suppression_index()
+
     scheduler = BackgroundScheduler()
 
     scheduler.add_job(update_new_data, 'interval',
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# data_ingestion runs as flat modules (`python main.py`), so import them the same way
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# The shared alerting package lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+os.environ.setdefault("API_KEY", "test-api-key")
@@ -0,0 +1,333 @@
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlparse
+
+import fetch_earthquake
+import pytest
+from fetch_earthquake import AlertSuppressSetting, CwaClient
+
+PAYLOAD = (Path(__file__).parent / "fixtures" / "E-A0015-001.json").read_bytes()
+
+
+class StandInCwaServer(HTTPServer):
+    """Replays a recorded CWA response; ``failures`` requests fail with 503 first."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInCwaHandler)
+        self.payload = PAYLOAD
+        self.failures = 0
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/api/v1/rest/datastore/E-A0015-001"
+
+
+class StandInCwaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(parse_qs(urlparse(self.path).query))
+        if self.server.failures > 0:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.payload)))
+        self.end_headers()
+        self.wfile.write(self.server.payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def cwa_server():
+    server = StandInCwaServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_parses_recorded_payload(cwa_server):
+    client = CwaClient(url=cwa_server.url, api_key="key", backoff_factor=0)
+
+    earthquakes = client.fetch()
+
+    assert [eq.earthquake_id for eq in earthquakes] == [114097, 114096]
+    assert earthquakes[0].intensity == {
+        "Taipei": 0.0, "Hsinchu": 0.0, "Taichung": 1.0, "Tainan": 3.0}
+    assert cwa_server.requests[0]["Authorization"] == ["key"]
+    assert "timeFrom" not in cwa_server.requests[0]
+
+
+def test_fetch_skips_unchanged_payload(cwa_server):
+    client = CwaClient(url=cwa_server.url, api_key="key", backoff_factor=0)
+
+    assert len(client.fetch()) == 2
+    assert client.fetch() == []
+
+    client.reset_change_detection()
+    assert len(client.fetch()) == 2
+
+
+def test_fetch_is_incremental_after_ingest(cwa_server):
+    client = CwaClient(url=cwa_server.url, api_key="key", backoff_factor=0)
+
+    client.mark_ingested(client.fetch())
+    client.fetch()
+
+    assert cwa_server.requests[-1]["timeFrom"] == ["2025-05-01T06:34:56"]
+
+
+def test_fetch_retries_then_recovers(cwa_server):
+    cwa_server.failures = 2
+    client = CwaClient(url=cwa_server.url, api_key="key", retries=3, backoff_factor=0)
+
+    assert len(client.fetch()) == 2
+    assert len(cwa_server.requests) == 3
+
+
+def test_fetch_gives_up_without_exiting(cwa_server):
+    cwa_server.failures = 10
+    client = CwaClient(url=cwa_server.url, api_key="key", retries=1, backoff_factor=0)
+
+    assert client.fetch() == []
+
+
+def test_alert_suppress_setting_reloads_on_version_change():
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [{"value": "1"}, {"value": "45"},
+                                   {"value": "1"},
+                                   {"value": "2"}, {"value": "10"}]
+    setting = AlertSuppressSetting(check_interval=0)
+
+    assert setting.get(cursor) == 45
+    assert setting.get(cursor) == 45
+    assert setting.get(cursor) == 10
+    assert cursor.execute.call_count == 5
+
+
+def test_alert_suppress_setting_skips_queries_within_interval():
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [None, None]
+    setting = AlertSuppressSetting(check_interval=60)
+
+    assert setting.get(cursor) == 30
+    assert setting.get(cursor) == 30
+    assert cursor.execute.call_count == 2
+
+
+def test_regions_are_refreshed_before_reports_are_parsed(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fetch_earthquake, "refresh_regions", lambda: calls.append("refresh"))
+    monkeypatch.setattr(fetch_earthquake, "crawl_new_earthquakes", lambda: calls.append("parse") or [])
+
+    fetch_earthquake.update_new_data()
+
+    assert calls == ["refresh", "parse"]
+
+
+def test_refresh_regions_connects_only_when_due(monkeypatch):
+    connect = MagicMock()
+    monkeypatch.setattr(fetch_earthquake, "get_mysql_connection", connect)
+    monkeypatch.setattr(fetch_earthquake.regions, "loaded_at", time.monotonic())
+
+    fetch_earthquake.refresh_regions()
+    connect.assert_not_called()
+
+    monkeypatch.setattr(fetch_earthquake.regions, "loaded_at", None)
+    monkeypatch.setattr(fetch_earthquake.regions, "reload_if_stale", MagicMock())
+    fetch_earthquake.refresh_regions()
+    fetch_earthquake.regions.reload_if_stale.assert_called_once()
+    connect.return_value.close.assert_called_once()
+
+
+class FakeDb:
+    """Cursor and connection answering the statements insert_earthquakes runs."""
+
+    def __init__(self, stored_ids=(), fail_on=None):
+        self.stored_ids = set(stored_ids)
+        self.fail_on = fail_on
+        self.executemany_calls = {}
+        self.location_ids = {}
+        self.conn = MagicMock()
+        self.conn.cursor.return_value.__enter__.return_value = self
+        self._result = []
+
+    def execute(self, sql, params=None):
+        if "FROM earthquake WHERE id IN" in sql:
+            self._result = [{"id": i} for i in params[0] if i in self.stored_ids]
+        elif "FROM earthquake_location" in sql:
+            self._result = [{"id": location_eq_id, "earthquake_id": eq_id, "location": loc}
+                            for (eq_id, loc), location_eq_id in self.location_ids.items()]
+        else:
+            self._result = []
+
+    def executemany(self, sql, rows):
+        table = sql.split("INSERT INTO")[1].split()[0]
+        if table == self.fail_on:
+            raise RuntimeError(f"Duplicate entry in {table}")
+        self.executemany_calls[table] = list(rows)
+        if table == "earthquake_location":
+            for eq_id, loc, _ in rows:
+                self.location_ids[(eq_id, loc)] = 1000 + len(self.location_ids)
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+
+def quake(earthquake_id, timestamp, taipei=0.0, hsinchu=0.0, magnitude=4.0):
+    return fetch_earthquake.Earthquake(
+        earthquake_id=earthquake_id, timestamp=timestamp, magnitude=magnitude, center="花蓮縣",
+        depth=10.0, longitude=121.6, latitude=24.0, intensity={"Taipei": taipei, "Hsinchu": hsinchu})
+
+
+@pytest.fixture
+def ingest_state(monkeypatch):
+    index = fetch_earthquake.SuppressionIndex(["Taipei", "Hsinchu"])
+    index.rebuild(MagicMock(), datetime(2025, 5, 1, 0, 0, 0))
+    monkeypatch.setattr(fetch_earthquake, "suppression_index", index)
+    monkeypatch.setattr(fetch_earthquake, "get_alert_suppress_time", lambda cursor: 30)
+    known = fetch_earthquake.KnownEarthquakeIds()
+    known.seeded = True
+    monkeypatch.setattr(fetch_earthquake, "known_earthquake_ids", known)
+    return index, known
+
+
+def test_insert_earthquakes_skips_stored_ids(ingest_state):
+    db = FakeDb(stored_ids={114001})
+
+    inserted = fetch_earthquake.insert_earthquakes(
+        [quake(114001, "2025-05-01 12:00:00"), quake(114002, "2025-05-01 12:10:00")], db.conn)
+
+    assert inserted == [114002]
+    assert [row[0] for row in db.executemany_calls["earthquake"]] == [114002]
+
+
+def test_insert_earthquakes_returns_nothing_when_all_stored(ingest_state):
+    db = FakeDb(stored_ids={114001})
+
+    assert fetch_earthquake.insert_earthquakes([quake(114001, "2025-05-01 12:00:00")], db.conn) == []
+    assert db.executemany_calls == {}
+
+
+def test_insert_earthquakes_rows_link_locations_to_their_earthquake(ingest_state):
+    db = FakeDb()
+
+    fetch_earthquake.insert_earthquakes([
+        quake(114001, "2025-05-01 12:00:00", taipei=3.0),
+        quake(114002, "2025-05-01 13:00:00", hsinchu=4.0),
+    ], db.conn)
+
+    assert db.executemany_calls["earthquake"][0] == (
+        114001, "2025-05-01 12:00:00", "花蓮縣", 24.0, 121.6, 4.0, 10.0, False)
+    assert db.executemany_calls["earthquake_location"] == [
+        (114001, "Taipei", 3.0), (114001, "Hsinchu", 0.0),
+        (114002, "Taipei", 0.0), (114002, "Hsinchu", 4.0)]
+    events = {row[0]: row for row in db.executemany_calls["event"]}
+    assert events["114001-tp"][1] == db.location_ids[(114001, "Taipei")]
+    assert events["114002-hc"][1] == db.location_ids[(114002, "Hsinchu")]
+    assert events["114001-tp"][4] == "L2" and events["114001-tp"][5] is True
+    assert events["114002-tp"][4] == "NA" and events["114002-tp"][5] is False
+
+
+def test_insert_earthquakes_decides_oldest_first(ingest_state):
+    db = FakeDb()
+
+    # CWA lists the newest report first; the older quake must take the alert
+    fetch_earthquake.insert_earthquakes([
+        quake(114002, "2025-05-01 12:10:00", taipei=1.0),
+        quake(114001, "2025-05-01 12:00:00", taipei=1.0),
+    ], db.conn)
+
+    events = {row[0]: row for row in db.executemany_calls["event"]}
+    assert events["114001-tp"][5] is True
+    assert events["114002-tp"][5] is False
+
+
+def test_batch_insert_rolls_back_when_a_statement_fails(ingest_state, monkeypatch):
+    index, known = ingest_state
+    db = FakeDb(fail_on="event")
+    monkeypatch.setattr(fetch_earthquake, "get_mysql_connection", lambda: db.conn)
+
+    assert fetch_earthquake.batch_insert_earthquake([quake(114001, "2025-05-01 12:00:00", taipei=3.0)]) is False
+
+    db.conn.rollback.assert_called_once()
+    db.conn.commit.assert_not_called()
+    db.conn.close.assert_called_once()
+    # The alert recorded for the rolled back event must not suppress later ones
+    assert index.loaded is False
+    assert not known.is_known(114001)
+
+
+def test_known_ids_seed_only_real_cwa_ids():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"id": 114003}, {"id": 114002}, {"id": 114001}]
+    known = fetch_earthquake.KnownEarthquakeIds(max_size=3)
+
+    known.seed(cursor)
+
+    sql, params = cursor.execute.call_args[0]
+    assert "id < %s" in sql
+    assert params == (100000000, 3)
+    assert known.seeded
+    assert known.high_water_mark == 114003
+    # A full page means older ids are stored as well
+    assert known.floor == 114000
+    assert known.is_known(113500)
+    assert not known.is_known(114004)
+
+
+def test_known_ids_partial_seed_has_no_floor():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"id": 114001}]
+    known = fetch_earthquake.KnownEarthquakeIds(max_size=3)
+
+    known.seed(cursor)
+
+    assert known.floor is None
+    assert not known.is_known(113999)
+
+
+def test_known_ids_evict_smallest_to_max_size():
+    known = fetch_earthquake.KnownEarthquakeIds(max_size=3)
+
+    known.add([114005, 114001, 114003, 114002, 114004])
+
+    assert len(known) == 3
+    assert known.floor == 114002
+    assert known.high_water_mark == 114005
+    # At or below the floor counts as known without being stored
+    assert known.is_known(114002) and known.is_known(114001)
+    assert known.is_known(114004)
+    assert not known.is_known(114006)
+
+    # Ids at or below the floor are not added back
+    known.add([114000])
+    assert len(known) == 3 and known.floor == 114002
+
+
+def test_batch_insert_skips_database_when_every_id_is_known(monkeypatch):
+    known = fetch_earthquake.KnownEarthquakeIds()
+    known.seeded = True
+    known.add([114001, 114002])
+    monkeypatch.setattr(fetch_earthquake, "known_earthquake_ids", known)
+    connect = MagicMock()
+    monkeypatch.setattr(fetch_earthquake, "get_mysql_connection", connect)
+
+    assert fetch_earthquake.batch_insert_earthquake(
+        [quake(114001, "2025-05-01 12:00:00"), quake(114002, "2025-05-01 12:10:00")]) is True
+    connect.assert_not_called()